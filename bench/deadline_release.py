@@ -0,0 +1,105 @@
+"""
+Check: a grocery order whose caller gives up (short gRPC deadline) must not
+strand reserved stock.
+
+Runs the stand-in stack (bench/standins.py) and sends SubmitOrder,
+SubmitOrders and StartOrder with a deadline far shorter than the robots take:
+
+  timeout   no robots at all (ROBOT_LIVENESS=wait), so the order times out
+            after ROBOT_TIMEOUT_S and its reservation must be rolled back:
+            stock ends where it started
+  complete  slow robots that do answer after the caller left, so the order
+            still goes through: stock ends lower by exactly the order
+
+Either way the tracker and the admission slots must be empty afterwards.
+
+    python -m bench.deadline_release
+"""
+import os
+import sys
+import time
+
+# Short robot timeout so the check finishes quickly; wait (not fail) so orders reach the robot wait
+os.environ.setdefault("ROBOT_TIMEOUT_S", "3")
+os.environ.setdefault("ROBOT_LIVENESS", "wait")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import grpc
+
+from generated.proto import grocery_pb2
+from generated.proto import grocery_pb2_grpc
+
+from bench.standins import StandInStack
+from services.inventory_grpc.server import ROBOT_TIMEOUT_S
+
+STOCK = 100
+ITEMS = {"milk": 5, "bread": 2}
+CALL_TIMEOUT_S = 0.3
+# Stand-in robots take 0.4-1.1 s per WorkOrder at this scale: past CALL_TIMEOUT_S, within ROBOT_TIMEOUT_S
+SLOW_WORK_SCALE = 1.0
+
+
+def _order(i: int):
+    return grocery_pb2.OrderRequest(id=f"deadline-{i}", items=ITEMS, request_type=grocery_pb2.GROCERY_ORDER)
+
+
+def _submit(stub, i: int):
+    stub.SubmitOrder(_order(i), timeout=CALL_TIMEOUT_S)
+
+
+def _submit_batch(stub, i: int):
+    for _ in stub.SubmitOrders(grocery_pb2.OrderBatch(orders=[_order(i), _order(i + 1)]), timeout=CALL_TIMEOUT_S):
+        pass
+
+
+def _start(stub, i: int):
+    stub.StartOrder(_order(i), timeout=CALL_TIMEOUT_S)
+
+
+CALLS = [("SubmitOrder", _submit, 1), ("SubmitOrders", _submit_batch, 2), ("StartOrder", _start, 1)]
+
+
+def _settled(stack: StandInStack, deadline: float) -> bool:
+    service = stack._inventory.service
+    while time.monotonic() < deadline:
+        if service.tracker.in_flight() == 0 and not service._background and service.admission.stats()["in_flight"] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def run(scenario: str) -> bool:
+    replicas, work_scale = (0, 0.0) if scenario == "timeout" else (1, SLOW_WORK_SCALE)
+    ok = True
+    with StandInStack(work_scale=work_scale, initial_stock=STOCK, robot_replicas=replicas) as stack:
+        stub = grocery_pb2_grpc.InventoryServiceStub(grpc.insecure_channel(stack.inventory_addr))
+        for i, (name, call, orders) in enumerate(CALLS):
+            before = dict(stack.reservations.stock)
+            try:
+                call(stub, 10 * i)
+                code = grpc.StatusCode.OK
+            except grpc.RpcError as e:
+                code = e.code()
+            settled = _settled(stack, time.monotonic() + ROBOT_TIMEOUT_S + 5 * SLOW_WORK_SCALE)
+            after = stack.reservations.stock
+            expected = dict(before)
+            if scenario == "complete":
+                for item, qty in ITEMS.items():
+                    expected[item] -= orders * qty
+            good = settled and all(after[item] == expected[item] for item in ITEMS)
+            ok &= good
+            print(f"{scenario:9s} {name:13s} call={code.name:17s} "
+                  + " ".join(f"{item}={before[item]}->{after[item]} (want {expected[item]})" for item in ITEMS)
+                  + f" settled={settled} {'ok' if good else 'FAIL'}")
+    return ok
+
+
+def main():
+    ok = all([run("timeout"), run("complete")])
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
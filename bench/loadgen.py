@@ -0,0 +1,362 @@
+"""
+Load generator for the order pipeline.
+
+Orders come from a JSONL file (one /submit JSON payload per line, replayed in a
+loop) or are synthesized from a weighted item mix with a GROCERY/RESTOCK ratio.
+They are sent to the Flask /submit endpoint (http://...) or straight to
+InventoryService.SubmitOrder (grpc://host:port).
+
+Modes:
+  closed  N clients, each sends its next order as soon as the previous one returns
+  open    orders arrive at a fixed rate regardless of how fast they complete;
+          latency is measured from the scheduled send time, so queueing shows up
+
+--standin runs everything in-process (no PostgreSQL, simulated robots), e.g.:
+    python -m bench.loadgen --standin --mode closed --concurrency 32 --duration 20
+    python -m bench.loadgen --standin --target http --mode open --rate 200 --duration 20
+--robot_replicas runs that many robots per category; with simulated work and a
+small --robot_max_in_flight the robots are the bottleneck, which shows how
+throughput scales with replicas:
+    python -m bench.loadgen --standin --robot_work_scale 0.2 --robot_max_in_flight 4 --robot_replicas 2
+--async_submit uses /submit?async=1 (or StartOrder) and counts an order as done
+once it is accepted, which measures the front end rather than the robots.
+Against a real deployment:
+    python -m bench.loadgen --target http://localhost:5000/submit --mode open --rate 20 --duration 60
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent import futures
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generated.proto import grocery_pb2
+from generated.proto import grocery_pb2_grpc
+from utils.grpc_channels import get_stub
+
+
+CATALOG = ["bread", "milk", "eggs", "chicken", "beef", "apples", "bananas", "soda", "napkins"]
+
+
+# ---------- order sources ----------
+
+class JsonlOrders:
+    """Replays /submit payloads from a JSONL file, wrapping around at the end."""
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            self.orders = [json.loads(line) for line in f if line.strip()]
+        if not self.orders:
+            raise ValueError(f"no orders in {path}")
+        self._i = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> Dict:
+        with self._lock:
+            order = self.orders[self._i % len(self.orders)]
+            self._i += 1
+        return order
+
+
+class SyntheticOrders:
+    """Random orders drawn from a weighted item mix."""
+
+    def __init__(self, mix: Dict[str, float], items_per_order: Tuple[int, int], qty: Tuple[int, int],
+                 restock_ratio: float, seed: Optional[int] = None):
+        self.names = list(mix)
+        self.weights = [mix[n] for n in self.names]
+        self.items_per_order = items_per_order
+        self.qty = qty
+        self.restock_ratio = restock_ratio
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._n = 0
+
+    def next(self) -> Dict:
+        with self._lock:
+            rng = self._rng
+            self._n += 1
+            n_items = min(rng.randint(*self.items_per_order), len(self.names))
+            chosen = set()
+            while len(chosen) < n_items:
+                chosen.add(rng.choices(self.names, self.weights)[0])
+            restock = rng.random() < self.restock_ratio
+            return {
+                "request_type": "RESTOCK_ORDER" if restock else "GROCERY_ORDER",
+                "id": f"{'supplier' if restock else 'customer'}-{self._n}",
+                "items": {name: rng.randint(*self.qty) for name in chosen},
+            }
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """'bread=3,milk=1' -> {'bread': 3.0, 'milk': 1.0}; empty means uniform over the catalog."""
+    if not spec:
+        return {name: 1.0 for name in CATALOG}
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_range(spec: str) -> Tuple[int, int]:
+    lo, _, hi = spec.partition("-")
+    return int(lo), int(hi or lo)
+
+
+# ---------- clients ----------
+
+class GrpcClient:
+    def __init__(self, addr: str, timeout_s: float, async_submit: bool = False):
+        self.addr = addr
+        self.timeout_s = timeout_s
+        self.async_submit = async_submit
+
+    def submit(self, order: Dict) -> Optional[str]:
+        """Returns None on success, otherwise a short failure reason."""
+        rt = grocery_pb2.RESTOCK_ORDER if order["request_type"] == "RESTOCK_ORDER" else grocery_pb2.GROCERY_ORDER
+        req = grocery_pb2.OrderRequest(request_type=rt, id=order["id"],
+                                       items={k: int(v) for k, v in order["items"].items()})
+        try:
+            stub = get_stub(self.addr, grocery_pb2_grpc.InventoryServiceStub)
+            if self.async_submit:
+                status = stub.StartOrder(req, timeout=self.timeout_s)
+                if status.state == grocery_pb2.ORDER_PENDING:
+                    return None
+                reply = status.reply
+            else:
+                reply = stub.SubmitOrder(req, timeout=self.timeout_s)
+        except Exception as e:
+            code = getattr(e, "code", None)
+            return f"grpc {code().name}" if callable(code) else type(e).__name__
+        return None if reply.code == grocery_pb2.OK else reply.message.split("\n")[0][:60]
+
+
+class HttpClient:
+    def __init__(self, url: str, timeout_s: float, async_submit: bool = False):
+        import requests
+        self.url = url + ("&" if "?" in url else "?") + "async=1" if async_submit else url
+        self.timeout_s = timeout_s
+        self._requests = requests
+        self._local = threading.local()
+
+    def submit(self, order: Dict) -> Optional[str]:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        try:
+            resp = session.post(self.url, json=order, timeout=self.timeout_s)
+        except Exception as e:
+            return type(e).__name__
+        if resp.status_code == 202:
+            return None
+        if resp.status_code != 200:
+            return f"HTTP {resp.status_code}"
+        body = resp.json()
+        return None if body.get("code") == "OK" else str(body.get("message", "")).split("\n")[0][:60]
+
+
+# ---------- recording / report ----------
+
+class Recorder:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.failures: Dict[str, int] = {}
+        self.first_t = None
+        self.last_t = None
+
+    def record(self, start: float, end: float, failure: Optional[str]):
+        if start < self.warmup_until:
+            return
+        with self._lock:
+            if self.first_t is None or start < self.first_t:
+                self.first_t = start
+            if self.last_t is None or end > self.last_t:
+                self.last_t = end
+            if failure is None:
+                self.latencies.append(end - start)
+            else:
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    k = max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def summarize(rec: Recorder) -> Dict:
+    lat = sorted(rec.latencies)
+    failed = sum(rec.failures.values())
+    elapsed = (rec.last_t - rec.first_t) if rec.first_t is not None else 0.0
+    ms = lambda v: v * 1000.0
+    return {
+        "sent": len(lat) + failed,
+        "ok": len(lat),
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "throughput_per_s": (len(lat) / elapsed) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(lat) / len(lat)) if lat else float("nan"),
+            "p50": ms(percentile(lat, 50)),
+            "p95": ms(percentile(lat, 95)),
+            "p99": ms(percentile(lat, 99)),
+            "p999": ms(percentile(lat, 99.9)),
+            "max": ms(lat[-1]) if lat else float("nan"),
+        },
+        "failures": dict(sorted(rec.failures.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def print_report(summary: Dict, header: str, out=None):
+    out = out or sys.__stdout__
+    lat = summary["latency_ms"]
+    print(header, file=out)
+    print(f"  sent {summary['sent']}  ok {summary['ok']}  failed {summary['failed']}  "
+          f"throughput {summary['throughput_per_s']:.1f} orders/s over {summary['elapsed_s']:.1f}s", file=out)
+    print(f"  latency ms: mean {lat['mean']:.1f}  p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  "
+          f"p99 {lat['p99']:.1f}  p99.9 {lat['p999']:.1f}  max {lat['max']:.1f}", file=out)
+    if summary["failures"]:
+        print(f"  failures: {summary['failures']}", file=out)
+    out.flush()
+
+
+# ---------- load modes ----------
+
+def run_closed(client, source, concurrency: int, duration_s: float, count: int, rec: Recorder):
+    deadline = time.perf_counter() + duration_s
+    remaining = [count] if count else None
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            order = source.next()
+            t0 = time.perf_counter()
+            failure = client.submit(order)
+            rec.record(t0, time.perf_counter(), failure)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open(client, source, rate: float, duration_s: float, count: int, max_in_flight: int,
+             poisson: bool, rec: Recorder, seed: Optional[int] = None):
+    rng = random.Random(seed)
+    pool = futures.ThreadPoolExecutor(max_workers=max_in_flight)
+    start = time.perf_counter()
+    deadline = start + duration_s
+    scheduled = start
+    sent = 0
+
+    def send(order, t_sched):
+        failure = client.submit(order)
+        rec.record(t_sched, time.perf_counter(), failure)
+
+    while scheduled < deadline and (not count or sent < count):
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool.submit(send, source.next(), scheduled)
+        sent += 1
+        scheduled += rng.expovariate(rate) if poisson else 1.0 / rate
+    pool.shutdown(wait=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", default="grpc",
+                    help="http://host:port/submit, grpc://host:port, or with --standin just 'http' / 'grpc'")
+    ap.add_argument("--standin", action="store_true", help="run Inventory, Pricing, robots (and Ordering) in-process")
+    ap.add_argument("--robot_work_scale", type=float, default=0.0,
+                    help="stand-in robots: multiply simulated work time (0 = instant, 1 = real timings)")
+    ap.add_argument("--robot_replicas", type=int, default=1, help="stand-in robots per category")
+    ap.add_argument("--robot_max_in_flight", type=int, default=256,
+                    help="work orders each stand-in robot handles at once")
+    ap.add_argument("--dispatch", choices=["router", "pubsub"], default=None,
+                    help="stand-in work dispatch (default: ROBOT_DISPATCH)")
+    ap.add_argument("--mode", choices=["closed", "open"], default="closed")
+    ap.add_argument("--concurrency", type=int, default=16, help="closed loop: number of clients")
+    ap.add_argument("--rate", type=float, default=50.0, help="open loop: orders per second")
+    ap.add_argument("--poisson", action="store_true", help="open loop: exponential inter-arrival times")
+    ap.add_argument("--max_in_flight", type=int, default=1000, help="open loop: client-side concurrency cap")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds to generate load")
+    ap.add_argument("--count", type=int, default=0, help="stop after this many orders (0 = duration only)")
+    ap.add_argument("--warmup", type=float, default=2.0, help="seconds excluded from the statistics")
+    ap.add_argument("--async_submit", action="store_true",
+                    help="submit asynchronously (202 / StartOrder) and count acceptance as done")
+    ap.add_argument("--timeout", type=float, default=20.0, help="per-order client timeout")
+    ap.add_argument("--orders", help="JSONL file of /submit payloads to replay")
+    ap.add_argument("--mix", help="item weights, e.g. bread=3,milk=1 (default: uniform catalog)")
+    ap.add_argument("--items_per_order", default="1-3", help="range, e.g. 1-3")
+    ap.add_argument("--qty", default="1-2", help="quantity range per item, e.g. 1-2")
+    ap.add_argument("--restock_ratio", type=float, default=0.1, help="fraction of RESTOCK_ORDERs")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--json", dest="json_out", help="also write the summary as JSON to this file")
+    ap.add_argument("--service_log", default=os.devnull, help="stand-in mode: where service output goes")
+    args = ap.parse_args()
+
+    if args.orders:
+        source = JsonlOrders(args.orders)
+    else:
+        source = SyntheticOrders(parse_mix(args.mix), parse_range(args.items_per_order), parse_range(args.qty),
+                                 args.restock_ratio, args.seed)
+
+    with contextlib.ExitStack() as stack:
+        target = args.target
+        if args.standin:
+            from bench.standins import StandInStack
+
+            # Service chatter goes to --service_log; the report goes to the real stdout
+            sys.stdout = stack.enter_context(open(args.service_log, "w"))
+            stack.callback(setattr, sys, "stdout", sys.__stdout__)
+            want_http = target.startswith("http")
+            standin_kwargs = {"dispatch": args.dispatch} if args.dispatch else {}
+            stack_ = stack.enter_context(StandInStack(work_scale=args.robot_work_scale, with_ordering=want_http,
+                                                      robot_replicas=args.robot_replicas,
+                                                      robot_max_in_flight=args.robot_max_in_flight,
+                                                      **standin_kwargs))
+            target = stack_.ordering_url if want_http else f"grpc://{stack_.inventory_addr}"
+
+        if target.startswith("http"):
+            client = HttpClient(target, args.timeout, args.async_submit)
+        elif target.startswith("grpc://"):
+            client = GrpcClient(target[len("grpc://"):], args.timeout, args.async_submit)
+        else:
+            raise SystemExit(f"unsupported target {target!r}")
+
+        rec = Recorder(warmup_until=time.perf_counter() + args.warmup)
+        duration = args.duration + args.warmup
+        if args.mode == "closed":
+            run_closed(client, source, args.concurrency, duration, args.count, rec)
+            header = f"mode=closed concurrency={args.concurrency} target={target}"
+        else:
+            run_open(client, source, args.rate, duration, args.count, args.max_in_flight, args.poisson, rec, args.seed)
+            header = f"mode=open rate={args.rate:g}/s{' poisson' if args.poisson else ''} target={target}"
+
+    summary = summarize(rec)
+    print_report(summary, header)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"args": vars(args), **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
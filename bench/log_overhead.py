@@ -0,0 +1,195 @@
+"""
+Cost of logging on the request path: print() against utils/log.py.
+
+  print    print() of a formatted line, what the services used to do
+  sync     stdlib logging with the JSON formatter on a StreamHandler, so the
+           calling thread formats and writes
+  queue    utils/log.py: the call only enqueues, a background thread writes
+  sampled  utils/log.py with LOG_SAMPLE=<logger>=--sample (1 in 100 by default)
+  off      utils/log.py with the logger's level above the record's (filtered
+           before a record is built)
+
+--threads threads each log one "order received" record per call (the same
+fields Inventory logs) for --duration seconds. Reported per mode: calls/s,
+call latency as the calling thread sees it, records and bytes written, and for
+the queued modes how long the writer took to drain after the last call.
+
+    python -m bench.log_overhead --threads 1,8 --duration 2
+    python -m bench.log_overhead --sink pipe --pipe_mbps 2
+
+--sink file (default) writes to a file opened line-buffered like a
+terminal's stdout; writes to a file are cheap and never block. --sink pipe
+writes to a pipe drained by another process at --pipe_mbps, like a terminal,
+docker logs or a log shipper that can't keep up: once the pipe is full a
+print() blocks its caller, while utils/log.py drops records instead.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils import log as ulog
+
+ITEMS = {"milk": 2, "bread": 1, "eggs": 12}
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+# Reads stdin at a fixed rate and prints the byte count at the end
+_SLOW_READER = """
+import sys, time
+rate = float(sys.argv[1]) * 1e6
+total, t0 = 0, time.monotonic()
+while True:
+    chunk = sys.stdin.buffer.read1(65536)
+    if not chunk:
+        break
+    total += len(chunk)
+    ahead = total / rate - (time.monotonic() - t0)
+    if ahead > 0:
+        time.sleep(ahead)
+print(total)
+"""
+
+
+class Sink:
+    """Where a run's output goes; close() returns (bytes written, newline count or None)."""
+
+    def __init__(self, kind: str, out: str, pipe_mbps: float):
+        self.kind = kind
+        self.out = out
+        if kind == "pipe":
+            self.proc = subprocess.Popen([sys.executable, "-c", _SLOW_READER, str(pipe_mbps)],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self.stream = open(self.proc.stdin.fileno(), "w", buffering=1, closefd=False)
+        else:
+            open(out, "w").close()
+            self.stream = open(out, "a", buffering=1)
+
+    def close(self):
+        self.stream.close()
+        if self.kind == "pipe":
+            self.proc.stdin.close()
+            total = int(self.proc.stdout.read() or 0)
+            self.proc.wait()
+            return total, None
+        with open(self.out, "rb") as f:
+            data = f.read()
+        return len(data), data.count(b"\n")
+
+
+def make_call(mode: str, stream, sample: float):
+    """Returns (call(i), finish()) for one mode; finish() waits for output to be written."""
+    if mode == "print":
+        def call(i):
+            print(f"\n=== Inventory received order request_id=req-{i} type=0 id=customer-1 trace=t{i} ===",
+                  file=stream)
+            print("items:", ITEMS, file=stream)
+        return call, lambda: stream.flush()
+
+    if mode == "sync":
+        logger = logging.getLogger("bench.sync")
+        logger.handlers[:] = []
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(ulog.JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    else:
+        ulog.configure(level="INFO", fmt="json", levels="bench=WARNING" if mode == "off" else "",
+                       sample=f"bench={sample}" if mode == "sampled" else "", stream=stream)
+        logger = ulog.get_logger("bench")
+
+    def call(i):
+        logger.info("order received", extra={"request_id": f"req-{i}", "served_id": "customer-1",
+                                             "type": "GROCERY_ORDER", "items": ITEMS, "trace_id": f"t{i}"})
+
+    return call, ulog.close_logging if mode != "sync" else (lambda: stream.flush())
+
+
+def run(mode: str, n_threads: int, duration_s: float, sink: Sink, sample: float) -> dict:
+    stream = sink.stream
+    call, finish = make_call(mode, stream, sample)
+    stop = time.perf_counter() + duration_s
+    latencies = [[] for _ in range(n_threads)]
+
+    def worker(idx):
+        lat = latencies[idx]
+        i = idx * 10_000_000
+        perf = time.perf_counter
+        while perf() < stop:
+            t0 = perf()
+            call(i)
+            lat.append(perf() - t0)
+            i += 1
+
+    dropped0 = ulog.LOG_DROPPED.labels().value()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    d0 = time.perf_counter()
+    finish()
+    drain_s = time.perf_counter() - d0
+    written, lines = sink.close()
+
+    lat = sorted(x for per in latencies for x in per)
+    # print writes three newlines per order; through a pipe only bytes are counted
+    records = lines // (3 if mode == "print" else 1) if lines is not None else None
+    return {
+        "mode": mode, "threads": n_threads, "calls": len(lat), "calls_per_s": len(lat) / elapsed,
+        "p50_us": percentile(lat, 50) * 1e6, "p99_us": percentile(lat, 99) * 1e6,
+        "max_us": (lat[-1] if lat else 0.0) * 1e6,
+        "records": records, "bytes": written, "drain_s": drain_s,
+        "dropped": ulog.LOG_DROPPED.labels().value() - dropped0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modes", default="print,sync,queue,sampled,off")
+    ap.add_argument("--threads", default="1,8", help="comma-separated thread counts")
+    ap.add_argument("--duration", type=float, default=2.0)
+    ap.add_argument("--sample", type=float, default=0.01, help="fraction kept in the sampled mode")
+    ap.add_argument("--sink", choices=["file", "pipe"], default="file")
+    ap.add_argument("--pipe_mbps", type=float, default=2.0, help="how fast the pipe is drained (MB/s)")
+    ap.add_argument("--out", default=None, help="file the log output goes to (default: a temp file)")
+    ap.add_argument("--json", default=None, help="also write the results here")
+    args = ap.parse_args()
+
+    out = args.out or tempfile.mktemp(prefix="log-bench-")
+    results = []
+    print(f"{'mode':>8} {'threads':>7} {'calls/s':>10} {'p50 us':>8} {'p99 us':>8} {'max us':>9} "
+          f"{'records':>9} {'MB':>7} {'drain s':>7} {'dropped':>7}")
+    for n in (int(x) for x in args.threads.split(",")):
+        for mode in args.modes.split(","):
+            r = run(mode, n, args.duration, Sink(args.sink, out, args.pipe_mbps), args.sample)
+            results.append(r)
+            records = r["records"] if r["records"] is not None else "-"
+            print(f"{mode:>8} {n:>7} {r['calls_per_s']:>10.0f} {r['p50_us']:>8.1f} {r['p99_us']:>8.1f} "
+                  f"{r['max_us']:>9.0f} {records:>9} {r['bytes'] / 1e6:>7.1f} {r['drain_s']:>7.2f} "
+                  f"{r['dropped']:>7.0f}")
+    if not args.out and os.path.exists(out):
+        os.unlink(out)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
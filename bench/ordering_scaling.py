@@ -0,0 +1,200 @@
+"""
+Ordering throughput vs serving mode: the Flask dev server against gunicorn
+(gthread) with 1, 2, 4, ... worker processes.
+
+A backend runs in its own process, either
+
+  null     an Inventory that answers SubmitOrder at once (measures Ordering alone)
+  standin  the in-process stand-in stack (Inventory, Pricing, robots; no PostgreSQL)
+
+then for each serving mode Ordering is started against it, /health is polled
+until it reports ready, and bench.loadgen drives /submit from --clients
+processes (one Python client process tops out long before a multi-core
+Ordering does). Throughputs are summed; latency is the worst client's.
+
+    python -m bench.ordering_scaling --workers 1,2,4 --threads 16 --concurrency 64
+
+Ordering can only scale up to the number of cores left over by the backend
+and the load generators, so run on a machine with a few cores to spare.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench.standins import free_port
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def serve_null(addr: str):
+    """Inventory that accepts every order without doing anything."""
+    from concurrent import futures
+    from generated.proto import grocery_pb2, grocery_pb2_grpc
+    from utils.grpc_channels import server_options
+
+    class NullInventory(grocery_pb2_grpc.InventoryServiceServicer):
+        def SubmitOrder(self, request, context):
+            return grocery_pb2.OrderReply(code=grocery_pb2.OK, message="ok")
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16), options=server_options())
+    grocery_pb2_grpc.add_InventoryServiceServicer_to_server(NullInventory(), server)
+    server.add_insecure_port(addr)
+    server.start()
+    print(f"null Inventory on {addr}", flush=True)
+    server.wait_for_termination()
+
+
+def serve_standin(addr_file: str):
+    from bench.standins import StandInStack
+
+    with StandInStack() as stack:
+        with open(addr_file, "w") as f:
+            f.write(stack.inventory_addr)
+        signal.sigwait([signal.SIGTERM, signal.SIGINT])
+
+
+def start_backend(kind: str, log) -> (subprocess.Popen, str):
+    if kind == "null":
+        addr = f"127.0.0.1:{free_port()}"
+        args = ["--serve_null", addr]
+    else:
+        addr_file = tempfile.mktemp(prefix="standin-addr-")
+        args = ["--serve_standin", addr_file]
+    proc = subprocess.Popen([sys.executable, "-m", "bench.ordering_scaling", *args],
+                            cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+    if kind == "standin":
+        deadline = time.monotonic() + 20
+        while not os.path.exists(addr_file) or not open(addr_file).read():
+            if time.monotonic() > deadline or proc.poll() is not None:
+                raise RuntimeError("stand-in backend did not start")
+            time.sleep(0.1)
+        addr = open(addr_file).read()
+        os.unlink(addr_file)
+    return proc, addr
+
+
+def start_ordering(mode: str, workers: int, threads: int, inventory_addr: str, log) -> (subprocess.Popen, str):
+    port = free_port()
+    env = dict(os.environ, INVENTORY_ADDR=inventory_addr, TRACE_EXPORTER="none", ORDERING_TRACE_EXPORTER="none")
+    if mode == "dev":
+        env["FLASK_APP"] = "services/ordering_flask/app.py"
+        cmd = [sys.executable, "-m", "flask", "run", "--host", "127.0.0.1", "--port", str(port), "--with-threads"]
+    else:
+        env.update(ORDERING_BIND=f"127.0.0.1:{port}", ORDERING_WORKERS=str(workers), ORDERING_THREADS=str(threads))
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "services/ordering_flask/gunicorn.conf.py",
+               "services.ordering_flask.app:app"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_healthy(base_url: str, proc: subprocess.Popen, timeout_s: float = 30.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Ordering exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Ordering never reported ready")
+
+
+def stop(proc: subprocess.Popen):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def drive(base_url: str, clients: int, concurrency: int, duration: float, warmup: float) -> dict:
+    """Run loadgen from several processes at once; returns summed throughput and worst latencies."""
+    procs = []
+    outs = []
+    per_client = max(1, concurrency // clients)
+    for _ in range(clients):
+        out = tempfile.mktemp(prefix="loadgen-", suffix=".json")
+        outs.append(out)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "bench.loadgen", "--target", base_url + "/submit", "--mode", "closed",
+             "--concurrency", str(per_client), "--duration", str(duration), "--warmup", str(warmup),
+             "--restock_ratio", "0", "--json", out],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for p in procs:
+        p.wait()
+    total = {"throughput_per_s": 0.0, "ok": 0, "failed": 0, "p50": 0.0, "p99": 0.0}
+    for out in outs:
+        with open(out) as f:
+            s = json.load(f)
+        os.unlink(out)
+        total["throughput_per_s"] += s["throughput_per_s"]
+        total["ok"] += s["ok"]
+        total["failed"] += s["failed"]
+        total["p50"] = max(total["p50"], s["latency_ms"]["p50"])
+        total["p99"] = max(total["p99"], s["latency_ms"]["p99"])
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=["null", "standin"], default="null")
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated gunicorn worker counts")
+    ap.add_argument("--threads", type=int, default=16, help="threads per gunicorn worker")
+    ap.add_argument("--no_dev", action="store_true", help="skip the 'flask run' baseline")
+    ap.add_argument("--clients", type=int, default=2, help="load generator processes")
+    ap.add_argument("--concurrency", type=int, default=64, help="closed-loop clients in total")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--log", default=os.devnull, help="where backend and Ordering output goes")
+    ap.add_argument("--serve_null", help=argparse.SUPPRESS)
+    ap.add_argument("--serve_standin", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve_null:
+        return serve_null(args.serve_null)
+    if args.serve_standin:
+        return serve_standin(args.serve_standin)
+
+    modes = [] if args.no_dev else [("dev", 1)]
+    modes += [("gunicorn", int(w)) for w in args.workers.split(",")]
+
+    with open(args.log, "a") as log:
+        backend, inventory_addr = start_backend(args.backend, log)
+        try:
+            print(f"backend={args.backend}  cores={os.cpu_count()}  clients={args.clients}  "
+                  f"concurrency={args.concurrency}  threads/worker={args.threads}")
+            print(f"{'server':>10} {'workers':>7} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>6} {'speedup':>7}")
+            base = None
+            for mode, workers in modes:
+                ordering, url = start_ordering(mode, workers, args.threads, inventory_addr, log)
+                try:
+                    wait_healthy(url, ordering)
+                    r = drive(url, args.clients, args.concurrency, args.duration, args.warmup)
+                finally:
+                    stop(ordering)
+                if mode == "gunicorn" and base is None:
+                    base = r["throughput_per_s"]
+                speedup = f"{r['throughput_per_s'] / base:6.2f}x" if mode == "gunicorn" and base else "      -"
+                print(f"{mode:>10} {workers:>7} {r['throughput_per_s']:>9.0f} {r['p50']:>8.1f} {r['p99']:>8.1f} "
+                      f"{r['failed']:>6} {speedup}")
+        finally:
+            stop(backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+In-process stand-ins for running the order pipeline on one box without PostgreSQL.
+
+StandInStack starts, inside the current process:
+  - Pricing gRPC server with prices from the seed catalog (no DB)
+  - Inventory grpc.aio server with in-memory stock and no analytics writes
+  - robot_replicas robots per seed category (real robot loop, simulated work scaled by work_scale)
+  - optionally the Flask Ordering app on a local WSGI server
+All listen on free loopback ports so they never clash with a real deployment.
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+from concurrent import futures
+from typing import Dict, List, Tuple
+
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# No PostgreSQL here, so spans are off unless TRACE_EXPORTER=file is set explicitly
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+from services.inventory_grpc.catalog import Catalog
+from services.inventory_grpc.server import start_inventory
+from services.pricing_grpc.price_cache import PriceCache
+from services.pricing_grpc.server import start_pricing
+from services.inventory_grpc.dispatch import ROBOT_DISPATCH
+from services.robots.robot import ROBOT_MAX_IN_FLIGHT, run_robot
+
+
+# Same catalog and prices as schemas/sql/seed_data.sql
+SEED_PRICES = {
+    "bread": 3.99,
+    "milk": 4.50,
+    "eggs": 5.25,
+    "chicken": 8.99,
+    "beef": 12.99,
+    "apples": 2.99,
+    "bananas": 1.99,
+    "soda": 3.50,
+    "napkins": 4.99,
+}
+
+SEED_CATEGORIES = {
+    "bread": "bread",
+    "milk": "dairy",
+    "eggs": "dairy",
+    "chicken": "meat",
+    "beef": "meat",
+    "apples": "produce",
+    "bananas": "produce",
+    "soda": "party",
+    "napkins": "party",
+}
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class InMemoryReservationEngine:
+    """ReservationEngine stand-in: same all-or-nothing semantics over a dict."""
+
+    def __init__(self, stock: Dict[str, int]):
+        self._lock = threading.Lock()
+        self.stock = dict(stock)
+
+    def reserve(self, items: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        with self._lock:
+            short = [(name, qty, self.stock.get(name, 0)) for name, qty in items.items()
+                     if self.stock.get(name, 0) < qty]
+            if short:
+                return short
+            for name, qty in items.items():
+                self.stock[name] -= qty
+            return []
+
+    def reserve_batch(self, orders: List[Dict[str, int]]) -> List[List[Tuple[str, int, int]]]:
+        return [self.reserve(items) for items in orders]
+
+    def release(self, items: Dict[str, int]):
+        self.restock(items)
+
+    def restock(self, items: Dict[str, int]):
+        with self._lock:
+            for name, qty in items.items():
+                if name in self.stock:
+                    self.stock[name] += qty
+
+    def close(self):
+        pass
+
+
+class NullAnalytics:
+    """AnalyticsWriter stand-in: drops every row."""
+
+    def record(self, request_id, served_id, request_type, start_time, end_time=None):
+        return True
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def static_price_loader(names):
+    return {name: SEED_PRICES[name] for name in names if name in SEED_PRICES}
+
+
+class StandInStack:
+    def __init__(self, work_scale: float = 0.0, initial_stock: int = 10**9, with_ordering: bool = False,
+                 robot_replicas: int = 1, robot_max_in_flight: int = ROBOT_MAX_IN_FLIGHT, dispatch: str = ROBOT_DISPATCH):
+        self.work_scale = work_scale
+        self.initial_stock = initial_stock
+        self.with_ordering = with_ordering
+        self.robot_replicas = robot_replicas
+        self.robot_max_in_flight = robot_max_in_flight
+        self.dispatch = dispatch
+
+        self.inventory_addr = f"127.0.0.1:{free_port()}"
+        self.pricing_addr = f"127.0.0.1:{free_port()}"
+        self.pub_addr = f"tcp://127.0.0.1:{free_port()}"
+        self.router_addr = f"tcp://127.0.0.1:{free_port()}"
+        self.ordering_url = None
+
+        self.reservations = InMemoryReservationEngine({name: initial_stock for name in SEED_PRICES})
+        self._stop = threading.Event()
+        self._threads = []
+        self._loop = None
+        self._inventory = None
+        self._pricing = None
+        self._http = None
+        self._zmq_ctx = zmq.Context()
+
+    def start(self):
+        self._pricing = start_pricing(self.pricing_addr, PriceCache(ttl_s=3600, loader=static_price_loader))
+
+        # Inventory runs on its own event loop thread
+        ready = threading.Event()
+
+        def loop_main():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._inventory = self._loop.run_until_complete(start_inventory(
+                grpc_addr=self.inventory_addr,
+                pub_addr=self.pub_addr,
+                router_addr=self.router_addr,
+                dispatch=self.dispatch,
+                pricing_addr=self.pricing_addr,
+                reservations=self.reservations,
+                analytics=NullAnalytics(),
+                catalog=Catalog(loader=lambda: dict(SEED_CATEGORIES)),
+                db_executor=futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="standin-db"),
+            ))
+            ready.set()
+            self._loop.run_forever()
+
+        t = threading.Thread(target=loop_main, name="standin-inventory", daemon=True)
+        t.start()
+        self._threads.append(t)
+        if not ready.wait(10):
+            raise RuntimeError("stand-in Inventory did not start")
+
+        for name in sorted(set(SEED_CATEGORIES.values())):
+            for replica in range(self.robot_replicas):
+                t = threading.Thread(
+                    target=run_robot,
+                    args=(name, self.pub_addr, self.inventory_addr, self.work_scale, self._stop, self._zmq_ctx),
+                    kwargs={"max_in_flight": self.robot_max_in_flight, "dispatch": self.dispatch,
+                            "work_addr": self.router_addr},
+                    name=f"standin-robot-{name}-{replica}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+        if self.with_ordering:
+            self._start_ordering()
+
+        # Give SUB sockets time to finish subscribing (ZMQ slow-joiner) and replicas time to say READY
+        self._stop.wait(0.5)
+        return self
+
+    def _start_ordering(self):
+        import logging
+        from werkzeug.serving import make_server
+
+        # Per-request access lines would drown the load generator's report
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        os.environ["INVENTORY_ADDR"] = self.inventory_addr
+        from services.ordering_flask import app as ordering
+
+        ordering.INVENTORY_ADDR = self.inventory_addr
+        port = free_port()
+        self._http = make_server("127.0.0.1", port, ordering.app, threaded=True)
+        t = threading.Thread(target=self._http.serve_forever, name="standin-ordering", daemon=True)
+        t.start()
+        self._threads.append(t)
+        self.ordering_url = f"http://127.0.0.1:{port}/submit"
+
+    def stop(self):
+        self._stop.set()
+        if self._http is not None:
+            self._http.shutdown()
+        if self._inventory is not None:
+            asyncio.run_coroutine_threadsafe(self._inventory.stop(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._pricing is not None:
+            self._pricing.stop(0)
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,191 @@
+"""
+Contention benchmark: RobotTracker under many threads.
+
+  global   the original tracker: one threading.Lock, a threading.Event and a
+           set of robot names per order
+  sharded  services/inventory_grpc/tracker.RobotTracker: hash-sharded locks,
+           bitmask per order, callbacks instead of a per-order Event
+
+Every thread runs whole order cycles against the shared tracker: register an
+order for R robots, mark them one by one, wait for completion, clean up. A
+separate set of robot threads can mark orders owned by other threads
+(--cross), which is closer to how results arrive in Inventory.
+
+    python -m bench.tracker_contention --threads 1,4,16,64 --robots 5
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Set
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.inventory_grpc.tracker import RobotTracker
+
+ROBOTS = ["bread", "dairy", "meat", "produce", "party", "frozen", "bakery", "deli"]
+
+
+class GlobalLockTracker:
+    """The tracker as it was before sharding (kept here as the baseline)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, threading.Event] = {}
+        self._seen: Dict[str, Set[str]] = {}
+        self._expected: Dict[str, int] = {}
+
+    def init_request(self, request_id, expected, timeout_s, context=None):
+        with self._lock:
+            self._waiters[request_id] = threading.Event()
+            self._seen[request_id] = set()
+            self._expected[request_id] = len(expected)
+
+    def mark_category(self, request_id, robot_name):
+        with self._lock:
+            seen = self._seen.get(request_id)
+            if seen is None:
+                return False
+            seen.add(robot_name)
+            if len(seen) >= self._expected[request_id]:
+                self._waiters[request_id].set()
+                return True
+            return False
+
+    def wait_all_blocking(self, request_id, timeout_s=None):
+        with self._lock:
+            ev = self._waiters.get(request_id)
+        return ev.wait(timeout_s) if ev else False
+
+    def cleanup(self, request_id):
+        with self._lock:
+            self._waiters.pop(request_id, None)
+            self._seen.pop(request_id, None)
+            self._expected.pop(request_id, None)
+
+    def close(self):
+        pass
+
+
+def run_own(tracker, n_threads: int, robots, duration_s: float) -> float:
+    """Each thread registers, marks and waits for its own orders; returns orders/s."""
+    stop = time.perf_counter() + duration_s
+    counts = [0] * n_threads
+
+    def worker(idx: int):
+        i = 0
+        while time.perf_counter() < stop:
+            for _ in range(100):
+                rid = f"{idx}-{i}"
+                i += 1
+                tracker.init_request(rid, robots, 10.0)
+                for name in robots:
+                    tracker.mark_category(rid, name)
+                tracker.wait_all_blocking(rid, 1.0)
+                tracker.cleanup(rid)
+        counts[idx] = i
+
+    return _run_threads(worker, n_threads, counts)
+
+
+def run_cross(tracker, n_threads: int, robots, duration_s: float) -> float:
+    """Order threads register and wait; one thread per robot marks every order; returns orders/s."""
+    stop = time.perf_counter() + duration_s
+    counts = [0] * n_threads
+    inboxes = [queue.SimpleQueue() for _ in robots]
+
+    def robot(r: int):
+        name = robots[r]
+        inbox = inboxes[r]
+        while True:
+            rid = inbox.get()
+            if rid is None:
+                return
+            tracker.mark_category(rid, name)
+
+    def worker(idx: int):
+        i = 0
+        while time.perf_counter() < stop:
+            rid = f"{idx}-{i}"
+            i += 1
+            tracker.init_request(rid, robots, 10.0)
+            for inbox in inboxes:
+                inbox.put(rid)
+            tracker.wait_all_blocking(rid, 5.0)
+            tracker.cleanup(rid)
+        counts[idx] = i
+
+    robot_threads = [threading.Thread(target=robot, args=(r,)) for r in range(len(robots))]
+    for t in robot_threads:
+        t.start()
+    rate = _run_threads(worker, n_threads, counts)
+    for inbox in inboxes:
+        inbox.put(None)
+    for t in robot_threads:
+        t.join()
+    return rate
+
+
+def _run_threads(worker, n_threads: int, counts) -> float:
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def bytes_per_order(make_tracker, robots, n: int = 20000) -> float:
+    """Memory held per in-flight order with half of its robots answered."""
+    tracker = make_tracker()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(n):
+        rid = f"order-{i:08d}"
+        tracker.init_request(rid, robots, 60.0)
+        for name in robots[:len(robots) // 2]:
+            tracker.mark_category(rid, name)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    tracker.close()
+    # The request ids themselves are shared by both designs and not counted
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename")
+               if not stat.traceback[0].filename.endswith("tracker_contention.py"))
+    return size / n
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", default="1,4,16,64", help="comma-separated thread counts")
+    ap.add_argument("--robots", type=int, default=5, help="robots per order (max 8)")
+    ap.add_argument("--duration", type=float, default=2.0, help="seconds per measurement")
+    ap.add_argument("--cross", action="store_true", help="mark orders from dedicated robot threads")
+    ap.add_argument("--shards", type=int, default=16)
+    args = ap.parse_args()
+
+    robots = ROBOTS[:args.robots]
+    designs = (
+        ("global", GlobalLockTracker),
+        ("sharded", lambda: RobotTracker(shards=args.shards)),
+    )
+    run = run_cross if args.cross else run_own
+
+    print(f"robots/order={len(robots)}  mode={'cross' if args.cross else 'own'}  shards={args.shards}")
+    for label, make in designs:
+        print(f"  {label:>8}: {bytes_per_order(make, robots):7.0f} B per in-flight order")
+    print(f"{'threads':>7} {'global/s':>10} {'sharded/s':>10} {'ratio':>6}")
+    for n in [int(x) for x in args.threads.split(",")]:
+        rates = []
+        for _, make in designs:
+            tracker = make()
+            rates.append(run(tracker, n, robots, args.duration))
+            tracker.close()
+        print(f"{n:>7} {rates[0]:>10.0f} {rates[1]:>10.0f} {rates[1] / rates[0]:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Micro-benchmark: Inventory-side WorkOrder encoding.
+
+  fresh   the previous build_workorder_fb: new Builder(1024) and flatbuffers
+          import per call, names re-encoded, bytes(builder.Output()) (two copies)
+  reused  flatbuffers.Builder kept per thread and reset with Clear(), item
+          names encoded once, one copy out of the builder
+  direct  WorkOrderEncoder (what Inventory uses): writes the WorkOrder layout
+          directly with pre-serialized item names, one bytes object per order
+
+Reports encodes per second and, via tracemalloc, the memory each encode
+allocates: peak transient bytes while encoding, plus blocks/bytes still held
+per order once the payload is kept (as it is until ZMQ has sent it).
+
+    python -m bench.workorder_encode --sizes 1,3,9,100
+"""
+import argparse
+import os
+import sys
+import threading
+import timeit
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import flatbuffers
+
+from groceryfb import ItemQty, RequestType, WorkOrder
+from services.inventory_grpc.workorder_encoder import WorkOrderEncoder
+from services.robots.robot import parse_workorder
+from services.robots.workorder_view import WorkOrderView
+
+CATALOG = ["bread", "milk", "eggs", "chicken", "beef", "apples", "bananas", "soda", "napkins"]
+
+
+def fresh_build_workorder_fb(request_id, request_type, served_id, items, trace_id=None) -> bytes:
+    """build_workorder_fb as it was before WorkOrderEncoder (kept here as the baseline)."""
+    import flatbuffers
+
+    builder = flatbuffers.Builder(1024)
+    return _build(builder, request_id, request_type, served_id, items, trace_id, lambda name: name, True)
+
+
+class ReusedBuilderEncoder:
+    """Per-thread flatbuffers.Builder reset with Clear() between orders, item names encoded once."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._names = {}
+
+    def _name(self, name):
+        encoded = self._names.get(name)
+        if encoded is None:
+            encoded = self._names[name] = name.encode()
+        return encoded
+
+    def encode(self, request_id, request_type, served_id, items, trace_id=None):
+        builder = getattr(self._local, "builder", None)
+        if builder is None:
+            builder = self._local.builder = flatbuffers.Builder(1024)
+        else:
+            builder.Clear()
+        return _build(builder, request_id, request_type, served_id, items, trace_id, self._name, False)
+
+
+def _build(builder, request_id, request_type, served_id, items, trace_id, encode_name, as_bytes):
+    item_offsets = []
+    for name, qty in items.items():
+        name_off = builder.CreateString(encode_name(name))
+        ItemQty.ItemQtyStart(builder)
+        ItemQty.ItemQtyAddName(builder, name_off)
+        ItemQty.ItemQtyAddQty(builder, int(qty))
+        item_offsets.append(ItemQty.ItemQtyEnd(builder))
+
+    WorkOrder.WorkOrderStartItemsVector(builder, len(item_offsets))
+    for off in reversed(item_offsets):
+        builder.PrependUOffsetTRelative(off)
+    items_vec = builder.EndVector()
+
+    rid_off = builder.CreateString(request_id)
+    sid_off = builder.CreateString(served_id)
+    tid_off = builder.CreateString(trace_id) if trace_id else None
+
+    WorkOrder.WorkOrderStart(builder)
+    WorkOrder.WorkOrderAddRequestId(builder, rid_off)
+    WorkOrder.WorkOrderAddRequestType(builder, request_type)
+    WorkOrder.WorkOrderAddId(builder, sid_off)
+    WorkOrder.WorkOrderAddItems(builder, items_vec)
+    if tid_off is not None:
+        WorkOrder.WorkOrderAddTraceId(builder, tid_off)
+    wo = WorkOrder.WorkOrderEnd(builder)
+
+    builder.Finish(wo)
+    if as_bytes:
+        return bytes(builder.Output())
+    # The builder's buffer is reused for the next order, so the message has to be copied out
+    return builder.Bytes[builder.Head():]
+
+
+def make_items(n: int):
+    names = CATALOG + [f"item-{i:05d}" for i in range(max(0, n - len(CATALOG)))]
+    return {name: 1 + i % 3 for i, name in enumerate(names[:n])}
+
+
+def encodes_per_s(fn, args, min_time_s: float) -> float:
+    timer = timeit.Timer(lambda: fn(*args))
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time_s / 0.2))
+    return number / min(timer.repeat(repeat=3, number=number))
+
+
+def allocations(fn, args, orders: int = 1000):
+    """(peak transient bytes of one encode, blocks held per order, bytes held per order)."""
+    fn(*args)  # warm up caches and the per-thread builder
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+
+        before = tracemalloc.take_snapshot()
+        kept = [fn(*args) for _ in range(orders)]
+        after = tracemalloc.take_snapshot()
+        stats = after.compare_to(before, "filename")
+        blocks = sum(s.count_diff for s in stats)
+        size = sum(s.size_diff for s in stats)
+        del kept
+    finally:
+        tracemalloc.stop()
+    # The list holding the payloads is one block and orders * 8 bytes
+    return peak - base, (blocks - 1) / orders, (size - 8 * orders) / orders
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1,3,9,100", help="comma-separated items per order")
+    ap.add_argument("--min_time", type=float, default=0.2, help="seconds per measurement")
+    args = ap.parse_args()
+
+    encoders = (
+        ("fresh", fresh_build_workorder_fb),
+        ("reused", ReusedBuilderEncoder().encode),
+        ("direct", WorkOrderEncoder(CATALOG).encode),
+    )
+    request_id, trace_id = str(uuid.uuid4()), uuid.uuid4().hex
+    gt = RequestType.RequestType.GROCERY_ORDER
+
+    print(f"{'items':>5} {'encoder':>7} {'encodes/s':>10} {'peak B':>8} {'blocks/order':>13} {'B/order':>8}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        call_args = (request_id, gt, "customer-42", make_items(n), trace_id)
+        # Every encoder must produce a WorkOrder that both readers decode identically
+        expected = parse_workorder(fresh_build_workorder_fb(*call_args))
+        for label, fn in encoders:
+            payload = fn(*call_args)
+            assert parse_workorder(payload) == expected, label
+            view = WorkOrderView(payload)
+            assert view.items() == expected[2], label
+            assert (view.request_id(), view.served_id(), view.trace_id()) == (expected[0], expected[1], expected[3])
+        for label, fn in encoders:
+            rate = encodes_per_s(fn, call_args, args.min_time)
+            peak, blocks, size = allocations(fn, call_args)
+            print(f"{n:>5} {label:>7} {rate:>10.0f} {peak:>8} {blocks:>13.1f} {size:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: robot-side WorkOrder handling, full decode vs zero-copy view.
+
+  full  parse_workorder() decodes every item name into a dict, then filters it
+  view  WorkOrderView.select_items() skips names that can't belong to the robot
+
+Orders carry N synthetic items plus (optionally) the robot's own items, so the
+large-N rows show what a robot pays for the items it ignores. (Inventory now
+sends each robot only its own category's items, so this measures filtering a
+mixed order, not the robots' normal path.)
+
+    python -m bench.workorder_parse --sizes 5,100,500 --robot dairy
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from groceryfb import RequestType
+from services.inventory_grpc.server import build_workorder_fb
+from services.robots.robot import parse_workorder
+from services.robots.workorder_view import ItemMatcher, WorkOrderView
+
+# Items per robot, as in schemas/sql/seed_data.sql
+SEED_CATEGORY_ITEMS = {
+    "bread": {"bread"},
+    "dairy": {"milk", "eggs"},
+    "meat": {"chicken", "beef"},
+    "produce": {"apples", "bananas"},
+    "party": {"soda", "napkins"},
+}
+
+
+def make_order(n_items: int, own_items) -> bytes:
+    items = {f"item-{i:05d}": 1 + i % 7 for i in range(n_items)}
+    for name in own_items:
+        items[name] = 2
+    return build_workorder_fb("6f1c2a0e-3b7d-4c55-9a8e-1d2f3a4b5c6d", RequestType.RequestType.GROCERY_ORDER,
+                              "customer-42", items, "0af7651916cd43dd8448eb211c80319c")
+
+
+def full_decode(payload, my_items):
+    request_id, served_id, items, trace_id = parse_workorder(payload)
+    relevant = {k: v for k, v in items.items() if k in my_items}
+    return request_id, served_id, trace_id, relevant
+
+
+def view_decode(payload, matcher):
+    wo = WorkOrderView(payload)
+    relevant = wo.select_items(matcher)
+    return wo.request_id(), wo.served_id(), wo.trace_id(), relevant
+
+
+def time_per_call_us(fn, min_time_s: float) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time_s / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="5,50,200,500", help="comma-separated numbers of foreign items per order")
+    ap.add_argument("--robot", default="dairy", choices=sorted(SEED_CATEGORY_ITEMS))
+    ap.add_argument("--min_time", type=float, default=0.2, help="seconds per measurement")
+    args = ap.parse_args()
+
+    my_items = SEED_CATEGORY_ITEMS[args.robot]
+    matcher = ItemMatcher(my_items)
+
+    print(f"robot={args.robot}  (times are per message)")
+    print(f"{'items':>6} {'own':>4} {'bytes':>7} {'full us':>9} {'view us':>9} {'speedup':>8}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        for own in (sorted(my_items), []):
+            payload = make_order(n, own)
+            # The robot reads straight from the ZMQ frame, i.e. a memoryview
+            frame = memoryview(bytearray(payload))
+            assert full_decode(payload, my_items) == view_decode(frame, matcher)
+
+            full_us = time_per_call_us(lambda: full_decode(payload, my_items), args.min_time)
+            view_us = time_per_call_us(lambda: view_decode(frame, matcher), args.min_time)
+            print(f"{n + len(own):>6} {len(own):>4} {len(payload):>7} {full_us:>9.1f} {view_us:>9.1f} "
+                  f"{full_us / view_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
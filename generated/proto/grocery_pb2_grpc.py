@@ -43,11 +43,41 @@ class InventoryServiceStub(object):
                 request_serializer=grocery__pb2.OrderRequest.SerializeToString,
                 response_deserializer=grocery__pb2.OrderReply.FromString,
                 _registered_method=True)
+        self.SubmitOrders = channel.unary_stream(
+                '/grocery.InventoryService/SubmitOrders',
+                request_serializer=grocery__pb2.OrderBatch.SerializeToString,
+                response_deserializer=grocery__pb2.BatchOrderReply.FromString,
+                _registered_method=True)
+        self.StartOrder = channel.unary_unary(
+                '/grocery.InventoryService/StartOrder',
+                request_serializer=grocery__pb2.OrderRequest.SerializeToString,
+                response_deserializer=grocery__pb2.OrderStatus.FromString,
+                _registered_method=True)
+        self.GetOrderStatus = channel.unary_unary(
+                '/grocery.InventoryService/GetOrderStatus',
+                request_serializer=grocery__pb2.OrderStatusRequest.SerializeToString,
+                response_deserializer=grocery__pb2.OrderStatus.FromString,
+                _registered_method=True)
+        self.WatchOrder = channel.unary_stream(
+                '/grocery.InventoryService/WatchOrder',
+                request_serializer=grocery__pb2.OrderStatusRequest.SerializeToString,
+                response_deserializer=grocery__pb2.OrderStatus.FromString,
+                _registered_method=True)
         self.ReportRobotResult = channel.unary_unary(
                 '/grocery.InventoryService/ReportRobotResult',
                 request_serializer=grocery__pb2.RobotResult.SerializeToString,
                 response_deserializer=grocery__pb2.Ack.FromString,
                 _registered_method=True)
+        self.RobotSession = channel.stream_stream(
+                '/grocery.InventoryService/RobotSession',
+                request_serializer=grocery__pb2.RobotUpdate.SerializeToString,
+                response_deserializer=grocery__pb2.SessionControl.FromString,
+                _registered_method=True)
+        self.RobotHeartbeat = channel.unary_unary(
+                '/grocery.InventoryService/RobotHeartbeat',
+                request_serializer=grocery__pb2.RobotHeartbeatRequest.SerializeToString,
+                response_deserializer=grocery__pb2.Ack.FromString,
+                _registered_method=True)
 
 
 class InventoryServiceServicer(object):
@@ -63,12 +93,51 @@ class InventoryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SubmitOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StartOrder(self, request, context):
+        """Accept an order and return right away (ORDER_PENDING), or ORDER_DONE if it was rejected up front
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetOrderStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchOrder(self, request, context):
+        """Current status, then the final one when the order finishes
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ReportRobotResult(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RobotSession(self, request_iterator, context):
+        """Long-lived per-robot stream: batched results up, credits and heartbeats down
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RobotHeartbeat(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_InventoryServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -77,11 +146,41 @@ def add_InventoryServiceServicer_to_server(servicer, server):
                     request_deserializer=grocery__pb2.OrderRequest.FromString,
                     response_serializer=grocery__pb2.OrderReply.SerializeToString,
             ),
+            'SubmitOrders': grpc.unary_stream_rpc_method_handler(
+                    servicer.SubmitOrders,
+                    request_deserializer=grocery__pb2.OrderBatch.FromString,
+                    response_serializer=grocery__pb2.BatchOrderReply.SerializeToString,
+            ),
+            'StartOrder': grpc.unary_unary_rpc_method_handler(
+                    servicer.StartOrder,
+                    request_deserializer=grocery__pb2.OrderRequest.FromString,
+                    response_serializer=grocery__pb2.OrderStatus.SerializeToString,
+            ),
+            'GetOrderStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetOrderStatus,
+                    request_deserializer=grocery__pb2.OrderStatusRequest.FromString,
+                    response_serializer=grocery__pb2.OrderStatus.SerializeToString,
+            ),
+            'WatchOrder': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchOrder,
+                    request_deserializer=grocery__pb2.OrderStatusRequest.FromString,
+                    response_serializer=grocery__pb2.OrderStatus.SerializeToString,
+            ),
             'ReportRobotResult': grpc.unary_unary_rpc_method_handler(
                     servicer.ReportRobotResult,
                     request_deserializer=grocery__pb2.RobotResult.FromString,
                     response_serializer=grocery__pb2.Ack.SerializeToString,
             ),
+            'RobotSession': grpc.stream_stream_rpc_method_handler(
+                    servicer.RobotSession,
+                    request_deserializer=grocery__pb2.RobotUpdate.FromString,
+                    response_serializer=grocery__pb2.SessionControl.SerializeToString,
+            ),
+            'RobotHeartbeat': grpc.unary_unary_rpc_method_handler(
+                    servicer.RobotHeartbeat,
+                    request_deserializer=grocery__pb2.RobotHeartbeatRequest.FromString,
+                    response_serializer=grocery__pb2.Ack.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'grocery.InventoryService', rpc_method_handlers)
@@ -124,6 +223,114 @@ class InventoryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SubmitOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/grocery.InventoryService/SubmitOrders',
+            grocery__pb2.OrderBatch.SerializeToString,
+            grocery__pb2.BatchOrderReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StartOrder(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/grocery.InventoryService/StartOrder',
+            grocery__pb2.OrderRequest.SerializeToString,
+            grocery__pb2.OrderStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetOrderStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/grocery.InventoryService/GetOrderStatus',
+            grocery__pb2.OrderStatusRequest.SerializeToString,
+            grocery__pb2.OrderStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchOrder(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/grocery.InventoryService/WatchOrder',
+            grocery__pb2.OrderStatusRequest.SerializeToString,
+            grocery__pb2.OrderStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ReportRobotResult(request,
             target,
@@ -151,6 +358,60 @@ class InventoryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def RobotSession(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/grocery.InventoryService/RobotSession',
+            grocery__pb2.RobotUpdate.SerializeToString,
+            grocery__pb2.SessionControl.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RobotHeartbeat(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/grocery.InventoryService/RobotHeartbeat',
+            grocery__pb2.RobotHeartbeatRequest.SerializeToString,
+            grocery__pb2.Ack.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class PricingServiceStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -70,7 +70,14 @@ class WorkOrder(object):
         o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(10))
         return o == 0
 
-def WorkOrderStart(builder): builder.StartObject(4)
+    # WorkOrder
+    def TraceId(self):
+        o = flatbuffers.number_types.UOffsetTFlags.py_type(self._tab.Offset(12))
+        if o != 0:
+            return self._tab.String(o + self._tab.Pos)
+        return None
+
+def WorkOrderStart(builder): builder.StartObject(5)
 def Start(builder):
     return WorkOrderStart(builder)
 def WorkOrderAddRequestId(builder, requestId): builder.PrependUOffsetTRelativeSlot(0, flatbuffers.number_types.UOffsetTFlags.py_type(requestId), 0)
@@ -88,6 +95,9 @@ def AddItems(builder, items):
 def WorkOrderStartItemsVector(builder, numElems): return builder.StartVector(4, numElems, 4)
 def StartItemsVector(builder, numElems):
     return WorkOrderStartItemsVector(builder, numElems)
+def WorkOrderAddTraceId(builder, traceId): builder.PrependUOffsetTRelativeSlot(4, flatbuffers.number_types.UOffsetTFlags.py_type(traceId), 0)
+def AddTraceId(builder, traceId):
+    return WorkOrderAddTraceId(builder, traceId)
 def WorkOrderEnd(builder): return builder.EndObject()
 def End(builder):
     return WorkOrderEnd(builder)
\ No newline at end of file
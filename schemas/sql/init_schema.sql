@@ -1,6 +1,8 @@
 -- PostgreSQL Database Schema for Grocery Ordering System
 
 -- Drop tables if they exist
+DROP TABLE IF EXISTS inventory_checkpoint CASCADE;
+DROP TABLE IF EXISTS analytics_spans CASCADE;
 DROP TABLE IF EXISTS analytics CASCADE;
 DROP TABLE IF EXISTS pricing CASCADE;
 DROP TABLE IF EXISTS items CASCADE;
@@ -37,6 +39,30 @@ CREATE TABLE analytics (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Per-stage timings of a request (utils/tracing.py). All spans of one order
+-- share a trace_id, generated by Ordering and propagated to Inventory, Robots and Pricing.
+CREATE TABLE analytics_spans (
+    id BIGSERIAL PRIMARY KEY,
+    trace_id VARCHAR(64) NOT NULL,
+    request_id VARCHAR(255),           -- Inventory request_id (NULL for spans recorded before it exists)
+    service VARCHAR(50) NOT NULL,      -- ordering, inventory, pricing
+    stage VARCHAR(100) NOT NULL,       -- e.g. inventory.reserve, robot.dairy, pricing.get_price
+    start_time TIMESTAMP NOT NULL,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    attrs JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_analytics_spans_trace_id ON analytics_spans (trace_id);
+
+-- Inventory stock cache (services/inventory_grpc/stock_cache.py): last journal
+-- record whose delta has been written to items, per journal.
+CREATE TABLE inventory_checkpoint (
+    journal VARCHAR(100) PRIMARY KEY,
+    seq BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Trigger to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -48,3 +74,28 @@ $$ language 'plpgsql';
 
 CREATE TRIGGER update_items_updated_at BEFORE UPDATE ON items
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+
+-- Notify listeners (Pricing service price cache) when an item's price changes.
+-- Payload is the item name (empty if unknown, meaning "invalidate everything").
+CREATE OR REPLACE FUNCTION notify_pricing_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_item_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_item_id := OLD.item_id;
+    ELSE
+        changed_item_id := NEW.item_id;
+    END IF;
+    PERFORM pg_notify('pricing_changed', COALESCE((SELECT name FROM items WHERE id = changed_item_id), ''));
+    -- A price row moved to another item: the old item's cached price is stale too
+    IF TG_OP = 'UPDATE' AND OLD.item_id IS DISTINCT FROM NEW.item_id THEN
+        PERFORM pg_notify('pricing_changed', COALESCE((SELECT name FROM items WHERE id = OLD.item_id), ''));
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER pricing_changed_notify AFTER INSERT OR UPDATE OR DELETE ON pricing
+    FOR EACH ROW EXECUTE FUNCTION notify_pricing_changed();
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import psycopg2
@@ -66,27 +67,115 @@ def write_summary(df):
         f.write("Latency Summary Statistics\n\n")
         f.write(str(summary))
 
+# -------------------------
+# LOAD SPAN DATA (per-stage traces, see utils/tracing.py)
+# -------------------------
+def load_span_data(spans_file=None):
+    if spans_file:
+        # TRACE_EXPORTER=file output: one JSON span per line
+        df = pd.read_json(spans_file, lines=True)
+        if df.empty:
+            return df
+        df["start_time"] = pd.to_datetime(df["start_ts"], unit="s")
+    else:
+        query = """
+            SELECT trace_id, stage, start_time, duration_ms
+            FROM analytics_spans
+            ORDER BY start_time;
+        """
+        conn = get_db_connection()
+        df = pd.read_sql(query, conn)
+        conn.close()
+        if df.empty:
+            return df
+
+    # Offset of each span from the first span of its trace
+    first = df.groupby("trace_id")["start_time"].transform("min")
+    df["offset_ms"] = (df["start_time"] - first).dt.total_seconds() * 1000.0
+    df["end_ms"] = df["offset_ms"] + df["duration_ms"]
+    return df[["trace_id", "stage", "offset_ms", "duration_ms", "end_ms"]]
+
+# -------------------------
+# WATERFALL (mean start offset and duration of each stage)
+# -------------------------
+def plot_waterfall(spans, filename, title):
+    stages = spans.groupby("stage").agg(offset_ms=("offset_ms", "mean"), duration_ms=("duration_ms", "mean"))
+    stages = stages.sort_values("offset_ms")
+
+    plt.figure(figsize=(10, 1.5 + 0.4 * len(stages)))
+    plt.barh(stages.index, stages["duration_ms"], left=stages["offset_ms"])
+    plt.gca().invert_yaxis()
+    plt.title(title)
+    plt.xlabel("Time since trace start (ms)")
+    plt.tight_layout()
+    plt.savefig(filename)
+    plt.close()
+
+# -------------------------
+# STAGE SUMMARY
+# -------------------------
+def write_stage_summary(spans, slow_traces):
+    order = spans.groupby("stage")["offset_ms"].mean().sort_values().index
+    summary = spans.groupby("stage")["duration_ms"].describe(percentiles=[0.5, 0.95, 0.99]).reindex(order)
+    slow = spans[spans["trace_id"].isin(slow_traces)]
+    slow_summary = slow.groupby("stage")["duration_ms"].describe(percentiles=[0.5]).reindex(order).dropna(how="all")
+
+    with open("latency_stages.txt", "w") as f:
+        f.write("Per-Stage Latency (ms)\n\n")
+        f.write(summary.to_string(float_format="%.1f"))
+        f.write(f"\n\nSlowest 1% of traces ({len(slow_traces)} traces)\n\n")
+        f.write(slow_summary.to_string(float_format="%.1f"))
+
+def report_stages(spans):
+    # End-to-end time of a trace: end of its last span
+    totals = spans.groupby("trace_id")["end_ms"].max()
+    slow_traces = totals[totals >= totals.quantile(0.99)].index
+
+    plot_waterfall(spans, "latency_waterfall.png", f"Stage Breakdown, mean of {len(totals)} traces")
+    plot_waterfall(spans[spans["trace_id"].isin(slow_traces)], "latency_waterfall_p99.png",
+                   f"Stage Breakdown, slowest 1% ({len(slow_traces)} traces)")
+    write_stage_summary(spans, slow_traces)
+
 # -------------------------
 # MAIN
 # -------------------------
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--spans_file", help="read spans from a TRACE_EXPORTER=file JSONL file instead of analytics_spans")
+    args = ap.parse_args()
+
+    generated = []
     print("Loading latency data from database...")
-    df = load_latency_data()
+    try:
+        df = load_latency_data()
+    except Exception as e:
+        if not args.spans_file:
+            raise
+        print(f"Skipping analytics table ({e})")
+        df = pd.DataFrame()
 
     if df.empty:
         print("No latency data found in analytics table.")
-        return
-
-    print("Generating plots...")
-    plot_histogram(df)
-    plot_boxplot(df)
-    write_summary(df)
-
-    print("Done!")
-    print("Generated:")
-    print(" - latency_histogram.png")
-    print(" - latency_boxplot.png")
-    print(" - latency_summary.txt")
+    else:
+        print("Generating plots...")
+        plot_histogram(df)
+        plot_boxplot(df)
+        write_summary(df)
+        generated += ["latency_histogram.png", "latency_boxplot.png", "latency_summary.txt"]
+
+    print("Loading span data...")
+    spans = load_span_data(args.spans_file)
+    if spans.empty:
+        print("No span data found.")
+    else:
+        report_stages(spans)
+        generated += ["latency_waterfall.png", "latency_waterfall_p99.png", "latency_stages.txt"]
+
+    if generated:
+        print("Done!")
+        print("Generated:")
+        for name in generated:
+            print(f" - {name}")
 
 if __name__ == "__main__":
     main()
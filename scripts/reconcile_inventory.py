@@ -0,0 +1,63 @@
+"""
+Compare items.quantity with the Inventory stock-cache journal (INVENTORY_CACHE=1).
+
+Prints, per item, the database quantity, the journal deltas not yet written to
+the database (records past inventory_checkpoint), and the quantity Inventory
+holds / will load on its next start. Read-only by default, so it is safe while
+Inventory runs.
+
+--apply writes those deltas to items, moves the checkpoint and deletes the
+journal segments, which is what Inventory does on startup. Only use it while
+Inventory is stopped: a running Inventory would write the same deltas again.
+
+Usage (from repository root):
+    export $(grep -v '^#' .env | xargs)
+    python scripts/reconcile_inventory.py [--dir journal] [--name inventory] [--apply]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.db import close_pool
+from services.inventory_grpc.stock_cache import (
+    INVENTORY_JOURNAL_DIR, INVENTORY_JOURNAL_NAME, StockJournal, load_checkpoint, load_stock, recover_journal,
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=INVENTORY_JOURNAL_DIR, help="journal directory (INVENTORY_JOURNAL_DIR)")
+    ap.add_argument("--name", default=INVENTORY_JOURNAL_NAME, help="journal name (INVENTORY_JOURNAL_NAME)")
+    ap.add_argument("--apply", action="store_true", help="write unapplied deltas to items (Inventory stopped!)")
+    args = ap.parse_args()
+
+    journal = StockJournal(args.dir, args.name)
+    try:
+        checkpoint = load_checkpoint(args.name)
+        stock = load_stock()
+        segments = journal.segments()
+        last_seq, unapplied = recover_journal(journal, apply=False)
+
+        print(f"journal {args.name!r} in {args.dir}: {len(segments)} segments, checkpoint seq={checkpoint}, "
+              f"last seq={last_seq}")
+        print(f"{'item':<16} {'db':>8} {'journal':>8} {'effective':>9}")
+        for name in sorted(set(stock) | set(unapplied)):
+            db = stock.get(name)
+            delta = unapplied.get(name, 0)
+            effective = (db or 0) + delta
+            flag = "  (not in items)" if db is None else ("  (would go negative)" if effective < 0 else "")
+            print(f"{name:<16} {db if db is not None else '-':>8} {delta:>+8} {effective:>9}{flag}")
+
+        if not any(unapplied.values()):
+            print("database is up to date with the journal")
+        if args.apply and segments:
+            recover_journal(journal, apply=True)
+            print(f"applied journal up to seq={last_seq}, removed {len(segments)} segments")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Concurrency stress test for the Inventory reservation engine.
+
+Runs many threads submitting GROCERY reservations (and releasing a fraction of
+them, like a robot timeout would) directly against PostgreSQL, then checks:
+  - items.quantity never goes negative
+  - final stock == starting stock - reserved + released (no oversell, no lost updates)
+
+It also reports orders/s and items/s for several order sizes.
+Original item quantities are restored when the run finishes.
+
+Usage (from repository root):
+    export $(grep -v '^#' .env | xargs)
+    python scripts/stress_reservation.py --threads 16 --orders 400
+    python scripts/stress_reservation.py --threads 16 --orders 400 --cache
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.db import get_db_connection, get_pool, close_pool
+from services.inventory_grpc.reservation import ReservationEngine
+from services.inventory_grpc.stock_cache import StockCache, StockJournal
+
+
+def read_stock():
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT name, quantity FROM items ORDER BY name")
+        return dict(cur.fetchall())
+
+
+def set_stock(stock):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        for name, qty in stock.items():
+            cur.execute("UPDATE items SET quantity = %s WHERE name = %s", (qty, name))
+
+
+def run_round(make_engine, names, order_size, threads, orders_per_thread, release_ratio, start_qty):
+    set_stock({name: start_qty for name in names})
+    engine = make_engine()
+
+    lock = threading.Lock()
+    reserved = {name: 0 for name in names}
+    released = {name: 0 for name in names}
+    counts = {"ok": 0, "short": 0, "error": 0}
+    min_seen = [start_qty]
+    stop = threading.Event()
+
+    def watcher():
+        # Sample stock while the workers run; a negative value is an oversell.
+        while not stop.is_set():
+            lowest = min(read_stock().values())
+            with lock:
+                min_seen[0] = min(min_seen[0], lowest)
+            time.sleep(0.01)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(orders_per_thread):
+            order = {name: rng.randint(1, 3) for name in rng.sample(names, order_size)}
+            try:
+                shortfalls = engine.reserve(order)
+            except Exception:
+                with lock:
+                    counts["error"] += 1
+                continue
+            if shortfalls:
+                with lock:
+                    counts["short"] += 1
+                continue
+            give_back = rng.random() < release_ratio
+            if give_back:
+                engine.release(order)
+            with lock:
+                counts["ok"] += 1
+                for name, qty in order.items():
+                    reserved[name] += qty
+                    if give_back:
+                        released[name] += qty
+
+    w = threading.Thread(target=watcher, daemon=True)
+    w.start()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    # The stock cache writes its last deltas back here
+    engine.close()
+    stop.set()
+    w.join()
+
+    final = read_stock()
+    problems = []
+    for name in names:
+        expected = start_qty - reserved[name] + released[name]
+        if final[name] != expected:
+            problems.append(f"{name}: expected {expected}, found {final[name]}")
+        if final[name] < 0:
+            problems.append(f"{name}: negative quantity {final[name]}")
+    if min_seen[0] < 0:
+        problems.append(f"observed negative quantity {min_seen[0]} during run")
+
+    total = threads * orders_per_thread
+    return {
+        "order_size": order_size,
+        "orders": total,
+        "ok": counts["ok"],
+        "short": counts["short"],
+        "errors": counts["error"],
+        "orders_per_s": total / elapsed,
+        "items_per_s": total * order_size / elapsed,
+        "problems": problems,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--orders", type=int, default=200, help="orders per thread per round")
+    ap.add_argument("--sizes", default="1,3,9", help="comma-separated items per order")
+    ap.add_argument("--start_qty", type=int, default=500, help="stock per item at the start of each round")
+    ap.add_argument("--release_ratio", type=float, default=0.2, help="fraction of reservations given back")
+    ap.add_argument("--cache", action="store_true",
+                    help="reserve through the in-memory StockCache (journal in a temp dir) instead of SQL")
+    args = ap.parse_args()
+
+    os.environ.setdefault("DB_POOL_MAX", str(args.threads + 2))
+    if args.cache:
+        journal_dir = tempfile.mkdtemp(prefix="stress-journal-")
+        make_engine = lambda: StockCache(StockJournal(journal_dir, "stress")).start()
+    else:
+        make_engine = ReservationEngine
+    original = read_stock()
+    names = sorted(original)
+    failed = False
+
+    try:
+        print(f"{'items/order':>11} {'orders':>7} {'ok':>6} {'short':>6} {'err':>4} {'orders/s':>9} {'items/s':>9}")
+        for size in [int(x) for x in args.sizes.split(",")]:
+            size = min(size, len(names))
+            r = run_round(make_engine, names, size, args.threads, args.orders, args.release_ratio, args.start_qty)
+            print(f"{r['order_size']:>11} {r['orders']:>7} {r['ok']:>6} {r['short']:>6} {r['errors']:>4} "
+                  f"{r['orders_per_s']:>9.0f} {r['items_per_s']:>9.0f}")
+            for p in r["problems"]:
+                failed = True
+                print(f"  FAIL {p}")
+    finally:
+        set_stock(original)
+        print(f"pool: {get_pool().stats()}")
+        close_pool()
+
+    if failed:
+        raise SystemExit(1)
+    print("PASS: no negative stock, final quantities match reservations")
+
+
+if __name__ == "__main__":
+    main()
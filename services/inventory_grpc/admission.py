@@ -0,0 +1,162 @@
+import asyncio
+import collections
+import os
+import time
+
+import grpc
+
+
+# Orders Inventory works on at once (reserving, or waiting for robots); 0 = no limit
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "2000"))
+# Orders allowed to wait for a slot, and for how long, before being turned away
+ADMISSION_QUEUE_MAX = int(os.environ.get("ADMISSION_QUEUE_MAX", "1000"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_S", "1.0"))
+# Don't start DB work for a caller with less time than this left on its gRPC deadline
+ADMISSION_MIN_REMAINING_S = float(os.environ.get("ADMISSION_MIN_REMAINING_S", "0.05"))
+# Suggested back-off sent to rejected callers (trailing metadata retry-after, seconds)
+ADMISSION_RETRY_AFTER_S = int(os.environ.get("ADMISSION_RETRY_AFTER_S", "1"))
+
+
+class AdmissionRejected(Exception):
+    """An order turned away; code is the gRPC status to abort the call with."""
+
+    def __init__(self, code: grpc.StatusCode, message: str, retry_after_s: int = None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after_s = retry_after_s
+
+    def trailing_metadata(self):
+        return (("retry-after", str(self.retry_after_s)),) if self.retry_after_s else ()
+
+
+class AdmissionController:
+    """
+    Bounds how many orders Inventory works on at once.
+
+    - acquire() takes slots right away while fewer than max_in_flight are
+      taken; otherwise the caller waits in a FIFO queue of at most max_queue.
+    - A queued caller gives up after queue_timeout_s, or sooner if its own
+      gRPC deadline would pass first. A full queue rejects at once, so under
+      overload callers get a fast RESOURCE_EXHAUSTED instead of a timeout.
+    - check_deadline() refuses callers too close to their deadline for the
+      work to be worth starting.
+    Lives on the event loop; no locking.
+    """
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_QUEUE_MAX,
+                 queue_timeout_s: float = ADMISSION_QUEUE_TIMEOUT_S,
+                 min_remaining_s: float = ADMISSION_MIN_REMAINING_S, retry_after_s: int = ADMISSION_RETRY_AFTER_S):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.min_remaining_s = min_remaining_s
+        self.retry_after_s = retry_after_s
+        self.in_flight = 0
+        self._waiters = collections.deque()   # [weight, future, queued at] in arrival order
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+        self.rejected_deadline = 0
+        self.queue_wait_max_s = 0.0
+
+    def check_deadline(self, time_remaining):
+        """Raise AdmissionRejected(DEADLINE_EXCEEDED) if the caller has (almost) no time left."""
+        if time_remaining is not None and time_remaining < self.min_remaining_s:
+            self.rejected_deadline += 1
+            raise AdmissionRejected(grpc.StatusCode.DEADLINE_EXCEEDED,
+                                    f"Deadline too close to start the order ({time_remaining * 1000:.0f} ms left)")
+
+    async def acquire(self, weight: int = 1, time_remaining: float = None):
+        """Take weight slots (a batch takes one per order, at most max_in_flight), waiting in line if needed."""
+        self.check_deadline(time_remaining)
+        if self.max_in_flight <= 0:
+            self.in_flight += weight
+            self.admitted += 1
+            return weight
+        weight = max(1, min(weight, self.max_in_flight))
+        if not self._waiters and self.in_flight + weight <= self.max_in_flight:
+            self.in_flight += weight
+            self.admitted += 1
+            return weight
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                    f"Inventory overloaded: {self.in_flight} orders in flight, "
+                                    f"{len(self._waiters)} queued", self.retry_after_s)
+
+        timeout = self.queue_timeout_s
+        if time_remaining is not None:
+            timeout = min(timeout, time_remaining - self.min_remaining_s)
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        waiter = [weight, loop.create_future(), started]
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        expiry = loop.call_later(max(0.0, timeout), self._expire, waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            # The caller went away; hand back a slot granted in the meantime, or leave the line
+            fut = waiter[1]
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self.release(weight)
+            else:
+                self._leave(waiter)
+            raise
+        finally:
+            expiry.cancel()
+            self.queue_wait_max_s = max(self.queue_wait_max_s, time.monotonic() - started)
+        return weight
+
+    def release(self, weight: int = 1):
+        self.in_flight = max(0, self.in_flight - weight)
+        self._grant()
+
+    def _grant(self):
+        waiters = self._waiters
+        while waiters:
+            weight, fut, _ = waiters[0]
+            if fut.done():
+                waiters.popleft()
+                continue
+            if self.max_in_flight > 0 and self.in_flight + weight > self.max_in_flight:
+                return
+            waiters.popleft()
+            self.in_flight += weight
+            self.admitted += 1
+            fut.set_result(None)
+
+    def _leave(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        # A big batch at the head may have been holding up smaller orders behind it
+        self._grant()
+
+    def _expire(self, waiter):
+        fut = waiter[1]
+        if fut.done():
+            return
+        self.rejected_queue_timeout += 1
+        fut.set_exception(AdmissionRejected(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                            f"Inventory overloaded: no slot freed up in "
+                                            f"{time.monotonic() - waiter[2]:.2f}s", self.retry_after_s))
+        self._leave(waiter)
+
+    def rejected(self) -> int:
+        return self.rejected_queue_full + self.rejected_queue_timeout + self.rejected_deadline
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_queue_timeout": self.rejected_queue_timeout,
+            "rejected_deadline": self.rejected_deadline,
+            "queue_wait_max_ms": self.queue_wait_max_s * 1000.0,
+        }
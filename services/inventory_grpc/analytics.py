@@ -0,0 +1,58 @@
+import os
+from typing import Optional
+
+from psycopg2.extras import execute_values
+
+from utils.batch_writer import BatchWriter
+from utils.db import get_db_connection
+
+
+ANALYTICS_QUEUE_SIZE = int(os.environ.get("ANALYTICS_QUEUE_SIZE", "10000"))
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", "500"))
+ANALYTICS_FLUSH_INTERVAL_S = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL_S", "1.0"))
+
+ANALYTICS_INSERT_SQL = """
+INSERT INTO analytics (request_id, served_id, request_type, start_time, end_time, total_duration_ms)
+VALUES %s
+"""
+
+
+def write_analytics_rows(rows):
+    """Insert a batch of finished-order rows with one multi-row INSERT."""
+    with get_db_connection(autocommit=True, op="analytics_insert") as conn:
+        execute_values(conn.cursor(), ANALYTICS_INSERT_SQL, rows,
+                       template="(%s, %s, %s, to_timestamp(%s), to_timestamp(%s), %s)", page_size=len(rows))
+
+
+class AnalyticsWriter:
+    """
+    Writes one analytics row per order, off the request path.
+
+    record() is called once the order is finished and only queues the row;
+    a background BatchWriter inserts queued rows in batches. If the queue is
+    full the row is dropped and counted in stats()['dropped'].
+    """
+    def __init__(self, writer: BatchWriter = None):
+        self.writer = writer or BatchWriter(
+            write_analytics_rows,
+            name="analytics-writer",
+            max_queue=ANALYTICS_QUEUE_SIZE,
+            max_batch=ANALYTICS_BATCH_SIZE,
+            flush_interval_s=ANALYTICS_FLUSH_INTERVAL_S,
+        )
+
+    def record(self, request_id: str, served_id: str, request_type: str,
+               start_time: float, end_time: Optional[float] = None) -> bool:
+        """
+        Queue the row for one order. Times are epoch seconds; end_time is None for
+        orders that did not complete (rejected or timed out), as before.
+        """
+        duration_ms = int((end_time - start_time) * 1000) if end_time is not None else None
+        return self.writer.submit((request_id, served_id, request_type, start_time, end_time, duration_ms))
+
+    def stats(self):
+        return self.writer.stats()
+
+    def close(self):
+        """Write out queued rows and stop the background writer."""
+        self.writer.close()
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+from utils.db import get_db_connection
+
+
+ITEM_CATEGORIES_SQL = "SELECT name, category FROM items"
+
+
+def load_item_categories() -> Dict[str, str]:
+    """item name -> category, from the items table."""
+    with get_db_connection(op="catalog_load") as conn:
+        cur = conn.cursor()
+        cur.execute(ITEM_CATEGORIES_SQL)
+        return dict(cur.fetchall())
+
+
+def work_topic(kind: bytes, category: str) -> bytes:
+    """ZMQ topic for one category's work, e.g. b'FETCH.dairy'."""
+    return kind + b"." + category.encode()
+
+
+class Catalog:
+    """
+    Item -> category map that decides which robot gets which items.
+
+    Loaded from items.category at startup. An order naming an unknown item
+    triggers a reload (at most once per refresh_interval_s), so items added to
+    the table later are picked up without a restart.
+    """
+    def __init__(self, loader=load_item_categories, refresh_interval_s: float = 5.0):
+        self.loader = loader
+        self.refresh_interval_s = refresh_interval_s
+        self._lock = threading.Lock()
+        self._categories: Dict[str, str] = {}
+        self._loaded_at = None
+
+    def load(self):
+        categories = self.loader()
+        with self._lock:
+            self._categories = categories
+            self._loaded_at = time.monotonic()
+
+    def refresh_if_stale(self) -> bool:
+        """Reload unless the last load was under refresh_interval_s ago; True if reloaded."""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval_s:
+            return False
+        self.load()
+        return True
+
+    def names(self) -> List[str]:
+        return list(self._categories)
+
+    def categories(self) -> Set[str]:
+        return set(self._categories.values())
+
+    def split(self, items: Dict[str, int]) -> Tuple[Dict[str, Dict[str, int]], List[str]]:
+        """Group an order's items by category; returns (category -> items, unknown item names)."""
+        categories = self._categories
+        by_category: Dict[str, Dict[str, int]] = {}
+        unknown = []
+        for name, qty in items.items():
+            category = categories.get(name)
+            if category is None:
+                unknown.append(name)
+            else:
+                by_category.setdefault(category, {})[name] = qty
+        return by_category, unknown
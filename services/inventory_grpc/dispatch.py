@@ -0,0 +1,388 @@
+"""
+How WorkOrders reach the robots (ROBOT_DISPATCH).
+
+Every WorkOrder travels as [topic, seq, payload]. seq counts up per PUB
+topic or per router replica, so a robot can count the messages that never
+reached it (a gap in seq).
+
+pubsub: one PUB socket. Robots SUBscribe to FETCH.<category> and
+RESTOCK.<category>, and every subscriber gets every message, so a second
+robot of the same category would do all the work twice. PUB drops messages
+for a subscriber that is slow (past the high-water mark) or briefly
+disconnected, and nothing resends them.
+
+router (default): one ROUTER socket. Each robot connects a DEALER whose
+routing id is its instance id, and each WorkOrder goes to exactly one
+replica of its category:
+
+- A robot announces itself with READY <category> <capacity> and repeats
+  that every ROBOT_READY_S. The repeat is how Inventory finds its robots
+  again after a restart.
+- A WorkOrder goes to the replica with the most spare capacity, the fewest
+  outstanding WorkOrders relative to its capacity. Ties go to the one that
+  has been sent the least.
+- The robot acknowledges receipt (ACK <seq>...) and reports completion
+  (DONE <seq>...). DONE also frees the capacity.
+- A WorkOrder not acknowledged within ROBOT_ACK_TIMEOUT_S is sent again,
+  to whichever replica has room, up to ROBOT_REDELIVER_MAX times. The first
+  replica may still have it, so it keeps counting against that replica's
+  capacity until its DONE or until the replica goes away. All WorkOrders a
+  replica currently holds are sent again when it goes away, received or
+  not, since their results will never come. Robots drop duplicates by
+  request_id.
+- While every replica of a category is full, or none has connected yet,
+  WorkOrders wait in a per-category backlog (ROBOT_DISPATCH_BACKLOG in
+  total). They go out in order as capacity frees up, with redeliveries
+  first. WorkOrders whose order stopped waiting (finished or timed out) are
+  skipped instead of being sent.
+- A replica that says BYE gets no new work but may finish what it has. It
+  is forgotten when its RobotSession ends, when it has been silent for
+  expire_s, or when a send finds its connection gone (ROUTER_MANDATORY).
+
+Both dispatchers live on Inventory's event loop.
+"""
+import asyncio
+import collections
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import zmq
+
+from utils.log import get_logger
+
+ROBOT_DISPATCH = os.environ.get("ROBOT_DISPATCH", "router")
+# Most WorkOrders held back (all categories together) while no replica has room; beyond that they are dropped
+ROBOT_DISPATCH_BACKLOG = int(os.environ.get("ROBOT_DISPATCH_BACKLOG", "100000"))
+# A WorkOrder the robot hasn't acknowledged this long after sending is sent again (router only)
+ROBOT_ACK_TIMEOUT_S = float(os.environ.get("ROBOT_ACK_TIMEOUT_S", "1"))
+# Sends of one WorkOrder before giving up on it (the order then times out)
+ROBOT_REDELIVER_MAX = int(os.environ.get("ROBOT_REDELIVER_MAX", "3"))
+
+# Robot -> Inventory control messages on the DEALER socket
+READY = b"READY"  # READY <category> <capacity>
+ACK = b"ACK"      # ACK <seq>...: received
+DONE = b"DONE"    # DONE <seq>...: finished (result reported or duplicate), capacity free again
+BYE = b"BYE"      # the robot is stopping
+
+log = get_logger("inventory.dispatch")
+
+
+class PubDispatcher:
+    """ROBOT_DISPATCH=pubsub: publish on the category's topic; every robot subscribed to it gets the WorkOrder."""
+
+    def __init__(self, pub_socket):
+        self.socket = pub_socket
+        self._seq: Dict[bytes, int] = {}
+
+    def start(self):
+        pass
+
+    async def send(self, request_id: str, category: str, topic: bytes, payload: bytes):
+        seq = self._seq.get(topic, 0) + 1
+        self._seq[topic] = seq
+        # The payload is immutable, so ZMQ can take it without a copy
+        # (pyzmq still copies frames smaller than zmq.COPY_THRESHOLD)
+        await self.socket.send_multipart([topic, str(seq).encode(), payload], copy=False)
+
+    def forget(self, instance: str):
+        pass
+
+    def sweep(self, now: float = None):
+        pass
+
+    def replicas(self) -> List[Tuple[str, str, int, int]]:
+        return []
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        self.socket.close()
+
+
+class _Delivery:
+    """One WorkOrder for one category, until a replica finishes it or nobody waits for it anymore."""
+    __slots__ = ("request_id", "category", "topic", "payload", "replica", "seq", "attempts", "acked")
+
+    def __init__(self, request_id: str, category: str, topic: bytes, payload: bytes):
+        self.request_id = request_id
+        self.category = category
+        self.topic = topic
+        self.payload = payload
+        self.replica = None
+        self.seq = 0
+        self.attempts = 0
+        self.acked = False
+
+    def sent_as(self, replica: "_Replica", seq: int) -> bool:
+        """Whether replica's seq is this WorkOrder's latest send (not one it was sent again after)."""
+        return self.replica is replica and self.seq == seq
+
+
+class _Replica:
+    __slots__ = ("instance", "category", "capacity", "deliveries", "next_seq", "sent", "last_seen")
+
+    def __init__(self, instance: bytes, category: str, capacity: int):
+        self.instance = instance
+        self.category = category
+        self.capacity = capacity
+        # seq -> WorkOrder sent to this replica and not DONE yet (also if it was sent again elsewhere since)
+        self.deliveries: Dict[int, _Delivery] = {}
+        self.next_seq = 1
+        self.sent = 0
+        self.last_seen = time.monotonic()
+
+
+class RouterDispatcher:
+    """
+    ROBOT_DISPATCH=router: load-balances each category's WorkOrders over its
+    robot replicas, with acks and redelivery (see the module docstring).
+    wanted(request_id, category) says whether an order still waits for that
+    category; WorkOrders it rejects are neither sent nor sent again.
+    """
+
+    def __init__(self, router_socket, wanted: Callable[[str, str], bool] = None,
+                 backlog_max: int = ROBOT_DISPATCH_BACKLOG, expire_s: float = 15.0,
+                 ack_timeout_s: float = ROBOT_ACK_TIMEOUT_S, redeliver_max: int = ROBOT_REDELIVER_MAX):
+        self.socket = router_socket
+        # Unreachable routing ids raise EHOSTUNREACH instead of being dropped silently
+        self.socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        self.wanted = wanted
+        self.backlog_max = backlog_max
+        self.expire_s = expire_s
+        self.ack_timeout_s = ack_timeout_s
+        self.redeliver_max = redeliver_max
+        self._replicas: Dict[bytes, _Replica] = {}
+        self._by_category: Dict[str, List[_Replica]] = {}
+        self._backlog: Dict[str, collections.deque] = {}
+        self._backlog_size = 0
+        # (ack deadline, delivery, attempt) in send order; stale entries are skipped when they come due
+        self._unacked = collections.deque()
+        self._tasks = []
+        self.dispatched = 0
+        self.backlogged = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.unreachable = 0
+        self.hwm_full = 0
+        self.redelivered = 0
+        self.gave_up = 0
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._receive()), asyncio.ensure_future(self._redeliver_loop())]
+
+    async def send(self, request_id: str, category: str, topic: bytes, payload: bytes):
+        delivery = _Delivery(request_id, category, topic, payload)
+        # Behind whatever of this category is already waiting, so WorkOrders go out in order
+        if not self._backlog.get(category) and self._dispatch(delivery):
+            return
+        self._hold(delivery)
+
+    def forget(self, instance: str):
+        """The robot instance is gone (its RobotSession ended)."""
+        replica = self._replicas.get(instance.encode())
+        if replica is not None:
+            self._remove(replica, "session closed")
+
+    def sweep(self, now: float = None):
+        """Forget replicas that have not announced themselves for expire_s, and deliveries nobody waits for."""
+        now = time.monotonic() if now is None else now
+        changed = set()
+        for replica in [r for r in self._replicas.values() if now - r.last_seen > self.expire_s]:
+            self._remove(replica, "silent")
+            changed.add(replica.category)
+        if self.wanted is not None:
+            # A DONE can get lost (it is sent best effort); don't hold the capacity forever
+            for replica in self._replicas.values():
+                unwanted = [seq for seq, d in replica.deliveries.items() if not self.wanted(d.request_id, d.category)]
+                for seq in unwanted:
+                    del replica.deliveries[seq]
+                if unwanted:
+                    changed.add(replica.category)
+        # Capacity freed here would otherwise wait for the next ACK/DONE/READY of the category
+        for category in changed:
+            self._drain(category)
+
+    def replicas(self) -> List[Tuple[str, str, int, int]]:
+        """(category, instance, outstanding, sent) per connected replica."""
+        return [(r.category, r.instance.decode(errors="replace"), len(r.deliveries), r.sent)
+                for r in self._replicas.values()]
+
+    def stats(self) -> dict:
+        return {"replicas": len(self._replicas), "dispatched": self.dispatched, "backlog": self._backlog_size,
+                "backlogged": self.backlogged, "dropped": self.dropped, "skipped": self.skipped,
+                "unreachable": self.unreachable, "hwm_full": self.hwm_full, "redelivered": self.redelivered,
+                "gave_up": self.gave_up,
+                "unacked": sum(1 for r in self._replicas.values() for seq, d in r.deliveries.items()
+                               if d.sent_as(r, seq) and not d.acked)}
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self.socket.close(linger=0)
+
+    def _pick(self, category: str):
+        best = None
+        for r in self._by_category.get(category, ()):
+            # (capacity 0: said BYE or hit the high-water mark)
+            if len(r.deliveries) >= r.capacity:
+                continue
+            if best is None or (len(r.deliveries) / r.capacity, r.sent) < (len(best.deliveries) / best.capacity,
+                                                                            best.sent):
+                best = r
+        return best
+
+    def _dispatch(self, delivery: _Delivery) -> bool:
+        """Send to the best replica with room; False if there is none."""
+        while True:
+            replica = self._pick(delivery.category)
+            if replica is None:
+                return False
+            seq = replica.next_seq
+            try:
+                # With NOBLOCK pyzmq finishes (or fails) the send before returning, so result() never waits
+                self.socket.send_multipart([replica.instance, delivery.topic, str(seq).encode(), delivery.payload],
+                                           flags=zmq.NOBLOCK, copy=False).result()
+            except zmq.Again:
+                # Its pipe is at the high-water mark: no more for it until its next READY restores the capacity
+                self.hwm_full += 1
+                replica.capacity = len(replica.deliveries)
+                continue
+            except zmq.ZMQError as e:
+                if e.errno != zmq.EHOSTUNREACH:
+                    raise
+                self.unreachable += 1
+                self._remove(replica, "unreachable")
+                continue
+            replica.next_seq += 1
+            replica.deliveries[seq] = delivery
+            replica.sent += 1
+            delivery.replica = replica
+            delivery.seq = seq
+            delivery.attempts += 1
+            delivery.acked = False
+            self._unacked.append((time.monotonic() + self.ack_timeout_s, delivery, delivery.attempts))
+            self.dispatched += 1
+            return True
+
+    def _hold(self, delivery: _Delivery, first: bool = False):
+        if self._backlog_size >= self.backlog_max:
+            self.dropped += 1
+            log.warning("dispatch backlog full, WorkOrder dropped",
+                        extra={"request_id": delivery.request_id, "robot": delivery.category,
+                               "backlog": self._backlog_size})
+            return
+        backlog = self._backlog.setdefault(delivery.category, collections.deque())
+        if first:
+            backlog.appendleft(delivery)
+        else:
+            backlog.append(delivery)
+        self._backlog_size += 1
+        self.backlogged += 1
+
+    def _drain(self, category: str):
+        backlog = self._backlog.get(category)
+        while backlog:
+            delivery = backlog[0]
+            if self.wanted is not None and not self.wanted(delivery.request_id, category):
+                self.skipped += 1
+            elif not self._dispatch(delivery):
+                return
+            backlog.popleft()
+            self._backlog_size -= 1
+
+    def _redeliver(self, delivery: _Delivery, reason: str):
+        """Send a WorkOrder again (its replica went quiet or away), ahead of new work of its category."""
+        delivery.replica = None
+        if self.wanted is not None and not self.wanted(delivery.request_id, delivery.category):
+            self.skipped += 1
+            return
+        if delivery.attempts >= self.redeliver_max:
+            self.gave_up += 1
+            log.warning("WorkOrder not delivered, giving up", extra={
+                "request_id": delivery.request_id, "robot": delivery.category, "attempts": delivery.attempts,
+                "reason": reason})
+            return
+        self.redelivered += 1
+        log.info("redelivering WorkOrder", extra={"request_id": delivery.request_id, "robot": delivery.category,
+                                                   "attempt": delivery.attempts + 1, "reason": reason})
+        if self._backlog.get(delivery.category) or not self._dispatch(delivery):
+            self._hold(delivery, first=True)
+
+    async def _redeliver_loop(self):
+        while True:
+            await asyncio.sleep(self.ack_timeout_s / 4)
+            now = time.monotonic()
+            unacked = self._unacked
+            while unacked and unacked[0][0] <= now:
+                _, delivery, attempt = unacked.popleft()
+                replica = delivery.replica
+                # Acked, finished, or already sent again since this entry was made
+                if delivery.acked or attempt != delivery.attempts or replica is None \
+                        or replica.deliveries.get(delivery.seq) is not delivery:
+                    continue
+                # Left in replica.deliveries: the robot may have it after all, and it counts until its DONE
+                self._redeliver(delivery, "ack timeout")
+
+    def _remove(self, replica: _Replica, reason: str):
+        if self._replicas.pop(replica.instance, None) is None:
+            return
+        self._by_category[replica.category].remove(replica)
+        log.info("robot replica left", extra={"robot": replica.category, "instance": replica.instance.decode(
+            errors="replace"), "reason": reason, "outstanding": len(replica.deliveries)})
+        # Whatever it had will never be answered; hand it to the others (or hold it for the next replica).
+        # WorkOrders already sent again since are in someone else's hands.
+        orphans = sorted((d for seq, d in replica.deliveries.items() if d.sent_as(replica, seq)),
+                         key=lambda d: d.seq, reverse=True)
+        replica.deliveries.clear()
+        for delivery in orphans:
+            self._redeliver(delivery, reason)
+
+    def _on_ready(self, instance: bytes, category: str, capacity: int):
+        replica = self._replicas.get(instance)
+        if replica is None or replica.category != category:
+            if replica is not None:
+                self._remove(replica, "category changed")
+            replica = self._replicas[instance] = _Replica(instance, category, max(1, capacity))
+            self._by_category.setdefault(category, []).append(replica)
+            log.info("robot replica joined", extra={"robot": category, "instance": instance.decode(errors="replace"),
+                                                    "capacity": capacity})
+        replica.capacity = max(1, capacity)
+        replica.last_seen = time.monotonic()
+
+    async def _receive(self):
+        while True:
+            frames = await self.socket.recv_multipart()
+            try:
+                instance, verb = frames[0], frames[1]
+                if verb == READY:
+                    category = frames[2].decode()
+                    self._on_ready(instance, category, int(frames[3]))
+                    self._drain(category)
+                    continue
+                replica = self._replicas.get(instance)
+                if replica is None:
+                    # Not (or no longer) known; its next READY brings it back
+                    continue
+                replica.last_seen = time.monotonic()
+                if verb == ACK:
+                    for seq in frames[2:]:
+                        seq = int(seq)
+                        delivery = replica.deliveries.get(seq)
+                        # A late ACK of a send that was already repeated says nothing about the repeat
+                        if delivery is not None and delivery.sent_as(replica, seq):
+                            delivery.acked = True
+                elif verb == DONE:
+                    for seq in frames[2:]:
+                        replica.deliveries.pop(int(seq), None)
+                    self._drain(replica.category)
+                elif verb == BYE:
+                    # Finishing what it has; anything left when its session ends is sent elsewhere
+                    replica.capacity = 0
+                    log.info("robot replica stopping", extra={"robot": replica.category, "instance": instance.decode(
+                        errors="replace"), "outstanding": len(replica.deliveries)})
+                else:
+                    raise ValueError(f"unknown message {verb!r}")
+            except (IndexError, ValueError, UnicodeDecodeError) as e:
+                log.warning("bad message from robot", extra={"error": str(e), "frames": len(frames)})
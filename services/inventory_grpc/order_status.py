@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from generated.proto import grocery_pb2
+
+
+# Finished orders stay queryable this long, and at most this many of them are kept
+ORDER_STATUS_TTL_S = float(os.environ.get("ORDER_STATUS_TTL_S", "600"))
+ORDER_STATUS_MAX = int(os.environ.get("ORDER_STATUS_MAX", "100000"))
+
+
+class OrderStatusStore:
+    """
+    Status of orders submitted with StartOrder, for GetOrderStatus / WatchOrder.
+
+    Pending orders are always kept (they are bounded by the robot timeout).
+    Finished ones are kept for ttl_s, oldest dropped first beyond max_done.
+    Only touched from the event loop, so there is no locking.
+    """
+    def __init__(self, ttl_s: float = ORDER_STATUS_TTL_S, max_done: int = ORDER_STATUS_MAX):
+        self.ttl_s = ttl_s
+        self.max_done = max_done
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        # request_id -> (finished at, OrderStatus), in finishing order
+        self._done: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def start(self, request_id: str):
+        self._pending[request_id] = []
+
+    def finish(self, request_id: str, reply: grocery_pb2.OrderReply) -> grocery_pb2.OrderStatus:
+        status = grocery_pb2.OrderStatus(request_id=request_id, state=grocery_pb2.ORDER_DONE, reply=reply)
+        watchers = self._pending.pop(request_id, ())
+        self._done[request_id] = (time.monotonic(), status)
+        for fut in watchers:
+            if not fut.done():
+                fut.set_result(status)
+        self._evict()
+        return status
+
+    def get(self, request_id: str) -> grocery_pb2.OrderStatus:
+        if request_id in self._pending:
+            return grocery_pb2.OrderStatus(request_id=request_id, state=grocery_pb2.ORDER_PENDING)
+        done = self._done.get(request_id)
+        if done is not None:
+            return done[1]
+        return grocery_pb2.OrderStatus(request_id=request_id, state=grocery_pb2.ORDER_UNKNOWN)
+
+    async def wait(self, request_id: str) -> grocery_pb2.OrderStatus:
+        """The final status once the order finishes (right away if it already has, or is unknown)."""
+        watchers = self._pending.get(request_id)
+        if watchers is None:
+            return self.get(request_id)
+        fut = asyncio.get_running_loop().create_future()
+        watchers.append(fut)
+        try:
+            return await fut
+        finally:
+            if not fut.done() and fut in watchers:
+                watchers.remove(fut)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "done": len(self._done)}
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl_s
+        done = self._done
+        while done:
+            request_id, (finished_at, _) = next(iter(done.items()))
+            if finished_at >= cutoff and len(done) <= self.max_done:
+                break
+            del done[request_id]
@@ -0,0 +1,151 @@
+from typing import Dict, List, Tuple
+
+from psycopg2.extras import execute_values
+
+from utils.db import get_db_connection
+
+
+# Check-and-deduct for a whole order in one statement.
+#
+# - `locked` takes row locks on every requested item in id order, so two
+#   concurrent orders never deadlock and each sees the other's committed stock.
+# - `short` lists requested items that are missing or under-stocked.
+# - `upd` deducts every item only when `short` is empty, so an order is either
+#   fully reserved or not touched at all. It matches rows by locked id rather
+#   than re-testing the quantity, because the statement snapshot may predate a
+#   concurrent commit that `locked` already waited for.
+RESERVE_SQL = """
+WITH need(name, qty) AS (VALUES %s),
+locked AS (
+    SELECT i.id, i.name, i.quantity
+    FROM items i
+    JOIN need ON need.name = i.name
+    ORDER BY i.id
+    FOR UPDATE OF i
+),
+short AS (
+    SELECT need.name, need.qty, COALESCE(locked.quantity, 0) AS available
+    FROM need
+    LEFT JOIN locked ON locked.name = need.name
+    WHERE locked.id IS NULL OR locked.quantity < need.qty
+),
+upd AS (
+    UPDATE items i
+    SET quantity = i.quantity - need.qty
+    FROM locked
+    JOIN need ON need.name = locked.name
+    WHERE i.id = locked.id
+      AND NOT EXISTS (SELECT 1 FROM short)
+    RETURNING i.name
+)
+SELECT name, qty, available FROM short
+"""
+
+# Add quantities back for a whole order in one statement (rollback / restock).
+# Rows are locked in id order first, same as RESERVE_SQL, to avoid deadlocks.
+ADD_SQL = """
+WITH v(name, qty) AS (VALUES %s),
+locked AS (
+    SELECT i.id, v.qty
+    FROM items i
+    JOIN v ON v.name = i.name
+    ORDER BY i.id
+    FOR UPDATE OF i
+)
+UPDATE items
+SET quantity = items.quantity + locked.qty
+FROM locked
+WHERE items.id = locked.id
+"""
+
+# Batch reservation: lock every item any order of the batch needs (id order, as above),
+# decide per order in Python, then deduct the accepted totals in one statement.
+LOCK_ITEMS_SQL = """
+SELECT name, quantity
+FROM items
+WHERE name = ANY(%s)
+ORDER BY id
+FOR UPDATE
+"""
+
+DEDUCT_SQL = """
+UPDATE items
+SET quantity = items.quantity - v.qty
+FROM (VALUES %s) AS v(name, qty)
+WHERE items.name = v.name
+"""
+
+
+class ReservationEngine:
+    """
+    Set-based stock reservation against the items table.
+    Each call is a single statement on an autocommit connection: one DB round-trip per order.
+    reserve_batch() covers a whole batch of orders in one short transaction.
+    """
+
+    def reserve(self, items: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        """
+        Atomically check and deduct all items.
+        Returns the shortfalls as (name, needed, available); an empty list means the order was reserved.
+        """
+        if not items:
+            return []
+        rows = [(name, int(qty)) for name, qty in items.items()]
+        with get_db_connection(autocommit=True, op="reserve") as conn:
+            cur = conn.cursor()
+            short = execute_values(cur, RESERVE_SQL, rows, template="(%s, %s)",
+                                   page_size=len(rows), fetch=True)
+        return [(name, int(qty), int(available)) for name, qty, available in short]
+
+    def reserve_batch(self, orders: List[Dict[str, int]]) -> List[List[Tuple[str, int, int]]]:
+        """
+        Reserve several orders in one transaction (lock, then one deduct).
+        Each order is still all-or-nothing; orders are taken in list order, so
+        an earlier order wins stock over a later one. Returns shortfalls per
+        order, where available is what was left after the earlier orders.
+        """
+        names = sorted({name for items in orders for name in items})
+        if not names:
+            return [[] for _ in orders]
+        with get_db_connection(op="reserve_batch") as conn:
+            cur = conn.cursor()
+            cur.execute(LOCK_ITEMS_SQL, (names,))
+            stock = {name: int(qty) for name, qty in cur.fetchall()}
+            results = []
+            taken: Dict[str, int] = {}
+            for items in orders:
+                short = [(name, int(qty), stock.get(name, 0)) for name, qty in items.items()
+                         if stock.get(name, 0) < int(qty)]
+                if not short:
+                    for name, qty in items.items():
+                        stock[name] -= int(qty)
+                        taken[name] = taken.get(name, 0) + int(qty)
+                results.append(short)
+            if taken:
+                execute_values(cur, DEDUCT_SQL, list(taken.items()), template="(%s, %s)", page_size=len(taken))
+        return results
+
+    def release(self, items: Dict[str, int]):
+        """Give back a previous reservation (e.g. robots timed out)."""
+        self._add(items)
+
+    def restock(self, items: Dict[str, int]):
+        """Add supplier stock after a RESTOCK_ORDER completes."""
+        self._add(items)
+
+    def close(self):
+        pass
+
+    def _add(self, items: Dict[str, int]):
+        if not items:
+            return
+        rows = [(name, int(qty)) for name, qty in items.items()]
+        with get_db_connection(autocommit=True, op="stock_add") as conn:
+            cur = conn.cursor()
+            execute_values(cur, ADD_SQL, rows, template="(%s, %s)", page_size=len(rows))
+
+
+def format_shortfalls(shortfalls: List[Tuple[str, int, int]]) -> str:
+    return "Insufficient inventory: " + ", ".join(
+        f"{name} (need {need}, have {available})" for name, need, available in shortfalls
+    )
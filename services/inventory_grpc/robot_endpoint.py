@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+import uuid
+
+import grpc
+
+from generated.proto import grocery_pb2
+from generated.proto import grocery_pb2_grpc
+
+from utils.log import get_logger
+from utils.metrics import Gauge, stats_family
+
+# RobotSession streams: results a robot may send before Inventory grants more, and heartbeat period
+ROBOT_SESSION_CREDITS = int(os.environ.get("ROBOT_SESSION_CREDITS", "1024"))
+ROBOT_HEARTBEAT_S = float(os.environ.get("ROBOT_HEARTBEAT_S", "5"))
+# PUB drops (ROUTER holds back) messages beyond the high-water mark; keep it above the expected in-flight orders
+ZMQ_SNDHWM = int(os.environ.get("ZMQ_SNDHWM", "100000"))
+
+ROBOT_SESSIONS = Gauge("inventory_robot_sessions", "Open RobotSession streams")
+
+robot_log = get_logger("inventory.robots")
+
+
+class RobotEndpoint(grocery_pb2_grpc.InventoryServiceServicer):
+    """
+    The robot-facing half of Inventory: RobotSession streams, unary
+    ReportRobotResult and RobotHeartbeat, the registry of live robots and the
+    dispatcher that hands them WorkOrders. Subclasses decide what a result
+    means (_on_robot_result) and what happens when a category's last robot
+    leaves (_on_robots_down): InventoryService resolves its own orders, the
+    hub of a sharded Inventory passes both on to the shards (shards.py).
+    """
+    def __init__(self, dispatcher, robots):
+        self.dispatcher = dispatcher
+        self.robots = robots
+        self._sessions_closing = asyncio.Event()
+
+    def _on_robot_result(self, rr):
+        raise NotImplementedError
+
+    def _on_robots_down(self, category: str):
+        raise NotImplementedError
+
+    async def ReportRobotResult(self, request, context):
+        # request is RobotResult (one unary call per result; robots normally use RobotSession)
+        self._on_robot_result(request)
+        return grocery_pb2.Ack(ok=True, message="ack")
+
+    async def RobotSession(self, request_iterator, context):
+        """
+        One long-lived stream per robot. Results arrive in batches and are
+        handled inline; each batch is answered with as many credits as it held,
+        which is also the robot's ack. Inventory sends a heartbeat every
+        ROBOT_HEARTBEAT_S and ends the session if the robot has been silent for
+        three of them (the robot then reconnects).
+        """
+        hello = await context.read()
+        if hello is grpc.aio.EOF or not hello.robot_name:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "first RobotUpdate must carry robot_name")
+        robot_name = hello.robot_name
+        instance = hello.instance_id or uuid.uuid4().hex
+        write_lock = asyncio.Lock()
+        last_seen = [time.monotonic()]
+
+        async def send(ctl):
+            async with write_lock:
+                await context.write(ctl)
+
+        async def read_updates():
+            while True:
+                update = await context.read()
+                if update is grpc.aio.EOF:
+                    return
+                last_seen[0] = time.monotonic()
+                for rr in update.results:
+                    self._on_robot_result(rr)
+                if update.results:
+                    await send(grocery_pb2.SessionControl(credits=len(update.results)))
+
+        robot_log.info("session opened", extra={"robot": robot_name, "peer": context.peer()})
+        await send(grocery_pb2.SessionControl(credits=ROBOT_SESSION_CREDITS, message="welcome"))
+        reader = asyncio.create_task(read_updates())
+        closing = asyncio.create_task(self._sessions_closing.wait())
+        ROBOT_SESSIONS.inc()
+        self.robots.open(robot_name, instance)
+        try:
+            while True:
+                done, _ = await asyncio.wait({reader, closing}, timeout=ROBOT_HEARTBEAT_S,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if reader in done:
+                    reader.result()
+                    break
+                if closing in done:
+                    break
+                if time.monotonic() - last_seen[0] > 3 * ROBOT_HEARTBEAT_S:
+                    robot_log.warning("session missed heartbeats, closing", extra={"robot": robot_name})
+                    break
+                await send(grocery_pb2.SessionControl(heartbeat=True))
+        finally:
+            reader.cancel()
+            closing.cancel()
+            ROBOT_SESSIONS.dec()
+            self.robots.close(robot_name, instance)
+            self.dispatcher.forget(instance)
+            robot_log.info("session closed", extra={"robot": robot_name})
+
+    async def RobotHeartbeat(self, request, context):
+        """Liveness for robots that report with unary calls; they count as live for three intervals."""
+        if self.robots.heartbeat(request.robot_name, request.instance_id):
+            robot_log.info("robot registered", extra={"robot": request.robot_name, "instance": request.instance_id})
+        return grocery_pb2.Ack(ok=True, message="ack")
+
+    async def sweep_robots(self, interval_s: float = ROBOT_HEARTBEAT_S):
+        """Retire unary robots whose heartbeats stopped and replicas that stopped announcing themselves."""
+        while True:
+            await asyncio.sleep(interval_s)
+            self.robots.sweep()
+            self.dispatcher.sweep()
+
+    def robot_metrics(self):
+        """Scrape-time metrics of the robot registry and the dispatcher."""
+        return [
+            ("inventory_robot_instances", "gauge", "Live robot instances per category",
+             [({"robot": category}, n) for category, n in sorted(self.robots.live_instances().items())]),
+            ("inventory_dispatch_outstanding", "gauge", "WorkOrders sent to a robot replica and not finished yet",
+             [({"robot": category, "instance": instance}, outstanding)
+              for category, instance, outstanding, _ in self.dispatcher.replicas()]),
+            ("inventory_dispatched_total", "counter", "WorkOrders sent to each connected robot replica",
+             [({"robot": category, "instance": instance}, sent)
+              for category, instance, _, sent in self.dispatcher.replicas()]),
+            stats_family("inventory_dispatch", "Router dispatch: replicas, backlog and WorkOrders sent, "
+                         "dropped (backlog full), skipped (order gone), not yet acknowledged, sent again "
+                         "or given up on", self.dispatcher.stats(),
+                         ("replicas", "backlog", "dispatched", "dropped", "skipped", "unreachable", "hwm_full",
+                          "unacked", "redelivered", "gave_up")),
+            ("inventory_zmq_sndhwm", "gauge", "Send high-water mark of the WorkOrder socket", [({}, ZMQ_SNDHWM)]),
+        ]
+
+    def close_sessions(self):
+        """End every RobotSession normally (robots reconnect), so shutdown doesn't cancel them mid-call."""
+        self._sessions_closing.set()
@@ -0,0 +1,124 @@
+import asyncio
+import math
+import os
+import time
+from typing import Callable, Dict, Iterable, List
+
+# fail: reject orders for a category with no live robot at once, and fail orders waiting on
+# a category whose last robot goes away; wait: wait ROBOT_TIMEOUT_S for it regardless
+ROBOT_LIVENESS = os.environ.get("ROBOT_LIVENESS", "fail")
+# After Inventory starts, categories no robot has registered for yet count as live this long
+# (robots reconnect within a second or two of an Inventory restart)
+ROBOT_LIVENESS_GRACE_S = float(os.environ.get("ROBOT_LIVENESS_GRACE_S", "5"))
+# A category whose last RobotSession ended stays live this long, so a stream that is only
+# reconnecting (results are re-sent on the new stream) doesn't fail the orders it owes
+ROBOT_LIVENESS_RECONNECT_S = float(os.environ.get("ROBOT_LIVENESS_RECONNECT_S", "2"))
+
+
+class RobotRegistry:
+    """
+    Live robot instances per category (robot name == category).
+
+    - A robot with a RobotSession is live from open() until close(); the
+      session itself ends after three missed heartbeats. The category then
+      stays live for reconnect_s more in case the robot reconnects.
+    - A robot reporting with unary calls is live for ttl_s after each
+      heartbeat(); sweep() retires the ones that stopped.
+    - Until grace_s after start, a category nobody has registered for yet
+      counts as live, so orders aren't turned away while robots reconnect.
+    - on_down(category) is called when the last instance of a category leaves.
+    Lives on the event loop; no locking.
+    """
+    def __init__(self, ttl_s: float, grace_s: float = ROBOT_LIVENESS_GRACE_S,
+                 reconnect_s: float = ROBOT_LIVENESS_RECONNECT_S, on_down: Callable[[str], None] = None):
+        self.ttl_s = ttl_s
+        self.grace_s = grace_s
+        self.reconnect_s = reconnect_s
+        self.on_down = on_down
+        self._started = time.monotonic()
+        # category -> instance id -> live until (monotonic; inf while a session is open)
+        self._instances: Dict[str, Dict[str, float]] = {}
+        # category -> monotonic time its reconnect window ends
+        self._leaving: Dict[str, float] = {}
+        self.registrations = 0
+        self.departures = 0
+
+    def open(self, category: str, instance: str):
+        """A RobotSession started."""
+        self._add(category, instance, math.inf)
+
+    def heartbeat(self, category: str, instance: str):
+        """A unary robot is alive; returns True if it was not registered before."""
+        return self._add(category, instance, time.monotonic() + self.ttl_s)
+
+    def close(self, category: str, instance: str):
+        """A RobotSession ended."""
+        instances = self._instances.get(category)
+        if instances is None or instances.pop(instance, None) is None:
+            return
+        self.departures += 1
+        if not instances:
+            if self.reconnect_s > 0:
+                until = self._leaving[category] = time.monotonic() + self.reconnect_s
+                asyncio.get_running_loop().call_later(self.reconnect_s, self._settle, category, until)
+            else:
+                self._down(category)
+
+    def sweep(self, now: float = None) -> List[str]:
+        """Retire unary robots whose heartbeats stopped; returns the categories that went down."""
+        now = time.monotonic() if now is None else now
+        went_down = []
+        for category, instances in self._instances.items():
+            expired = [instance for instance, until in instances.items() if until < now]
+            for instance in expired:
+                del instances[instance]
+                self.departures += 1
+            if expired and not instances:
+                went_down.append(category)
+        for category in went_down:
+            self._down(category)
+        return went_down
+
+    def alive(self, category: str) -> bool:
+        instances = self._instances.get(category)
+        if instances:
+            return True
+        leaving_until = self._leaving.get(category)
+        if leaving_until is not None and time.monotonic() < leaving_until:
+            return True
+        # Never registered (not merely gone): give robots time to connect after a restart
+        return instances is None and self.in_grace()
+
+    def in_grace(self) -> bool:
+        """Still within grace_s of starting, when categories nobody registered for count as live."""
+        return time.monotonic() - self._started < self.grace_s
+
+    def down(self, categories: Iterable[str]) -> List[str]:
+        """The categories (sorted) without a live robot."""
+        return sorted(c for c in categories if not self.alive(c))
+
+    def live_instances(self) -> Dict[str, int]:
+        return {category: len(instances) for category, instances in self._instances.items()}
+
+    def stats(self) -> dict:
+        return {"live": self.live_instances(), "registrations": self.registrations, "departures": self.departures}
+
+    def _add(self, category: str, instance: str, until: float) -> bool:
+        instances = self._instances.setdefault(category, {})
+        self._leaving.pop(category, None)
+        new = instance not in instances
+        if new:
+            self.registrations += 1
+        # A session's inf is never shortened by a heartbeat from the same instance
+        instances[instance] = max(until, instances.get(instance, 0.0))
+        return new
+
+    def _settle(self, category: str, until: float):
+        """End of the reconnect window that ends at until: down unless a robot came back (or a later window began)."""
+        if self._leaving.get(category) == until and not self._instances.get(category):
+            del self._leaving[category]
+            self._down(category)
+
+    def _down(self, category: str):
+        if self.on_down is not None:
+            self.on_down(category)
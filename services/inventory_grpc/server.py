@@ -1,13 +1,17 @@
+import argparse
+import asyncio
 import os
+import signal
+import subprocess
 import sys
 import time
 import uuid
-import threading
 from concurrent import futures
-from typing import Dict, Set
+from typing import Dict
 
 import grpc
 import zmq
+import zmq.asyncio
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,268 +24,832 @@ from generated.proto import grocery_pb2
 from generated.proto import grocery_pb2_grpc
 
 # FlatBuffers generated modules
-from groceryfb import WorkOrder, RequestType, ItemQty
-
-# Database helper
-from utils.db import get_db_connection
+from groceryfb import RequestType
+from services.inventory_grpc.workorder_encoder import WorkOrderEncoder
+
+# Database helpers
+from utils.db import get_pool, close_pool
+from services.inventory_grpc.reservation import ReservationEngine, format_shortfalls
+from services.inventory_grpc.analytics import AnalyticsWriter
+from services.inventory_grpc.stock_cache import INVENTORY_CACHE, StockCache
+from services.inventory_grpc.catalog import Catalog, work_topic
+from services.inventory_grpc.tracker import RobotTracker
+from services.inventory_grpc.order_status import OrderStatusStore
+from services.inventory_grpc.admission import AdmissionController, AdmissionRejected
+from services.inventory_grpc.robot_registry import ROBOT_LIVENESS, ROBOT_LIVENESS_GRACE_S, RobotRegistry
+from services.inventory_grpc.dispatch import ROBOT_DISPATCH, PubDispatcher, RouterDispatcher
+from services.inventory_grpc.robot_endpoint import ROBOT_HEARTBEAT_S, ZMQ_SNDHWM, RobotEndpoint
+from services.inventory_grpc.shards import RobotHub, ShardLink
+from utils.sharding import shard_prefix
+
+# Shared long-lived gRPC channels
+from utils.grpc_channels import AioChannelManager, server_options
+
+# Prometheus-style metrics, served on INVENTORY_METRICS_PORT
+from utils.metrics import Counter, Histogram, register_collector, start_metrics_server, stats_family, \
+    unregister_collector
+
+# Structured logging off the request path (records are written by a background thread)
+from utils.log import get_logger
+
+# Per-stage latency spans
+from utils.tracing import Tracer, get_tracer, flush_spans, new_trace_id, trace_id_from_context, trace_metadata
 
 
 ZMQ_PUB_ADDR = os.environ.get("ZMQ_PUB_ADDR", "tcp://0.0.0.0:5556")
+# ROBOT_DISPATCH=router: robot replicas connect their DEALER sockets here
+ZMQ_ROUTER_ADDR = os.environ.get("ZMQ_ROUTER_ADDR", "tcp://0.0.0.0:5557")
 PRICING_GRPC_ADDR = os.environ.get("PRICING_GRPC_ADDR", "localhost:50053")
-
-
-def build_workorder_fb(request_id: str, request_type: int, served_id: str, items: Dict[str, int]) -> bytes:
+ROBOT_TIMEOUT_S = float(os.environ.get("ROBOT_TIMEOUT_S", "10"))
+# Most orders accepted in one SubmitOrders call
+SUBMIT_BATCH_MAX = int(os.environ.get("SUBMIT_BATCH_MAX", "500"))
+# Admission stats are printed this often while orders are being turned away
+ADMISSION_STATS_INTERVAL_S = float(os.environ.get("ADMISSION_STATS_INTERVAL_S", "10"))
+INVENTORY_METRICS_PORT = int(os.environ.get("INVENTORY_METRICS_PORT", "9101"))
+# Sharded Inventory (shards.py): worker processes, shard i's gRPC port (INVENTORY_SHARD_PORT + i) and the
+# local link between the shards and the robot-facing hub
+INVENTORY_SHARDS = int(os.environ.get("INVENTORY_SHARDS", "1"))
+INVENTORY_SHARD_PORT = int(os.environ.get("INVENTORY_SHARD_PORT", "50061"))
+INVENTORY_SHARD_LINK_ADDR = os.environ.get("INVENTORY_SHARD_LINK_ADDR", "tcp://127.0.0.1:5558")
+# Shard i serves /metrics on INVENTORY_SHARD_METRICS_PORT + i (the hub keeps INVENTORY_METRICS_PORT)
+INVENTORY_SHARD_METRICS_PORT = int(os.environ.get("INVENTORY_SHARD_METRICS_PORT", "9121"))
+
+ORDERS = Counter("inventory_orders_total",
+                 "Orders finished, by type and result (ok, rejected, timeout, unavailable)",
+                 ["type", "result"])
+ORDER_SECONDS = Histogram("inventory_order_seconds", "Order latency in Inventory, arrival to reply", ["type"])
+ZMQ_PUBLISHED = Counter("inventory_zmq_published_total", "WorkOrders published (or dispatched) to robots", ["kind"])
+ZMQ_PUBLISHED_BYTES = Counter("inventory_zmq_published_bytes_total", "WorkOrder bytes published to robots", ["kind"])
+ROBOT_RESPONSE_SECONDS = Histogram("inventory_robot_response_seconds",
+                                   "Time from publishing a WorkOrder to the robot's result arriving", ["robot"])
+ROBOT_RESULTS = Counter("inventory_robot_results_total", "RobotResults received", ["robot", "status"])
+
+log = get_logger("inventory")
+robot_log = get_logger("inventory.robots")
+shard_log = get_logger("inventory.shards")
+
+
+_encoder = WorkOrderEncoder()
+
+
+def build_workorder_fb(request_id: str, request_type: int, served_id: str, items: Dict[str, int],
+                       trace_id: str = None) -> bytes:
     """
-    Build FlatBuffers WorkOrder message.
+    Build FlatBuffers WorkOrder message (item names are serialized once, see WorkOrderEncoder).
     """
-    import flatbuffers
-
-    builder = flatbuffers.Builder(1024)
+    return _encoder.encode(request_id, request_type, served_id, items, trace_id)
 
-    # Build ItemQty objects
-    item_offsets = []
-    for name, qty in items.items():
-        name_off = builder.CreateString(name)
-        ItemQty.ItemQtyStart(builder)
-        ItemQty.ItemQtyAddName(builder, name_off)
-        ItemQty.ItemQtyAddQty(builder, int(qty))
-        item_offsets.append(ItemQty.ItemQtyEnd(builder))
 
-    WorkOrder.WorkOrderStartItemsVector(builder, len(item_offsets))
-    for off in reversed(item_offsets):
-        builder.PrependUOffsetTRelative(off)
-    items_vec = builder.EndVector()
+class _Order:
+    """One order on its way through Inventory (from SubmitOrder or one slot of a SubmitOrders batch)."""
+    __slots__ = ("request", "request_id", "served_id", "items", "trace_id", "start_time", "index",
+                 "is_grocery", "by_category", "reply", "failure")
 
-    rid_off = builder.CreateString(request_id)
-    sid_off = builder.CreateString(served_id)
+    def __init__(self, request, trace_id: str, index: int = 0, id_prefix: str = ""):
+        self.request = request
+        self.request_id = id_prefix + str(uuid.uuid4())
+        self.served_id = request.id
+        self.items = dict(request.items)
+        self.trace_id = trace_id
+        self.start_time = time.time()
+        self.index = index
+        self.is_grocery = request.request_type == grocery_pb2.GROCERY_ORDER
+        self.by_category = None
+        self.reply = None
+        # Why the robots didn't all answer: "timeout" or "unavailable" (no live robot)
+        self.failure = None
 
-    WorkOrder.WorkOrderStart(builder)
-    WorkOrder.WorkOrderAddRequestId(builder, rid_off)
-    WorkOrder.WorkOrderAddRequestType(builder, request_type)
-    WorkOrder.WorkOrderAddId(builder, sid_off)
-    WorkOrder.WorkOrderAddItems(builder, items_vec)
-    wo = WorkOrder.WorkOrderEnd(builder)
+    def batch_reply(self, reply):
+        return grocery_pb2.BatchOrderReply(index=self.index, request_id=self.request_id, reply=reply)
 
-    builder.Finish(wo)
-    return bytes(builder.Output())
 
-
-class RobotTracker:
-    """
-    Tracks which robots have responded for a given request_id.
+class InventoryService(RobotEndpoint):
     """
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._waiters: Dict[str, threading.Event] = {}
-        self._seen: Dict[str, Set[str]] = {}
-
-    def init_request(self, request_id: str):
-        with self._lock:
-            self._waiters[request_id] = threading.Event()
-            self._seen[request_id] = set()
-
-    def mark_robot(self, request_id: str, robot_name: str, expected_count: int):
-        with self._lock:
-            if request_id not in self._seen:
-                return
-            self._seen[request_id].add(robot_name)
-            if len(self._seen[request_id]) >= expected_count:
-                self._waiters[request_id].set()
-
-    def wait_all(self, request_id: str, timeout_s: float) -> bool:
-        with self._lock:
-            ev = self._waiters.get(request_id)
-        if not ev:
-            return False
-        return ev.wait(timeout=timeout_s)
-
-    def cleanup(self, request_id: str):
-        with self._lock:
-            self._waiters.pop(request_id, None)
-            self._seen.pop(request_id, None)
-
-
-class InventoryService(grocery_pb2_grpc.InventoryServiceServicer):
+    - Receives gRPC orders from Ordering, one at a time (SubmitOrder), in batches (SubmitOrders)
+      or asynchronously (StartOrder, then GetOrderStatus / WatchOrder)
+    - Splits the order by item category (items.category) and sends one
+      FlatBuffers WorkOrder per category on FETCH.<category> / RESTOCK.<category>,
+      to one of the category's robot replicas (or to every subscriber with
+      ROBOT_DISPATCH=pubsub, see dispatch.py)
+    - Receives RobotResults over each robot's RobotSession stream (or unary ReportRobotResult)
+    - Waits for a result from each of those categories only, then replies OK
+
+    Runs on grpc.aio: a waiting order is just a pending future, so in-flight
+    orders don't hold threads. Blocking DB calls run on a small executor sized
+    to the connection pool.
+
+    Orders go through an AdmissionController first: at most
+    ADMISSION_MAX_IN_FLIGHT at a time, then a short bounded queue; beyond
+    that callers get RESOURCE_EXHAUSTED straight away.
+
+    Every stage of an order (reserve, publish, each robot, pricing) is recorded
+    as a span under the trace id sent by Ordering. The analytics row is queued
+    once the order finishes and written in the background, so no analytics I/O
+    is on the order's critical path.
+
+    As shard i of a sharded Inventory (shards.py), request_ids start with
+    id_prefix ("s<i>-"), robots is the hub's liveness (RegistryMirror) and the
+    dispatcher hands WorkOrders to the hub.
     """
-    - Receives gRPC order from Ordering
-    - Publishes FlatBuffers WorkOrder to robots via ZeroMQ PUB/SUB
-    - Receives RobotResult callbacks via gRPC
-    - Waits for all 5 robot responses, then replies OK
-    """
-    EXPECTED_ROBOTS = {"bread", "dairy", "meat", "produce", "party"}
-
-    def __init__(self, zmq_pub_socket, tracker: RobotTracker):
-        self.pub = zmq_pub_socket
+    def __init__(self, dispatcher, tracker: RobotTracker, reservations: ReservationEngine = None,
+                 db_executor: futures.Executor = None, channels: AioChannelManager = None,
+                 analytics: AnalyticsWriter = None, pricing_addr: str = PRICING_GRPC_ADDR,
+                 tracer: Tracer = None, catalog: Catalog = None, orders: OrderStatusStore = None,
+                 admission: AdmissionController = None, robots=None, id_prefix: str = ""):
+        # Unary robots count as live for three heartbeat intervals, like a session's missed-heartbeat limit
+        super().__init__(dispatcher, robots or RobotRegistry(ttl_s=3 * ROBOT_HEARTBEAT_S,
+                                                             on_down=self._on_robots_down))
         self.tracker = tracker
+        self.id_prefix = id_prefix
+        self.catalog = catalog or Catalog()
+        self.orders = orders or OrderStatusStore()
+        self.admission = admission or AdmissionController()
+        # Orders that outlive their RPC (StartOrder, callers that went away) finish in these tasks
+        self._background = set()
+        self.reservations = reservations or ReservationEngine()
+        self.analytics = analytics or AnalyticsWriter()
+        self.pricing_addr = pricing_addr
+        self.db_executor = db_executor or futures.ThreadPoolExecutor(max_workers=get_pool().max_size,
+                                                                     thread_name_prefix="inventory-db")
+        self.channels = channels or AioChannelManager()
+        self.tracer = tracer or get_tracer("inventory")
+
+    async def _db(self, fn, *args):
+        """Run a blocking DB call without stalling the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, fn, *args)
+
+    async def _admit(self, context, weight: int = 1) -> int:
+        """Take admission slots for this call, or abort it (RESOURCE_EXHAUSTED / DEADLINE_EXCEEDED)."""
+        try:
+            return await self.admission.acquire(weight, context.time_remaining())
+        except AdmissionRejected as e:
+            await context.abort(e.code, str(e), trailing_metadata=e.trailing_metadata())
+
+    async def _check_deadline(self, context):
+        """Abort with DEADLINE_EXCEEDED instead of starting DB work the caller won't wait for."""
+        try:
+            self.admission.check_deadline(context.time_remaining())
+        except AdmissionRejected as e:
+            await context.abort(e.code, str(e))
 
-    def SubmitOrder(self, request, context):
+    async def SubmitOrder(self, request, context):
         # Validate non-empty items (spec says message cannot be empty)
         if not request.id or len(request.items) == 0:
             return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message="Empty id or items")
 
-        request_id = str(uuid.uuid4())
-        served_id = request.id
-        items_dict = dict(request.items)
-        start_time = time.time()
-
-        print(f"\n=== Inventory received order request_id={request_id} type={request.request_type} id={served_id} ===")
-        print("items:", items_dict)
+        weight = await self._admit(context)
+        handed_off = False
+        try:
+            order = _Order(request, trace_id_from_context(context) or new_trace_id(), id_prefix=self.id_prefix)
+            reply = await self._route(order)
+            if reply is not None:
+                self._record(order, reply)
+                return reply
+            if order.is_grocery:
+                await self._check_deadline(context)
+            # From the reservation on the order runs in its own task, so a caller that goes away (cancelled
+            # call, DEADLINE_EXCEEDED) can't strand reserved stock; the task releases the slot when done
+            task = self._detach(self._run_order(order, weight))
+            handed_off = True
+            return await asyncio.shield(task)
+        finally:
+            if not handed_off:
+                self.admission.release(weight)
+
+    async def _run_order(self, order: "_Order", weight: int):
+        """Reserve (groceries), publish and complete one order, then record it."""
+        try:
+            reply = await self._reserve(order) if order.is_grocery else None
+            if reply is None:
+                await self._publish([order])
+                reply = await self._complete(order)
+        finally:
+            self.admission.release(weight)
+        self._record(order, reply)
+        return reply
+
+    def _detach(self, coro) -> asyncio.Task:
+        """Run coro in a task of its own, kept until it finishes."""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def SubmitOrders(self, request, context):
+        """
+        A batch of orders in one call. Each order is routed on its own, the
+        grocery orders are reserved together in one transaction, the work for
+        every accepted order goes out in one ZMQ burst, and replies stream back
+        (tagged with the order's index) as each order finishes.
+        """
+        if len(request.orders) > SUBMIT_BATCH_MAX:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                f"batch of {len(request.orders)} orders exceeds SUBMIT_BATCH_MAX={SUBMIT_BATCH_MAX}")
+        weight = await self._admit(context, len(request.orders))
+        try:
+            async for reply in self._submit_batch(request, context):
+                yield reply
+        finally:
+            self.admission.release(weight)
+
+    async def _submit_batch(self, request, context):
+        trace_id = trace_id_from_context(context) or new_trace_id()
+        log.info("batch received", extra={"orders": len(request.orders), "trace_id": trace_id})
+
+        accepted = []
+        for index, req in enumerate(request.orders):
+            if not req.id or len(req.items) == 0:
+                yield grocery_pb2.BatchOrderReply(index=index, reply=grocery_pb2.OrderReply(
+                    code=grocery_pb2.BAD_REQUEST, message="Empty id or items"))
+                continue
+            order = _Order(req, trace_id, index, self.id_prefix)
+            reply = await self._route(order)
+            if reply is not None:
+                self._record(order, reply)
+                yield order.batch_reply(reply)
+                continue
+            accepted.append(order)
+
+        if any(o.is_grocery for o in accepted):
+            await self._check_deadline(context)
+        # Detached like SubmitOrder: once stock is reserved the orders finish even if the caller goes away
+        rejected, completions = await asyncio.shield(self._detach(self._run_batch(accepted)))
+        for order in rejected:
+            yield order.batch_reply(order.reply)
+        for next_done in asyncio.as_completed(completions):
+            order = await next_done
+            yield order.batch_reply(order.reply)
+
+    async def _run_batch(self, orders):
+        """Reserve and publish a batch; returns the rejected orders and one completing task per accepted order."""
+        rejected = await self._reserve_batch([o for o in orders if o.is_grocery])
+        accepted = [o for o in orders if o.reply is None]
+        await self._publish(accepted)
+
+        async def complete(order: _Order) -> _Order:
+            # Recorded here rather than by the caller, so a caller going away doesn't lose analytics
+            order.reply = await self._complete(order)
+            self._record(order, order.reply)
+            return order
+
+        return rejected, [self._detach(complete(o)) for o in accepted]
+
+    async def StartOrder(self, request, context):
+        """
+        Asynchronous submit: routing and (for groceries) the reservation happen
+        here, so an order that can't be taken is answered ORDER_DONE right away.
+        Otherwise the work is published and the call returns ORDER_PENDING with
+        the request_id; the rest of the order runs in the background and its
+        outcome is available from GetOrderStatus / WatchOrder.
+        """
+        if not request.id or len(request.items) == 0:
+            return grocery_pb2.OrderStatus(state=grocery_pb2.ORDER_DONE, reply=grocery_pb2.OrderReply(
+                code=grocery_pb2.BAD_REQUEST, message="Empty id or items"))
 
-        # Record analytics
+        # The slot is held until the robots are done, so it is released by the background task
+        weight = await self._admit(context)
+        handed_off = False
         try:
-            with get_db_connection() as conn:
-                request_type = 'GROCERY_ORDER' if request.request_type == grocery_pb2.GROCERY_ORDER else 'RESTOCK_ORDER'
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO analytics (request_id, served_id, request_type, start_time)
-                    VALUES (%s, %s, %s, NOW())
-                """, 
-                (request_id, served_id, request_type))
+            order = _Order(request, trace_id_from_context(context) or new_trace_id(), id_prefix=self.id_prefix)
+            reply = await self._route(order)
+            if reply is not None:
+                self._record(order, reply)
+                return self.orders.finish(order.request_id, reply)
+            if order.is_grocery:
+                await self._check_deadline(context)
+            # Detached like SubmitOrder, so a caller leaving during the reservation can't strand the stock
+            task = self._detach(self._start_order(order, weight))
+            handed_off = True
+            return await asyncio.shield(task)
+        finally:
+            if not handed_off:
+                self.admission.release(weight)
+
+    async def _start_order(self, order: "_Order", weight: int):
+        """StartOrder past routing: reserve, then either finish rejected or publish and complete in the background."""
+        handed_off = False
+        try:
+            reply = await self._reserve(order) if order.is_grocery else None
+            if reply is not None:
+                self._record(order, reply)
+                return self.orders.finish(order.request_id, reply)
+
+            self.orders.start(order.request_id)
+            await self._publish([order])
+            self._detach(self._complete_in_background(order, weight))
+            handed_off = True
+            return grocery_pb2.OrderStatus(request_id=order.request_id, state=grocery_pb2.ORDER_PENDING)
+        finally:
+            if not handed_off:
+                self.admission.release(weight)
+
+    async def _complete_in_background(self, order: "_Order", weight: int):
+        try:
+            reply = await self._complete(order)
         except Exception as e:
-            print(f"Analytics error: {e}")
-
-        # GROCERY_ORDER: check and deduct inventory
-        if request.request_type == grocery_pb2.GROCERY_ORDER:
+            reply = grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message=f"Order failed: {e}")
+        finally:
+            self.admission.release(weight)
+        self._record(order, reply)
+        self.orders.finish(order.request_id, reply)
+
+    async def GetOrderStatus(self, request, context):
+        return self.orders.get(request.request_id)
+
+    async def WatchOrder(self, request, context):
+        status = self.orders.get(request.request_id)
+        yield status
+        if status.state == grocery_pb2.ORDER_PENDING:
+            yield await self.orders.wait(request.request_id)
+
+    async def _route(self, order: "_Order"):
+        """Split the order by category; returns an error reply, or None once order.by_category is set."""
+        log.info("order received", extra={"request_id": order.request_id, "served_id": order.served_id,
+                                          "type": "GROCERY_ORDER" if order.is_grocery else "RESTOCK_ORDER",
+                                          "items": order.items, "trace_id": order.trace_id})
+
+        # Route by category; an unknown item may be new in the items table, so reload once before rejecting
+        by_category, unknown = self.catalog.split(order.items)
+        if unknown:
             try:
-                with get_db_connection() as conn:
-                    cur = conn.cursor()
-
-                    # Check all items are available
-                    for item_name, qty_needed in items_dict.items():
-                        cur.execute("SELECT quantity FROM items WHERE name = %s", (item_name,))
-                        row = cur.fetchone()
-                        if not row or row[0] < qty_needed:
-                            available = row[0] if row else 0
-                            return grocery_pb2.OrderReply(
-                                code=grocery_pb2.BAD_REQUEST,
-                                message=f"Insufficient inventory: {item_name} (need {qty_needed}, have {available})"
-                            )
-
-                    # Deduct inventory
-                    for item_name, qty in items_dict.items():
-                        cur.execute("UPDATE items SET quantity = quantity - %s WHERE name = %s", (qty, item_name))
-
+                if await self._db(self.catalog.refresh_if_stale):
+                    by_category, unknown = self.catalog.split(order.items)
             except Exception as e:
-                return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message=f"DB error: {e}")
-
-        # Prepare to wait for robots
-        self.tracker.init_request(request_id)
-
-        # Determine topic: FETCH for grocery, RESTOCK for restock (per spec)
-        topic = b"FETCH" if request.request_type == grocery_pb2.GROCERY_ORDER else b"RESTOCK"
-
-        # Build FlatBuffers payload and publish
-        fb_type = RequestType.RequestType.GROCERY_ORDER if topic == b"FETCH" else RequestType.RequestType.RESTOCK_ORDER
-        payload = build_workorder_fb(request_id, fb_type, served_id, items_dict)
-
-        self.pub.send_multipart([topic, payload])
-        print(f"[Inventory] Published {topic.decode()} via ZMQ to robots on {ZMQ_PUB_ADDR}")
-
-        # Wait for all 5 robots to respond (timeout to avoid hanging forever)
-        ok = self.tracker.wait_all(request_id, timeout_s=10.0)
+                log.warning("item catalog reload failed", extra={"error": str(e)})
+            if unknown:
+                return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST,
+                                              message=f"Unknown items: {', '.join(sorted(unknown))}")
+        # Nobody would pick these items up; say so now rather than after ROBOT_TIMEOUT_S (nothing reserved yet)
+        if ROBOT_LIVENESS == "fail":
+            down = self.robots.down(by_category)
+            if down:
+                order.failure = "unavailable"
+                return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST,
+                                              message=f"No robot available for: {', '.join(down)}")
+        order.by_category = by_category
+        return None
+
+    async def _reserve(self, order: "_Order"):
+        """GROCERY_ORDER: check and deduct all items atomically (one round-trip); returns an error reply or None."""
+        try:
+            with self.tracer.span(order.trace_id, "inventory.reserve", order.request_id) as attrs:
+                shortfalls = await self._db(self.reservations.reserve, order.items)
+                attrs["ok"] = not shortfalls
+        except Exception as e:
+            return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message=f"DB error: {e}")
+        if shortfalls:
+            return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message=format_shortfalls(shortfalls))
+        return None
+
+    async def _reserve_batch(self, orders) -> list:
+        """Reserve several grocery orders in one transaction; sets .reply on (and returns) the rejected ones."""
+        if not orders:
+            return []
+        start_ts, t0 = time.time(), time.perf_counter()
+        try:
+            results = await self._db(self.reservations.reserve_batch, [o.items for o in orders])
+        except Exception as e:
+            results = None
+            error = grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message=f"DB error: {e}")
+        duration_ms = (time.perf_counter() - t0) * 1000.0
+
+        rejected = []
+        for i, order in enumerate(orders):
+            if results is None:
+                order.reply = error
+            elif results[i]:
+                order.reply = grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST,
+                                                     message=format_shortfalls(results[i]))
+            if order.reply is not None:
+                rejected.append(order)
+                self._record(order, order.reply)
+            self.tracer.record(order.trace_id, "inventory.reserve", start_ts, duration_ms, order.request_id,
+                               ok=order.reply is None, batch=len(orders))
+        return rejected
+
+    async def _publish(self, orders):
+        """Register the orders with the tracker and send one WorkOrder per category, all in one burst."""
+        messages = []
+        for order in orders:
+            # Wait for the robots of the categories this order touches (robot name == category); the
+            # tracker resolves the wait as failed after ROBOT_TIMEOUT_S. The context feeds the per-robot spans.
+            self.tracker.init_request(order.request_id, expected=order.by_category, timeout_s=ROBOT_TIMEOUT_S,
+                                      context=(order.trace_id, time.time()))
+
+            # Determine topic: FETCH for grocery, RESTOCK for restock (per spec), one sub-topic per category
+            kind = b"FETCH" if order.is_grocery else b"RESTOCK"
+            fb_type = RequestType.RequestType.GROCERY_ORDER if order.is_grocery else RequestType.RequestType.RESTOCK_ORDER
+            for category, category_items in order.by_category.items():
+                payload = build_workorder_fb(order.request_id, fb_type, order.served_id, category_items,
+                                             order.trace_id)
+                messages.append((order, category, work_topic(kind, category), payload))
+
+        start_ts, t0 = time.time(), time.perf_counter()
+        for order, category, topic, payload in messages:
+            await self.dispatcher.send(order.request_id, category, topic, payload)
+        duration_ms = (time.perf_counter() - t0) * 1000.0
+        for order, category, topic, payload in messages:
+            kind = "FETCH" if order.is_grocery else "RESTOCK"
+            ZMQ_PUBLISHED.labels(kind).inc()
+            ZMQ_PUBLISHED_BYTES.labels(kind).inc(len(payload))
+        for order in orders:
+            self.tracer.record(order.trace_id, "inventory.publish", start_ts, duration_ms, order.request_id,
+                               categories=len(order.by_category), batch=len(orders))
+            log.info("published", extra={"request_id": order.request_id,
+                                         "kind": "FETCH" if order.is_grocery else "RESTOCK",
+                                         "categories": sorted(order.by_category)})
+
+    async def _complete(self, order: "_Order"):
+        """Wait for the order's robots, then restock or price it."""
+        span = self.tracer.span
+        request_id, trace_id, items_dict = order.request_id, order.trace_id, order.items
+
+        # Wait for those robots to respond (timeout to avoid hanging forever)
+        with span(trace_id, "inventory.wait_robots", request_id) as attrs:
+            ok = await self.tracker.wait_all(request_id)
+            attrs["ok"] = ok
 
         if not ok:
-            # Robot timeout - rollback inventory if needed
-            if request.request_type == grocery_pb2.GROCERY_ORDER:
+            missing = sorted(self.tracker.missing(request_id))
+            down = self.robots.down(missing) if ROBOT_LIVENESS == "fail" else []
+            order.failure = "unavailable" if down else "timeout"
+            # Robot timeout (or robot gone) - rollback inventory if needed
+            if order.is_grocery:
                 try:
-                    with get_db_connection() as conn:
-                        cur = conn.cursor()
-                        for item_name, qty in items_dict.items():
-                            cur.execute("UPDATE items SET quantity = quantity + %s WHERE name = %s", (qty, item_name))
+                    with span(trace_id, "inventory.release", request_id):
+                        await self._db(self.reservations.release, items_dict)
                 except Exception as e:
-                    print(f"CRITICAL: Failed to rollback inventory: {e}")
+                    log.critical("rollback of reserved stock failed",
+                                 extra={"request_id": request_id, "items": items_dict, "error": str(e)})
 
             self.tracker.cleanup(request_id)
-            return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST, message="Timed out waiting for all robots")
+            if down:
+                return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST,
+                                              message=f"Robots went away: {', '.join(down)}")
+            return grocery_pb2.OrderReply(code=grocery_pb2.BAD_REQUEST,
+                                          message=f"Timed out waiting for robots: {', '.join(missing)}")
 
         # For RESTOCK_ORDER: add inventory after robots complete
-        if request.request_type == grocery_pb2.RESTOCK_ORDER:
+        if not order.is_grocery:
             try:
-                with get_db_connection() as conn:
-                    cur = conn.cursor()
-                    for item_name, qty in items_dict.items():
-                        cur.execute("UPDATE items SET quantity = quantity + %s WHERE name = %s", (qty, item_name))
+                with span(trace_id, "inventory.restock", request_id):
+                    await self._db(self.reservations.restock, items_dict)
             except Exception as e:
-                print(f"Failed to add restock inventory: {e}")
+                log.error("restock failed", extra={"request_id": request_id, "items": items_dict, "error": str(e)})
 
         # For GROCERY_ORDER: get pricing from Pricing service
         price_message = ""
-        if request.request_type == grocery_pb2.GROCERY_ORDER:
+        if order.is_grocery:
             try:
-                print(f"[Inventory] Requesting price from Pricing service for {items_dict}")
-                with grpc.insecure_channel(PRICING_GRPC_ADDR) as channel:
-                    pricing_stub = grocery_pb2_grpc.PricingServiceStub(channel)
-                    price_request = grocery_pb2.PriceRequest(items=items_dict)
-                    price_reply = pricing_stub.GetPrice(price_request)
-
-                    if price_reply.code == grocery_pb2.OK:
-                        price_message = f"\n\nITEMIZED BILL:\n"
-                        for item_price in price_reply.item_prices:
-                            price_message += f"  {item_price.name}: {item_price.quantity} x ${item_price.unit_price:.2f} = ${item_price.subtotal:.2f}\n"
-                        price_message += f"TOTAL: ${price_reply.total:.2f}"
-                        print(f"[Inventory] Received pricing: ${price_reply.total:.2f}")
-                    else:
-                        price_message = f"\nPricing error: {price_reply.message}"
-                        print(f"[Inventory] Pricing service error: {price_reply.message}")
+                log.debug("requesting price", extra={"request_id": request_id, "items": items_dict})
+                pricing_stub = self.channels.stub(self.pricing_addr, grocery_pb2_grpc.PricingServiceStub)
+                price_request = grocery_pb2.PriceRequest(items=items_dict)
+                with span(trace_id, "inventory.pricing", request_id):
+                    price_reply = await pricing_stub.GetPrice(price_request, timeout=5,
+                                                              metadata=trace_metadata(trace_id))
+
+                if price_reply.code == grocery_pb2.OK:
+                    price_message = f"\n\nITEMIZED BILL:\n"
+                    for item_price in price_reply.item_prices:
+                        price_message += f"  {item_price.name}: {item_price.quantity} x ${item_price.unit_price:.2f} = ${item_price.subtotal:.2f}\n"
+                    price_message += f"TOTAL: ${price_reply.total:.2f}"
+                    log.info("priced", extra={"request_id": request_id, "total": round(price_reply.total, 2)})
+                else:
+                    price_message = f"\nPricing error: {price_reply.message}"
+                    log.warning("pricing error", extra={"request_id": request_id, "error": price_reply.message})
 
             except Exception as e:
                 price_message = f"\nPricing service unavailable: {e}"
-                print(f"[Inventory] Failed to connect to Pricing service: {e}")
-
-        # Record analytics
-        try:
-            with get_db_connection() as conn:
-                cur = conn.cursor()
-                duration_ms = int((time.time() - start_time) * 1000)
-                cur.execute("""
-                    UPDATE analytics
-                    SET end_time = NOW(), total_duration_ms = %s
-                    WHERE request_id = %s
-                """, (duration_ms, request_id))
-        except Exception as e:
-            print(f"Analytics error: {e}")
+                log.error("pricing unavailable", extra={"request_id": request_id, "error": str(e)})
 
         self.tracker.cleanup(request_id)
         success_message = f"OK: received all robot replies for {request_id}{price_message}"
         return grocery_pb2.OrderReply(code=grocery_pb2.OK, message=success_message)
 
-    def ReportRobotResult(self, request, context):
-        # request is RobotResult
-        print(f"[Inventory] RobotResult request_id={request.request_id} robot={request.robot_name} "
-              f"served_id={request.served_id} status={request.status} msg={request.message}")
-
-        # Mark robot as seen
-        self.tracker.mark_robot(request.request_id, request.robot_name, expected_count=len(self.EXPECTED_ROBOTS))
+    def _record(self, order: "_Order", reply):
+        """Total-latency span and analytics row (queued; completed orders get end_time and duration)."""
+        end_time = time.time()
+        ok = reply.code == grocery_pb2.OK
+        self.tracer.record(order.trace_id, "inventory.total", order.start_time, (end_time - order.start_time) * 1000.0,
+                           order.request_id, items=len(order.items), ok=ok)
+        request_type = 'GROCERY_ORDER' if order.is_grocery else 'RESTOCK_ORDER'
+        self.analytics.record(order.request_id, order.served_id, request_type, order.start_time,
+                              end_time if ok else None)
+        ORDERS.labels(request_type, "ok" if ok else order.failure or "rejected").inc()
+        ORDER_SECONDS.labels(request_type).observe(end_time - order.start_time)
+
+    def _on_robot_result(self, rr):
+        """Record one RobotResult, whichever way it arrived."""
+        robot_log.info("robot result", extra={"request_id": rr.request_id, "robot": rr.robot_name,
+                                              "served_id": rr.served_id,
+                                              "status": grocery_pb2.RobotStatus.Name(rr.status), "detail": rr.message})
+        ROBOT_RESULTS.labels(rr.robot_name, grocery_pb2.RobotStatus.Name(rr.status)).inc()
+
+        # Robot span: from publish until this result arrived, plus the robot's own work time
+        published = self.tracker.context(rr.request_id)
+        if published is not None:
+            trace_id, published_at = published
+            now = time.time()
+            ROBOT_RESPONSE_SECONDS.labels(rr.robot_name).observe(now - published_at)
+            self.tracer.record(trace_id, f"robot.{rr.robot_name}", published_at, (now - published_at) * 1000.0,
+                               rr.request_id, status=grocery_pb2.RobotStatus.Name(rr.status),
+                               work_ms=round(rr.work_ms, 3))
+
+        # Mark the robot's category as answered (wakes the waiting SubmitOrder once all have)
+        self.tracker.mark_category(rr.request_id, rr.robot_name)
+
+    def _on_robots_down(self, category: str):
+        """The last robot of a category is gone: fail the orders still waiting on it instead of timing them out."""
+        if self._sessions_closing.is_set():
+            # Inventory is shutting down; in-flight orders get the grace period instead
+            return
+        failed = self.tracker.fail_category(category) if ROBOT_LIVENESS == "fail" else 0
+        robot_log.warning("no live robot left", extra={"robot": category, "failed_orders": failed})
+
+    async def log_admission_stats(self, interval_s: float = ADMISSION_STATS_INTERVAL_S):
+        """Log admission stats every interval_s while orders are being turned away."""
+        last = self.admission.rejected()
+        while True:
+            await asyncio.sleep(interval_s)
+            rejected = self.admission.rejected()
+            if rejected != last:
+                log.warning("orders turned away", extra={"rejected": rejected - last, "interval_s": interval_s,
+                                                         **self.admission.stats()})
+                last = rejected
+
+    def collect_metrics(self):
+        """Scrape-time metrics read from the tracker, admission control and background writers."""
+        admission = self.admission.stats()
+        families = [
+            ("inventory_tracker_in_flight", "gauge", "Orders waiting for robots", [({}, self.tracker.in_flight())]),
+            stats_family("inventory_admission", "Orders holding an admission slot or queued for one", admission,
+                         ("in_flight", "queued"), label="state"),
+            ("inventory_admission_rejected_total", "counter", "Orders turned away by admission control", [
+                ({"reason": "queue_full"}, admission["rejected_queue_full"]),
+                ({"reason": "queue_timeout"}, admission["rejected_queue_timeout"]),
+                ({"reason": "deadline"}, admission["rejected_deadline"]),
+            ]),
+            stats_family("inventory_async_orders", "Orders started with StartOrder, by state", self.orders.stats(),
+                         ("pending", "done"), label="state"),
+            *self.robot_metrics(),
+            stats_family("inventory_analytics_writer", "Analytics rows queued, written and dropped",
+                         self.analytics.stats(), ("queued", "written", "dropped", "write_errors")),
+        ]
+        stats = getattr(self.reservations, "stats", None)
+        if stats is not None:
+            families.append(stats_family("inventory_stock_cache", "In-memory stock cache counters", stats(),
+                                         ("pending_items", "journal_seq", "journal_syncs", "flushes",
+                                          "flush_errors", "corrections")))
+        return families
+
+
+class InventoryApp:
+    """A running Inventory: gRPC server, ZMQ dispatcher and service, with one stop() for all of them."""
+
+    def __init__(self, server, dispatcher, service: InventoryService):
+        self.server = server
+        self.dispatcher = dispatcher
+        self.service = service
+        self._stats_task = asyncio.ensure_future(service.log_admission_stats())
+        self._sweep_task = asyncio.ensure_future(service.sweep_robots())
+        register_collector(service.collect_metrics)
+
+    async def stop_serving(self, grace_s: float = 1.0):
+        """Stop taking RPCs; robot sessions end normally and in-flight calls get grace_s to finish."""
+        self.service.close_sessions()
+        await self.server.stop(grace_s)
+
+    async def stop(self):
+        self._stats_task.cancel()
+        self._sweep_task.cancel()
+        unregister_collector(self.service.collect_metrics)
+        await self.stop_serving()
+        self.dispatcher.close()
+        await self.service.channels.close()
+        self.service.tracker.close()
+        self.service.db_executor.shutdown(wait=False)
+        self.service.analytics.close()
+        self.service.reservations.close()
+        flush_spans()
+
+
+class RobotHubApp:
+    """A running hub of a sharded Inventory: robot-facing gRPC server, dispatcher and shard link."""
+
+    def __init__(self, server, hub: RobotHub):
+        self.server = server
+        self.hub = hub
+        self._sweep_task = asyncio.ensure_future(hub.sweep_robots())
+        register_collector(hub.collect_metrics)
+
+    async def stop_serving(self, grace_s: float = 1.0):
+        self.hub.close_sessions()
+        await self.server.stop(grace_s)
+
+    async def stop(self):
+        self._sweep_task.cancel()
+        unregister_collector(self.hub.collect_metrics)
+        await self.stop_serving()
+        self.hub.dispatcher.close()
+        self.hub.close()
+        flush_spans()
+
+
+def bind_dispatcher(dispatch: str, pub_addr: str, router_addr: str, wanted):
+    """Bind the ZMQ socket robots get their work from (ROUTER, or PUB with dispatch="pubsub"); not started yet."""
+    # ZeroMQ socket (asyncio flavour, so sends never block the loop)
+    ctx = zmq.asyncio.Context.instance()
+    if dispatch == "pubsub":
+        pub = ctx.socket(zmq.PUB)
+        pub.setsockopt(zmq.SNDHWM, ZMQ_SNDHWM)
+        pub.bind(pub_addr)
+        print(f"[Inventory] ZMQ PUB bound at {pub_addr}")
+        return PubDispatcher(pub)
+    if dispatch == "router":
+        router = ctx.socket(zmq.ROUTER)
+        router.setsockopt(zmq.SNDHWM, ZMQ_SNDHWM)
+        router.bind(router_addr)
+        print(f"[Inventory] ZMQ ROUTER bound at {router_addr} (robot replicas share each category's work)")
+        return RouterDispatcher(router, expire_s=3 * ROBOT_HEARTBEAT_S, wanted=wanted)
+    raise ValueError(f"Unknown ROBOT_DISPATCH {dispatch!r} (router or pubsub)")
+
+
+async def start_inventory(grpc_addr: str = "0.0.0.0:50051", pub_addr: str = ZMQ_PUB_ADDR,
+                          pricing_addr: str = PRICING_GRPC_ADDR, router_addr: str = ZMQ_ROUTER_ADDR,
+                          dispatch: str = ROBOT_DISPATCH, shard: int = None,
+                          shard_link_addr: str = INVENTORY_SHARD_LINK_ADDR, **service_kwargs) -> InventoryApp:
+    """
+    Bind the ZMQ socket robots get their work from and start the Inventory
+    gRPC server on the running loop. As shard `shard` of a sharded Inventory
+    there is no robot socket: WorkOrders and results go through the hub at
+    shard_link_addr.
+    service_kwargs are passed to InventoryService (e.g. stand-in reservations/analytics for benchmarks).
+    """
+    tracker = RobotTracker()
 
-        return grocery_pb2.Ack(ok=True, message="ack")
+    if shard is None:
+        # A backlogged WorkOrder is only sent if its order still waits for that category
+        dispatcher = bind_dispatcher(dispatch, pub_addr, router_addr,
+                                     wanted=lambda request_id, category: category in tracker.missing(request_id))
+    else:
+        link = zmq.asyncio.Context.instance().socket(zmq.DEALER)
+        link.setsockopt(zmq.ROUTING_ID, shard_prefix(shard).encode())
+        link.setsockopt(zmq.SNDHWM, ZMQ_SNDHWM)
+        link.connect(shard_link_addr)
+        dispatcher = ShardLink(link, grace_s=ROBOT_LIVENESS_GRACE_S)
+        service_kwargs.update(robots=dispatcher.mirror, id_prefix=shard_prefix(shard))
+        print(f"[Inventory] shard {shard}: WorkOrders go through the hub at {shard_link_addr}")
+
+    channels = AioChannelManager()
+    service = InventoryService(dispatcher, tracker, channels=channels, pricing_addr=pricing_addr, **service_kwargs)
+    if shard is not None:
+        dispatcher.attach(service._on_robot_result, service._on_robots_down)
+    dispatcher.start()
+
+    # Item -> category routing table; if the DB is not up yet, the first order loads it
+    try:
+        await service._db(service.catalog.load)
+        print(f"[Inventory] Routing {len(service.catalog.names())} items to robots {sorted(service.catalog.categories())}")
+    except Exception as e:
+        print(f"[Inventory] Item catalog load failed (will retry on first order): {e}")
 
+    # gRPC server
+    server = grpc.aio.server(options=server_options())
+    grocery_pb2_grpc.add_InventoryServiceServicer_to_server(service, server)
+    server.add_insecure_port(grpc_addr)
+    await server.start()
+    print(f"[Inventory gRPC] listening on {grpc_addr}")
 
-def serve():
-    # ZeroMQ PUB socket
-    ctx = zmq.Context.instance()
-    pub = ctx.socket(zmq.PUB)
-    pub.bind(ZMQ_PUB_ADDR)
-    print(f"[Inventory] ZMQ PUB bound at {ZMQ_PUB_ADDR}")
+    # Warm up the Pricing channel so the first order doesn't pay the connection setup
+    if await channels.wait_ready(pricing_addr, timeout_s=2.0):
+        print(f"[Inventory] Pricing reachable at {pricing_addr}")
+    else:
+        print(f"[Inventory] Pricing not reachable yet at {pricing_addr} (will keep retrying)")
 
-    tracker = RobotTracker()
+    return InventoryApp(server, dispatcher, service)
 
-    # gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    grocery_pb2_grpc.add_InventoryServiceServicer_to_server(InventoryService(pub, tracker), server)
 
-    grpc_addr = "0.0.0.0:50051"
+async def start_robot_hub(grpc_addr: str = "0.0.0.0:50051", pub_addr: str = ZMQ_PUB_ADDR,
+                          router_addr: str = ZMQ_ROUTER_ADDR, dispatch: str = ROBOT_DISPATCH,
+                          link_addr: str = INVENTORY_SHARD_LINK_ADDR) -> RobotHubApp:
+    """
+    Start the hub of a sharded Inventory: the robots' gRPC endpoints on
+    grpc_addr (where robots find an unsharded Inventory), their WorkOrder
+    socket, and the link the shards connect to at link_addr.
+    """
+    link = zmq.asyncio.Context.instance().socket(zmq.ROUTER)
+    link.setsockopt(zmq.SNDHWM, ZMQ_SNDHWM)
+    link.bind(link_addr)
+    hub = RobotHub(link, timeout_s=ROBOT_TIMEOUT_S, ttl_s=3 * ROBOT_HEARTBEAT_S)
+    hub.dispatcher = bind_dispatcher(dispatch, pub_addr, router_addr, wanted=hub.wanted)
+    hub.dispatcher.start()
+    hub.start()
+    print(f"[Inventory hub] shard link bound at {link_addr}")
+
+    server = grpc.aio.server(options=server_options())
+    grocery_pb2_grpc.add_InventoryServiceServicer_to_server(hub, server)
     server.add_insecure_port(grpc_addr)
-    server.start()
-    print(f"[Inventory gRPC] listening on {grpc_addr}")
+    await server.start()
+    print(f"[Inventory hub gRPC] robots report to {grpc_addr}")
+    return RobotHubApp(server, hub)
 
+
+async def serve(shard: int = None):
+    if shard is not None and INVENTORY_CACHE:
+        raise SystemExit("[Inventory] INVENTORY_CACHE=1 keeps the stock in one process; it can't be sharded")
+
+    # Open DB connections up front so the first orders skip the handshake
     try:
-        while True:
-            time.sleep(3600)
-    except KeyboardInterrupt:
+        get_pool().prefill()
+    except Exception as e:
+        print(f"[Inventory] DB pool prefill failed (will retry on demand): {e}")
+
+    service_kwargs = {}
+    if INVENTORY_CACHE:
+        # Replays the journal and loads stock before the first order is accepted
+        service_kwargs["reservations"] = StockCache().start()
+
+    if shard is None:
+        app = await start_inventory(**service_kwargs)
+        start_metrics_server(INVENTORY_METRICS_PORT, name="Inventory")
+    else:
+        app = await start_inventory(f"0.0.0.0:{INVENTORY_SHARD_PORT + shard}", shard=shard, **service_kwargs)
+        if INVENTORY_SHARD_METRICS_PORT:
+            start_metrics_server(INVENTORY_SHARD_METRICS_PORT + shard, name=f"Inventory shard {shard}")
+    # Treat SIGTERM like Ctrl+C so queued analytics rows and spans are flushed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(app.stop_serving()))
+    try:
+        await app.server.wait_for_termination()
+    finally:
         print("\n[Inventory] shutting down...")
-        server.stop(0)
-        pub.close()
+        await app.stop()
+        print(f"[Inventory] admission stats: {app.service.admission.stats()}")
+        print(f"[Inventory] analytics writer stats: {app.service.analytics.stats()}")
+        if INVENTORY_CACHE:
+            print(f"[Inventory] stock cache stats: {app.service.reservations.stats()}")
+        print(f"[Inventory] DB pool stats: {get_pool().stats()}")
+        close_pool()
+
+
+def _spawn_shard(shard: int) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), "--shard", str(shard)])
+
+
+async def serve_sharded(shards: int):
+    """
+    Sharded Inventory: the robot hub in this process and `shards` Inventory
+    shards as child processes, restarted when one exits. On SIGTERM or
+    Ctrl+C the shards are stopped first, so the hub can still pass them the
+    results of their last orders.
+    """
+    if INVENTORY_CACHE:
+        raise SystemExit("[Inventory] INVENTORY_CACHE=1 keeps the stock in one process; it can't be sharded")
+    app = await start_robot_hub()
+    start_metrics_server(INVENTORY_METRICS_PORT, name="Inventory hub")
+    procs = {shard: _spawn_shard(shard) for shard in range(shards)}
+    addrs = ",".join(f"localhost:{INVENTORY_SHARD_PORT + shard}" for shard in range(shards))
+    print(f"[Inventory] started {shards} shards; point Ordering at INVENTORY_ADDR={addrs}")
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    try:
+        while not stopping.is_set():
+            for shard, proc in procs.items():
+                if proc.poll() is not None:
+                    shard_log.warning("shard exited, restarting", extra={"shard": shard, "code": proc.returncode})
+                    procs[shard] = _spawn_shard(shard)
+            try:
+                await asyncio.wait_for(stopping.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        print("\n[Inventory] stopping shards...")
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs.values():
+            await loop.run_in_executor(None, proc.wait)
+        await app.stop()
+        print(f"[Inventory hub] stats: {app.hub.stats()}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shards", type=int, default=INVENTORY_SHARDS,
+                    help="Inventory processes; above 1, a robot hub plus that many shards")
+    ap.add_argument("--shard", type=int, default=None, help="run as this shard of a sharded Inventory (the hub starts them)")
+    args = ap.parse_args()
+    try:
+        if args.shard is not None:
+            asyncio.run(serve(shard=args.shard))
+        elif args.shards > 1:
+            asyncio.run(serve_sharded(args.shards))
+        else:
+            asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
-    serve()
+    main()
@@ -0,0 +1,324 @@
+"""
+Sharded Inventory (INVENTORY_SHARDS > 1): several Inventory processes
+behind one robot-facing hub, so orders can use more than one core.
+
+- Shard i is a whole Inventory (admission, tracker, order status,
+  reservations) serving Ordering on its own gRPC port. Every request_id it
+  creates starts with "s<i>-" (utils/sharding.py).
+- The hub is what robots see. It binds the WorkOrder socket (ROUTER, or PUB
+  with ROBOT_DISPATCH=pubsub) and serves RobotSession, ReportRobotResult
+  and RobotHeartbeat, so it owns the robot registry and the dispatcher.
+- Shards and hub talk over one local ZMQ link (a DEALER per shard, with the
+  shard prefix as its routing id, to the hub's ROUTER):
+
+    shard -> hub  HELLO                                     every sync_s
+                  WORK <request_id> <category> <topic> <payload>
+    hub -> shard  LIVE <json>                               answers HELLO
+                  RESULTS <RobotResult>...                  batched per loop iteration
+                  DOWN <category>                           last robot of a category left
+
+A RobotResult goes to the shard named by its request_id prefix. LIVE is
+the hub's view of robot liveness, which the shard's RegistryMirror answers
+from in place of its own registry.
+"""
+import asyncio
+import json
+import time
+from typing import Dict, List, Tuple
+
+import zmq
+
+from generated.proto import grocery_pb2
+
+from services.inventory_grpc.robot_endpoint import RobotEndpoint
+from services.inventory_grpc.robot_registry import RobotRegistry
+from utils.log import get_logger
+from utils.sharding import shard_of, shard_prefix
+
+HELLO = b"HELLO"
+WORK = b"WORK"
+LIVE = b"LIVE"
+RESULTS = b"RESULTS"
+DOWN = b"DOWN"
+
+log = get_logger("inventory.shards")
+
+
+class RegistryMirror:
+    """
+    A shard's copy of the hub's RobotRegistry, with the same read methods.
+    Until the first LIVE (and for grace_s after the shard starts) categories
+    it hasn't heard of count as live. Once LIVE stops arriving for stale_s the
+    hub is taken to be gone and no category is live.
+    """
+    def __init__(self, grace_s: float, stale_s: float):
+        self.grace_s = grace_s
+        self.stale_s = stale_s
+        self._started = time.monotonic()
+        self._updated = None
+        self._alive = set()
+        self._known = set()
+        self._hub_grace = False
+        self._instances: Dict[str, int] = {}
+
+    def update(self, snapshot: dict):
+        self._alive = set(snapshot["alive"])
+        self._known = set(snapshot["known"])
+        self._hub_grace = snapshot["grace"]
+        self._instances = snapshot["instances"]
+        self._updated = time.monotonic()
+
+    def mark_down(self, category: str):
+        self._alive.discard(category)
+        self._known.add(category)
+
+    def alive(self, category: str) -> bool:
+        now = time.monotonic()
+        starting = now - self._started < self.grace_s
+        if self._updated is None or now - self._updated > self.stale_s:
+            return starting
+        if category in self._alive:
+            return True
+        return category not in self._known and (self._hub_grace or starting)
+
+    def down(self, categories) -> List[str]:
+        return sorted(c for c in categories if not self.alive(c))
+
+    def live_instances(self) -> Dict[str, int]:
+        return dict(self._instances)
+
+    def stats(self) -> dict:
+        return {"live": self.live_instances(), "synced": self._updated is not None}
+
+    # Robots talk to the hub, not to a shard
+    def open(self, category: str, instance: str):
+        pass
+
+    def heartbeat(self, category: str, instance: str) -> bool:
+        return False
+
+    def close(self, category: str, instance: str):
+        pass
+
+    def sweep(self, now: float = None) -> List[str]:
+        return []
+
+
+class ShardLink:
+    """
+    A shard's dispatcher: WorkOrders go to the hub, which dispatches them.
+    mirror is the hub's liveness as of its last LIVE (stale after three
+    missed ones); attach() names what to call for results and downed
+    categories.
+    """
+    def __init__(self, socket, grace_s: float, sync_s: float = 1.0):
+        self.socket = socket
+        self.sync_s = sync_s
+        self.mirror = RegistryMirror(grace_s, stale_s=3 * sync_s)
+        self._on_result = None
+        self._on_down = None
+        self._tasks = []
+        self.sent = 0
+        self.dropped = 0
+        self.results = 0
+
+    def attach(self, on_result, on_down):
+        self._on_result = on_result
+        self._on_down = on_down
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._receive()), asyncio.ensure_future(self._hello_loop())]
+
+    async def send(self, request_id: str, category: str, topic: bytes, payload: bytes):
+        try:
+            # With NOBLOCK pyzmq finishes (or fails) the send before returning, so result() never waits
+            self.socket.send_multipart([WORK, request_id.encode(), category.encode(), topic, payload],
+                                       flags=zmq.NOBLOCK, copy=False).result()
+            self.sent += 1
+        except zmq.Again:
+            # Hub not connected (or not keeping up); the order fails like any order whose robots don't answer
+            self.dropped += 1
+            log.warning("hub unreachable, WorkOrder dropped", extra={"request_id": request_id, "robot": category})
+
+    def forget(self, instance: str):
+        pass
+
+    def sweep(self, now: float = None):
+        pass
+
+    def replicas(self) -> List[Tuple[str, str, int, int]]:
+        return []
+
+    def stats(self) -> dict:
+        return {"dispatched": self.sent, "dropped": self.dropped}
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self.socket.close(linger=0)
+
+    async def _hello_loop(self):
+        while True:
+            try:
+                self.socket.send(HELLO, flags=zmq.NOBLOCK).result()
+            except zmq.Again:
+                pass
+            await asyncio.sleep(self.sync_s)
+
+    async def _receive(self):
+        while True:
+            frames = await self.socket.recv_multipart()
+            try:
+                verb = frames[0]
+                if verb == RESULTS:
+                    for frame in frames[1:]:
+                        self.results += 1
+                        self._on_result(grocery_pb2.RobotResult.FromString(frame))
+                elif verb == LIVE:
+                    self.mirror.update(json.loads(frames[1]))
+                elif verb == DOWN:
+                    category = frames[1].decode()
+                    self.mirror.mark_down(category)
+                    self._on_down(category)
+                else:
+                    raise ValueError(f"unknown message {verb!r}")
+            except Exception as e:
+                log.warning("bad message from hub", extra={"error": str(e), "frames": len(frames)})
+
+
+class RobotHub(RobotEndpoint):
+    """
+    The robot-facing process of a sharded Inventory: robots register, report
+    and get their WorkOrders here, and each shard gets the results for its
+    own orders. Order RPCs are not served (Ordering talks to the shards).
+    The dispatcher is set once it is built, since it asks wanted().
+    """
+    def __init__(self, link_socket, timeout_s: float, ttl_s: float):
+        super().__init__(None, RobotRegistry(ttl_s=ttl_s, on_down=self._on_robots_down))
+        self.socket = link_socket
+        # Unroutable results raise EHOSTUNREACH instead of vanishing
+        self.socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        self.timeout_s = timeout_s
+        # Routing ids of the shards that said HELLO (and were reachable since)
+        self.shards = set()
+        # request_id -> [give up at (monotonic), categories still to answer]
+        self._pending: Dict[str, list] = {}
+        # shard routing id -> serialized results not yet sent
+        self._outbox: Dict[bytes, List[bytes]] = {}
+        self._tasks = []
+        self.work = 0
+        self.routed = 0
+        self.unroutable = 0
+
+    def wanted(self, request_id: str, category: str) -> bool:
+        """Dispatcher hook: a WorkOrder is still worth sending while its shard waits for that category."""
+        entry = self._pending.get(request_id)
+        return entry is not None and category in entry[1] and time.monotonic() < entry[0]
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._receive()), asyncio.ensure_future(self._expire_loop())]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self.socket.close(linger=0)
+
+    def _on_robot_result(self, rr):
+        entry = self._pending.get(rr.request_id)
+        if entry is not None:
+            entry[1].discard(rr.robot_name)
+            if not entry[1]:
+                del self._pending[rr.request_id]
+        shard = shard_of(rr.request_id)
+        if shard is None:
+            self.unroutable += 1
+            log.warning("result without a shard prefix", extra={"request_id": rr.request_id,
+                                                                 "robot": rr.robot_name})
+            return
+        identity = shard_prefix(shard).encode()
+        outbox = self._outbox.get(identity)
+        if outbox is None:
+            outbox = self._outbox[identity] = []
+            # One RESULTS message per shard for everything that arrived in this loop iteration
+            asyncio.get_running_loop().call_soon(self._flush, identity)
+        outbox.append(rr.SerializeToString())
+
+    def _flush(self, identity: bytes):
+        frames = self._outbox.pop(identity)
+        if self._send(identity, [RESULTS, *frames]):
+            self.routed += len(frames)
+        else:
+            self.unroutable += len(frames)
+            log.warning("shard unreachable, results dropped", extra={"shard": identity.decode(),
+                                                                      "results": len(frames)})
+
+    def _on_robots_down(self, category: str):
+        if self._sessions_closing.is_set():
+            return
+        log.warning("no live robot left", extra={"robot": category, "shards": len(self.shards)})
+        for identity in list(self.shards):
+            self._send(identity, [DOWN, category.encode()])
+
+    def _send(self, identity: bytes, frames: list) -> bool:
+        try:
+            self.socket.send_multipart([identity, *frames], flags=zmq.NOBLOCK).result()
+            return True
+        except zmq.Again:
+            return False
+        except zmq.ZMQError as e:
+            if e.errno != zmq.EHOSTUNREACH:
+                raise
+            self.shards.discard(identity)
+            return False
+
+    def _snapshot(self) -> bytes:
+        # live_instances() lists every category that ever registered, with 0 once its robots left
+        instances = self.robots.live_instances()
+        return json.dumps({
+            "alive": [c for c in instances if self.robots.alive(c)],
+            "known": list(instances),
+            "grace": self.robots.in_grace(),
+            "instances": {c: n for c, n in instances.items() if n},
+        }).encode()
+
+    async def _receive(self):
+        while True:
+            frames = await self.socket.recv_multipart()
+            try:
+                identity, verb = frames[0], frames[1]
+                if verb == HELLO:
+                    if identity not in self.shards:
+                        log.info("shard connected", extra={"shard": identity.decode()})
+                        self.shards.add(identity)
+                    self._send(identity, [LIVE, self._snapshot()])
+                elif verb == WORK:
+                    request_id, category = frames[2].decode(), frames[3].decode()
+                    entry = self._pending.get(request_id)
+                    if entry is None:
+                        entry = self._pending[request_id] = [time.monotonic() + self.timeout_s, set()]
+                    entry[1].add(category)
+                    self.work += 1
+                    await self.dispatcher.send(request_id, category, frames[4], frames[5])
+                else:
+                    raise ValueError(f"unknown message {verb!r}")
+            except (IndexError, ValueError, UnicodeDecodeError) as e:
+                log.warning("bad message from shard", extra={"error": str(e), "frames": len(frames)})
+
+    async def _expire_loop(self):
+        """Forget orders their shard has given up on (it never says so; it times them out like the hub)."""
+        while True:
+            await asyncio.sleep(self.timeout_s)
+            now = time.monotonic()
+            for request_id in [r for r, entry in self._pending.items() if entry[0] < now]:
+                del self._pending[request_id]
+
+    def stats(self) -> dict:
+        return {"shards": len(self.shards), "work": self.work, "routed": self.routed,
+                "unroutable": self.unroutable, "pending": len(self._pending)}
+
+    def collect_metrics(self):
+        return self.robot_metrics() + [
+            ("inventory_hub", "gauge", "Sharded Inventory hub: shards connected, WorkOrders received, "
+             "results routed to their shard or dropped, orders with categories still to answer",
+             [({"kind": key}, value) for key, value in self.stats().items()]),
+        ]
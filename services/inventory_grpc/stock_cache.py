@@ -0,0 +1,451 @@
+"""
+Write-through stock cache for Inventory (INVENTORY_CACHE=1).
+
+StockCache is a drop-in for ReservationEngine that keeps items.quantity in
+memory and makes it authoritative while Inventory runs:
+
+- reserve / reserve_batch / release / restock check and change the in-memory
+  stock under one lock per item, always taken in name order.
+- Every change is appended to a journal file and synced to disk before the
+  call returns. Concurrent callers share one fsync (group commit), so a crash
+  never loses an acknowledged reservation.
+- A background thread writes the accumulated deltas to items every
+  flush_interval_s in one transaction. The same transaction stores the last
+  journal sequence number in inventory_checkpoint. The journal is split into
+  segments, and a segment is deleted once the database has its deltas.
+- On startup, journal records past the checkpoint are replayed into items,
+  then the stock is loaded. scripts/reconcile_inventory.py does the same
+  replay offline and shows how the database differs from the journal.
+- Every reconcile_interval_s the cache is compared with the database. Edits
+  made to items behind Inventory's back (e.g. a manual restock in SQL) are
+  adopted and logged.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from psycopg2.extras import execute_values
+
+from utils.db import get_db_connection
+
+
+INVENTORY_CACHE = os.environ.get("INVENTORY_CACHE", "0") == "1"
+INVENTORY_JOURNAL_DIR = os.environ.get("INVENTORY_JOURNAL_DIR", "journal")
+# Checkpoint key in inventory_checkpoint. It only keeps checkpoints apart (e.g. stress_reservation.py's);
+# the cache itself needs exactly one Inventory per database
+INVENTORY_JOURNAL_NAME = os.environ.get("INVENTORY_JOURNAL_NAME", "inventory")
+# 0 = flush journal writes to the OS only (survives a process crash, not a power loss)
+INVENTORY_JOURNAL_FSYNC = os.environ.get("INVENTORY_JOURNAL_FSYNC", "1") == "1"
+INVENTORY_CACHE_FLUSH_S = float(os.environ.get("INVENTORY_CACHE_FLUSH_S", "0.5"))
+INVENTORY_CACHE_RECONCILE_S = float(os.environ.get("INVENTORY_CACHE_RECONCILE_S", "60"))
+
+STOCK_SQL = "SELECT name, quantity FROM items"
+
+CHECKPOINT_SQL = "SELECT seq FROM inventory_checkpoint WHERE journal = %s"
+
+# quantity has CHECK (quantity >= 0); if someone lowered a row behind the cache's back, clamp
+# instead of failing the whole write-back (the next reconcile adopts the database value)
+APPLY_DELTAS_SQL = """
+UPDATE items
+SET quantity = GREATEST(0, items.quantity + v.delta)
+FROM (VALUES %s) AS v(name, delta)
+WHERE items.name = v.name
+"""
+
+SAVE_CHECKPOINT_SQL = """
+INSERT INTO inventory_checkpoint (journal, seq, updated_at)
+VALUES (%s, %s, CURRENT_TIMESTAMP)
+ON CONFLICT (journal) DO UPDATE SET seq = EXCLUDED.seq, updated_at = EXCLUDED.updated_at
+"""
+
+
+def load_stock() -> Dict[str, int]:
+    with get_db_connection(op="stock_load") as conn:
+        cur = conn.cursor()
+        cur.execute(STOCK_SQL)
+        return {name: int(qty) for name, qty in cur.fetchall()}
+
+
+def load_checkpoint(journal_name: str) -> int:
+    """Last journal seq whose deltas are in items (0 if none yet)."""
+    with get_db_connection(op="stock_checkpoint") as conn:
+        cur = conn.cursor()
+        cur.execute(CHECKPOINT_SQL, (journal_name,))
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+
+def apply_deltas(journal_name: str, deltas: Dict[str, int], seq: int):
+    """Add deltas to items and move the checkpoint to seq, in one transaction."""
+    with get_db_connection(op="stock_flush") as conn:
+        cur = conn.cursor()
+        rows = [(name, delta) for name, delta in deltas.items() if delta]
+        if rows:
+            execute_values(cur, APPLY_DELTAS_SQL, rows, template="(%s, %s)", page_size=len(rows))
+        cur.execute(SAVE_CHECKPOINT_SQL, (journal_name, seq))
+
+
+def _merge(into: Dict[str, int], deltas: Dict[str, int]):
+    for name, delta in deltas.items():
+        into[name] = into.get(name, 0) + delta
+
+
+class StockJournal:
+    """
+    Append-only journal of stock deltas, one JSON line per change:
+    {"seq": 17, "d": {"milk": -2, "eggs": -1}}.
+
+    Written in segments named <name>.<first seq>.journal. Appends are not
+    thread-safe on their own (StockCache serializes them). sync() can be
+    called from any thread.
+    """
+    def __init__(self, directory: str = INVENTORY_JOURNAL_DIR, name: str = INVENTORY_JOURNAL_NAME,
+                 fsync: bool = INVENTORY_JOURNAL_FSYNC):
+        self.directory = directory
+        self.name = name
+        self.fsync = fsync
+        self._sync_lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._seq = 0
+        self._synced = 0
+        self.syncs = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def segments(self) -> List[str]:
+        """Existing segment paths, oldest first."""
+        prefix = self.name + "."
+        found = []
+        for fname in os.listdir(self.directory):
+            if fname.startswith(prefix) and fname.endswith(".journal"):
+                try:
+                    found.append((int(fname[len(prefix):-len(".journal")]), os.path.join(self.directory, fname)))
+                except ValueError:
+                    continue
+        return [path for _, path in sorted(found)]
+
+    def read(self, paths: List[str]) -> List[Tuple[int, Dict[str, int]]]:
+        """(seq, deltas) records from the given segments. A torn last line (crash mid-write) is skipped."""
+        records = []
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        records.append((int(rec["seq"]), {k: int(v) for k, v in rec["d"].items()}))
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        print(f"[StockJournal] skipping unreadable record in {path}: {line.strip()[:80]!r}")
+        return records
+
+    def open(self, last_seq: int):
+        """Start a fresh segment; new records are numbered after last_seq."""
+        self._seq = self._synced = last_seq
+        self._open_segment()
+
+    def _open_segment(self):
+        self._path = os.path.join(self.directory, f"{self.name}.{self._seq + 1:012d}.journal")
+        # Binary: BufferedWriter tolerates a write on one thread and a flush on another
+        self._file = open(self._path, "ab", buffering=1 << 16)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def append(self, deltas: Dict[str, int]) -> int:
+        """Write one record (not yet durable; see sync()); returns its seq."""
+        seq = self._seq + 1
+        self._file.write(json.dumps({"seq": seq, "d": deltas}, separators=(",", ":")).encode() + b"\n")
+        # Bumped only after the write, so a concurrent sync never claims a record it did not flush
+        self._seq = seq
+        return seq
+
+    def sync(self, seq: int):
+        """
+        Return once record seq is on disk. The first caller to arrive syncs
+        everything written so far, so callers that queued up behind it
+        return without another fsync.
+        """
+        if self._synced >= seq:
+            return
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            self._sync_file()
+
+    def _sync_file(self):
+        target = self._seq
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.syncs += 1
+        self._synced = max(self._synced, target)
+
+    def rotate(self) -> str:
+        """Sync and close the current segment, start the next one; returns the closed segment's path."""
+        with self._sync_lock:
+            self._sync_file()
+            self._file.close()
+            old = self._path
+            self._open_segment()
+        return old
+
+    def close(self, remove: bool = False):
+        with self._sync_lock:
+            if self._file is None:
+                return
+            self._sync_file()
+            self._file.close()
+            self._file = None
+        if remove:
+            os.unlink(self._path)
+
+
+def recover_journal(journal: StockJournal, apply: bool = True) -> Tuple[int, Dict[str, int]]:
+    """
+    Find journal records past the database checkpoint and, if apply, write
+    them to items and delete the segments. Returns (highest seq seen,
+    deltas not in the database).
+    """
+    paths = journal.segments()
+    checkpoint = load_checkpoint(journal.name)
+    last_seq = checkpoint
+    unapplied: Dict[str, int] = {}
+    for seq, deltas in journal.read(paths):
+        last_seq = max(last_seq, seq)
+        if seq > checkpoint:
+            _merge(unapplied, deltas)
+    if apply:
+        if last_seq > checkpoint:
+            apply_deltas(journal.name, unapplied, last_seq)
+        for path in paths:
+            os.unlink(path)
+    return last_seq, unapplied
+
+
+class StockCache:
+    """
+    In-memory stock with the ReservationEngine interface (see module docstring).
+    Call start() before use and close() at shutdown.
+    """
+    def __init__(self, journal: StockJournal = None, flush_interval_s: float = INVENTORY_CACHE_FLUSH_S,
+                 reconcile_interval_s: float = INVENTORY_CACHE_RECONCILE_S, loader=load_stock):
+        self.journal = journal or StockJournal()
+        self.flush_interval_s = flush_interval_s
+        self.reconcile_interval_s = reconcile_interval_s
+        self.loader = loader
+        self._stock: Dict[str, int] = {}
+        self._item_locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        # Serializes journal appends with the pending deltas and segment rotation
+        self._delta_lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        # Closed segments whose deltas may not be in the database yet
+        self._unapplied_segments: List[str] = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._flushes = 0
+        self._flush_errors = 0
+        self._corrections = 0
+
+    def start(self) -> "StockCache":
+        """Replay the journal into the database, load the stock, start the write-back thread."""
+        last_seq, replayed = recover_journal(self.journal)
+        if replayed:
+            print(f"[StockCache] replayed journal up to seq={last_seq}: {replayed}")
+        self._stock = self.loader()
+        self._item_locks = {name: threading.Lock() for name in self._stock}
+        self.journal.open(last_seq)
+        self._thread = threading.Thread(target=self._run, name="stock-cache-writer", daemon=True)
+        self._thread.start()
+        print(f"[StockCache] {len(self._stock)} items in memory, journal in {self.journal.directory}")
+        return self
+
+    # ---- ReservationEngine interface ----
+
+    def reserve(self, items: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        """Check and deduct all items; returns the shortfalls (empty list = reserved)."""
+        if not items:
+            return []
+        locks = self._lock_items(items)
+        try:
+            short = self._shortfalls(items)
+            if short:
+                return short
+            deltas = {}
+            for name, qty in items.items():
+                self._stock[name] -= int(qty)
+                deltas[name] = -int(qty)
+            seq = self._log(deltas)
+        finally:
+            _release(locks)
+        self.journal.sync(seq)
+        return []
+
+    def reserve_batch(self, orders: List[Dict[str, int]]) -> List[List[Tuple[str, int, int]]]:
+        """Reserve several orders in list order, each all-or-nothing, under one set of locks."""
+        names = {name for items in orders for name in items}
+        if not names:
+            return [[] for _ in orders]
+        locks = self._lock_items(names)
+        try:
+            stock = self._stock
+            results = []
+            deltas: Dict[str, int] = {}
+            for items in orders:
+                short = self._shortfalls(items)
+                if not short:
+                    for name, qty in items.items():
+                        stock[name] -= int(qty)
+                        deltas[name] = deltas.get(name, 0) - int(qty)
+                results.append(short)
+            seq = self._log(deltas) if deltas else 0
+        finally:
+            _release(locks)
+        if seq:
+            self.journal.sync(seq)
+        return results
+
+    def release(self, items: Dict[str, int]):
+        """Give back a previous reservation (e.g. robots timed out)."""
+        self._add(items)
+
+    def restock(self, items: Dict[str, int]):
+        """Add supplier stock after a RESTOCK_ORDER completes."""
+        self._add(items)
+
+    def _add(self, items: Dict[str, int]):
+        if not items:
+            return
+        # Unknown names are not added, same as the UPDATE in ReservationEngine
+        items = {name: int(qty) for name, qty in items.items() if name in self._stock}
+        if not items:
+            return
+        locks = self._lock_items(items)
+        try:
+            for name, qty in items.items():
+                self._stock[name] += qty
+            seq = self._log(items)
+        finally:
+            _release(locks)
+        self.journal.sync(seq)
+
+    # ---- internals ----
+
+    def _shortfalls(self, items: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        stock = self._stock
+        return [(name, int(qty), stock.get(name, 0)) for name, qty in items.items()
+                if name not in stock or stock[name] < int(qty)]
+
+    def _lock_items(self, names) -> List[threading.Lock]:
+        locks = []
+        item_locks = self._item_locks
+        for name in sorted(names):
+            lock = item_locks.get(name)
+            if lock is None:
+                with self._locks_lock:
+                    lock = item_locks.setdefault(name, threading.Lock())
+            lock.acquire()
+            locks.append(lock)
+        return locks
+
+    def _log(self, deltas: Dict[str, int]) -> int:
+        with self._delta_lock:
+            seq = self.journal.append(deltas)
+            _merge(self._pending, deltas)
+        return seq
+
+    def quantity(self, name: str) -> int:
+        return self._stock.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self._stock)
+
+    def stats(self) -> dict:
+        return {"items": len(self._stock), "journal_seq": self.journal.last_seq, "journal_syncs": self.journal.syncs,
+                "pending_items": len(self._pending), "flushes": self._flushes, "flush_errors": self._flush_errors,
+                "corrections": self._corrections}
+
+    def flush(self) -> bool:
+        """Write pending deltas to the database now; True on success (or nothing to do)."""
+        with self._delta_lock:
+            if not self._pending and not self._unapplied_segments:
+                return True
+            deltas, self._pending = self._pending, {}
+            seq = self.journal.last_seq
+            self._unapplied_segments.append(self.journal.rotate())
+        try:
+            apply_deltas(self.journal.name, deltas, seq)
+        except Exception as e:
+            # Keep the segments and retry with everything on the next flush
+            with self._delta_lock:
+                _merge(self._pending, deltas)
+            self._flush_errors += 1
+            print(f"[StockCache] write-back of {len(deltas)} items failed (will retry): {e}")
+            return False
+        self._flushes += 1
+        segments, self._unapplied_segments = self._unapplied_segments, []
+        for path in segments:
+            os.unlink(path)
+        return True
+
+    def reconcile(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Compare the cache with the database (plus deltas not written yet)
+        and adopt the database's value where they differ, e.g. after a
+        manual UPDATE of items. Returns name -> (cached, adopted).
+        Holds every item lock for one SELECT.
+        """
+        with self._locks_lock:
+            names = list(self._item_locks)
+        locks = self._lock_items(names)
+        try:
+            with self._delta_lock:
+                db = self.loader()
+                pending = dict(self._pending)
+            drift = {}
+            for name, qty in db.items():
+                expected = qty + pending.get(name, 0)
+                cached = self._stock.get(name)
+                if cached != expected:
+                    drift[name] = (cached, expected)
+                    self._stock[name] = expected
+                    if name not in self._item_locks:
+                        with self._locks_lock:
+                            self._item_locks.setdefault(name, threading.Lock())
+        finally:
+            _release(locks)
+        if drift:
+            self._corrections += len(drift)
+            print(f"[StockCache] adopted database stock (cached -> db): "
+                  + ", ".join(f"{name} {a} -> {b}" for name, (a, b) in sorted(drift.items(), key=lambda kv: kv[0])))
+        return drift
+
+    def _run(self):
+        next_reconcile = time.monotonic() + self.reconcile_interval_s
+        while not self._stop.wait(self.flush_interval_s):
+            if not self.flush():
+                continue
+            if self.reconcile_interval_s > 0 and time.monotonic() >= next_reconcile:
+                next_reconcile = time.monotonic() + self.reconcile_interval_s
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    print(f"[StockCache] reconcile failed: {e}")
+
+    def close(self):
+        """Stop the write-back thread and write out what is pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        ok = self.flush()
+        self.journal.close(remove=ok)
+        if not ok:
+            print(f"[StockCache] closing with deltas not in the database; they are replayed from "
+                  f"{self.journal.directory} on the next start")
+
+
+def _release(locks: List[threading.Lock]):
+    for lock in reversed(locks):
+        lock.release()
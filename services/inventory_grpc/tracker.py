@@ -0,0 +1,325 @@
+"""
+RobotTracker: which categories still owe a result for each in-flight order.
+
+- Entries are spread over shards by hash(request_id), each with its own lock,
+  so threads marking different orders rarely meet on the same lock.
+- Accounting is per category (a robot's name is its category): a result
+  from any replica of a category answers for it, and a second result for
+  the same category is ignored. Each category gets a bit the first time it
+  is seen; an entry stores the expected and answered categories as two int
+  bitmasks instead of a set of names.
+- Completion is delivered to callbacks, so one entry serves an asyncio
+  waiter (wait_all), a blocking thread (wait_all_blocking) or any other
+  callback without allocating an Event or future per order up front.
+- Deadlines live in a hashed timer wheel per shard, advanced by one daemon
+  thread every tick_s. An order not complete by its deadline is resolved as
+  timed out; an entry nobody cleaned up (e.g. its SubmitOrder was cancelled)
+  is dropped grace_s later. No per-order timer or asyncio.wait_for task.
+- fail_category() resolves every order still waiting on a category as
+  failed at once, for when its last robot is known to be gone.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+TRACKER_SHARDS = int(os.environ.get("TRACKER_SHARDS", "16"))
+TRACKER_TICK_S = float(os.environ.get("TRACKER_TICK_S", "0.05"))
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) add; each tick only looks at one bucket."""
+
+    def __init__(self, tick_s: float, slots: int = 1024):
+        self.tick_s = tick_s
+        self._slots: List[List[Tuple[int, str]]] = [[] for _ in range(slots)]
+        self._current = int(time.monotonic() / tick_s)
+
+    def add(self, key: str, when: float) -> int:
+        """Schedule key at monotonic time when; returns the tick it will fire on."""
+        tick = max(int(when / self.tick_s) + 1, self._current + 1)
+        self._slots[tick % len(self._slots)].append((tick, key))
+        return tick
+
+    def advance(self, now: float) -> List[Tuple[str, int]]:
+        """Move the wheel to now; returns (key, tick) for everything that came due."""
+        target = int(now / self.tick_s)
+        n = len(self._slots)
+        due = []
+        # After a long stall every bucket is due at most once
+        for tick in range(max(self._current + 1, target - n + 1), target + 1):
+            bucket = self._slots[tick % n]
+            if not bucket:
+                continue
+            keep = []
+            for entry in bucket:
+                if entry[0] <= target:
+                    due.append((entry[1], entry[0]))
+                else:
+                    keep.append(entry)
+            self._slots[tick % n] = keep
+        self._current = max(self._current, target)
+        return due
+
+
+class _Pending:
+    __slots__ = ("expected", "seen", "done", "ok", "callbacks", "latch", "context", "deadline")
+
+    def __init__(self, expected: int, context):
+        self.expected = expected
+        self.seen = 0
+        self.done = False
+        self.ok = False
+        self.callbacks = None
+        self.latch = None
+        self.context = context
+        self.deadline = 0
+
+
+class _Shard:
+    __slots__ = ("lock", "pending", "wheel")
+
+    def __init__(self, tick_s: float):
+        self.lock = threading.Lock()
+        self.pending: Dict[str, _Pending] = {}
+        self.wheel = TimerWheel(tick_s)
+
+
+def _run_callbacks(callbacks, ok: bool):
+    for fn in callbacks or ():
+        try:
+            fn(ok)
+        except Exception as e:
+            print(f"[RobotTracker] completion callback failed: {e}")
+
+
+class RobotTracker:
+    """
+    Tracks which categories have responded for each request_id. Thread-safe;
+    category names are only ever compared through their bit.
+    """
+    def __init__(self, shards: int = TRACKER_SHARDS, tick_s: float = TRACKER_TICK_S, grace_s: float = 30.0):
+        n = 1
+        while n < max(1, shards):
+            n <<= 1
+        self._mask = n - 1
+        self._shards = [_Shard(tick_s) for _ in range(n)]
+        self.tick_s = tick_s
+        self.grace_s = grace_s
+        self._category_bits: Dict[str, int] = {}
+        self._bits_lock = threading.Lock()
+        self._ticker = None
+        self._ticker_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def _shard(self, request_id: str) -> _Shard:
+        return self._shards[hash(request_id) & self._mask]
+
+    def _bit(self, category: str) -> int:
+        bit = self._category_bits.get(category)
+        if bit is None:
+            with self._bits_lock:
+                bit = self._category_bits.get(category)
+                if bit is None:
+                    bit = 1 << len(self._category_bits)
+                    self._category_bits[category] = bit
+        return bit
+
+    def _names(self, mask: int) -> Set[str]:
+        return {name for name, bit in list(self._category_bits.items()) if mask & bit}
+
+    def init_request(self, request_id: str, expected: Iterable[str], timeout_s: float, context=None):
+        """
+        Start tracking request_id until every category in expected has answered
+        or timeout_s passes. context is kept with the entry (see context()).
+        """
+        bits = self._category_bits
+        mask = 0
+        for name in expected:
+            mask |= bits.get(name) or self._bit(name)
+        entry = _Pending(mask, context)
+        if not mask:
+            entry.ok = True
+            entry.done = True
+        shard = self._shard(request_id)
+        with shard.lock:
+            shard.pending[request_id] = entry
+            entry.deadline = shard.wheel.add(request_id, time.monotonic() + timeout_s)
+        self._ensure_ticker()
+
+    def mark_category(self, request_id: str, category: str) -> bool:
+        """Record a category's answer (from any of its robots); True if it was the last one expected."""
+        bit = self._category_bits.get(category)
+        if bit is None:
+            return False
+        shard = self._shard(request_id)
+        with shard.lock:
+            entry = shard.pending.get(request_id)
+            if entry is None or entry.done or not entry.expected & bit:
+                return False
+            entry.seen |= bit
+            if entry.seen != entry.expected:
+                return False
+            # ok before done: wait_all_blocking reads them without the lock
+            entry.ok = True
+            entry.done = True
+            callbacks, entry.callbacks = entry.callbacks, None
+            latch = entry.latch
+        if latch is not None:
+            latch.release()
+        _run_callbacks(callbacks, True)
+        return True
+
+    def add_done_callback(self, request_id: str, fn: Callable[[bool], None]) -> bool:
+        """
+        Call fn(ok) once the request completes (ok=True) or times out (ok=False);
+        right away if it already has. False if request_id is not tracked.
+        fn runs on whichever thread resolves the request.
+        """
+        shard = self._shard(request_id)
+        with shard.lock:
+            entry = shard.pending.get(request_id)
+            if entry is None:
+                return False
+            if not entry.done:
+                if entry.callbacks is None:
+                    entry.callbacks = [fn]
+                else:
+                    entry.callbacks.append(fn)
+                return True
+            ok = entry.ok
+        fn(ok)
+        return True
+
+    async def wait_all(self, request_id: str) -> bool:
+        """Wait on the running loop until all expected categories answered (True) or the deadline passed (False)."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        loop_thread = threading.get_ident()
+
+        def resolve(ok: bool):
+            if threading.get_ident() == loop_thread:
+                _set_result(fut, ok)
+            else:
+                loop.call_soon_threadsafe(_set_result, fut, ok)
+
+        if not self.add_done_callback(request_id, resolve):
+            return False
+        return await fut
+
+    def wait_all_blocking(self, request_id: str, timeout_s: float = None) -> bool:
+        """
+        Block the calling thread until the request completes or times out.
+        The first blocking waiter parks on a held Lock (cheaper than an Event);
+        any further ones go through add_done_callback.
+        """
+        shard = self._shard(request_id)
+        with shard.lock:
+            entry = shard.pending.get(request_id)
+            if entry is None:
+                return False
+            if entry.done:
+                return entry.ok
+            latch = None
+            if entry.latch is None:
+                latch = entry.latch = threading.Lock()
+                latch.acquire()
+        if latch is not None:
+            latch.acquire(timeout=-1 if timeout_s is None else timeout_s)
+            return entry.done and entry.ok
+
+        event = threading.Event()
+        self.add_done_callback(request_id, lambda ok: event.set())
+        event.wait(timeout_s)
+        return entry.done and entry.ok
+
+    def missing(self, request_id: str) -> Set[str]:
+        """Expected categories that have not answered yet."""
+        shard = self._shard(request_id)
+        with shard.lock:
+            entry = shard.pending.get(request_id)
+            if entry is None:
+                return set()
+            mask = entry.expected & ~entry.seen
+        return self._names(mask)
+
+    def context(self, request_id: str):
+        """The context passed to init_request, or None once the entry is gone."""
+        entry = self._shard(request_id).pending.get(request_id)
+        return entry.context if entry is not None else None
+
+    def in_flight(self) -> int:
+        return sum(len(shard.pending) for shard in self._shards)
+
+    def cleanup(self, request_id: str):
+        shard = self._shard(request_id)
+        with shard.lock:
+            shard.pending.pop(request_id, None)
+
+    def _fail_locked(self, shard: _Shard, request_id: str, entry: _Pending, now: float):
+        """Resolve entry as failed (shard lock held); returns its callbacks to run after releasing the lock."""
+        entry.done = True
+        callbacks, entry.callbacks = entry.callbacks, None
+        if entry.latch is not None:
+            entry.latch.release()
+        # Keep it around for missing()/cleanup() a little longer
+        entry.deadline = shard.wheel.add(request_id, now + self.grace_s)
+        return callbacks
+
+    def expire(self, now: float = None) -> int:
+        """Advance every shard's wheel to now; returns how many requests timed out."""
+        now = time.monotonic() if now is None else now
+        timed_out = []
+        for shard in self._shards:
+            with shard.lock:
+                for request_id, tick in shard.wheel.advance(now):
+                    entry = shard.pending.get(request_id)
+                    if entry is None or entry.deadline != tick:
+                        continue
+                    if entry.done:
+                        # Resolved and still here at its deadline (or grace ran out): abandoned
+                        del shard.pending[request_id]
+                        continue
+                    timed_out.append(self._fail_locked(shard, request_id, entry, now))
+        for callbacks in timed_out:
+            _run_callbacks(callbacks, False)
+        return len(timed_out)
+
+    def fail_category(self, category: str) -> int:
+        """Fail every pending request still waiting for category now, as if it timed out; returns how many."""
+        bit = self._category_bits.get(category)
+        if bit is None:
+            return 0
+        now = time.monotonic()
+        failed = []
+        for shard in self._shards:
+            with shard.lock:
+                for request_id, entry in shard.pending.items():
+                    if not entry.done and entry.expected & bit and not entry.seen & bit:
+                        failed.append(self._fail_locked(shard, request_id, entry, now))
+        for callbacks in failed:
+            _run_callbacks(callbacks, False)
+        return len(failed)
+
+    def _ensure_ticker(self):
+        if self._ticker is not None:
+            return
+        with self._ticker_lock:
+            if self._ticker is None and not self._closed.is_set():
+                self._ticker = threading.Thread(target=self._tick_loop, name="robot-tracker-wheel", daemon=True)
+                self._ticker.start()
+
+    def _tick_loop(self):
+        while not self._closed.wait(self.tick_s):
+            self.expire()
+
+    def close(self):
+        self._closed.set()
+        if self._ticker is not None:
+            self._ticker.join(timeout=1.0)
+
+
+def _set_result(fut: asyncio.Future, ok: bool):
+    if not fut.done():
+        fut.set_result(ok)
@@ -0,0 +1,112 @@
+"""
+Fast encoder for FlatBuffers WorkOrder messages (schemas/flatbuffers/work.fbs).
+
+The generic flatbuffers.Builder spends most of its time in per-field Python
+calls (Prep, vtable search, offset bookkeeping), and reusing one builder does
+not remove any of that. A WorkOrder always has the same shape, so the encoder
+writes that layout directly:
+
+    root offset | WorkOrder vtable | WorkOrder table | ItemQty vtable (shared)
+    | items vector | ItemQty tables | request_id, id, trace_id | item names
+
+FlatBuffers strings are addressed by relative offsets, so an item name's
+serialized form (length, bytes, NUL, padding) is the same in every message.
+Catalog names are serialized once and reused. The result is a single bytes
+object that is never written to again, which makes it safe to hand to ZMQ
+with copy=False. The output is readable by the generated groceryfb classes
+and by services/robots/workorder_view.py.
+"""
+import struct
+from typing import Dict, Iterable
+
+_u32 = struct.Struct("<I")
+
+# root uoffset | WorkOrder vtable (7 x u16 + 2 pad) | WorkOrder table (soffset, 4 x uoffset, int8 + 3 pad)
+# | ItemQty vtable (4 x u16) | items vector length
+_HEAD = struct.Struct("<I7H2xi4Ib3x4HI")
+_WO_VTABLE = 4
+_WO_TABLE = 20
+_ITEM_VTABLE = 44
+_ITEMS_VECTOR = 52
+_HEAD_SIZE = 56
+assert _HEAD.size == _HEAD_SIZE
+
+# Field positions inside the WorkOrder table (relative to the table start)
+_F_REQUEST_ID = 4
+_F_ID = 8
+_F_ITEMS = 12
+_F_TRACE_ID = 16
+_F_REQUEST_TYPE = 20
+_WO_TABLE_SIZE = 24
+_ITEM_TABLE_SIZE = 12   # soffset, name uoffset, qty
+
+
+def serialize_string(data: bytes) -> bytes:
+    """A FlatBuffers string as it sits in a buffer: u32 length, bytes, NUL, zero padding to 4."""
+    n = len(data)
+    return _u32.pack(n) + data + b"\0" * (4 - n % 4)
+
+
+class WorkOrderEncoder:
+    """
+    Encodes WorkOrders with the layout above. Catalog item names are
+    pre-serialized; other names are serialized when first seen and cached up
+    to max_cached_names. Stateless apart from that cache, so one encoder can be
+    shared by every thread.
+    """
+    def __init__(self, catalog: Iterable[str] = (), max_cached_names: int = 4096):
+        self.max_cached_names = max_cached_names
+        self._names: Dict[str, bytes] = {name: serialize_string(name.encode()) for name in catalog}
+
+    def _name(self, name: str) -> bytes:
+        blob = self._names.get(name)
+        if blob is None:
+            blob = serialize_string(name.encode())
+            if len(self._names) < self.max_cached_names:
+                self._names[name] = blob
+        return blob
+
+    def encode(self, request_id: str, request_type: int, served_id: str, items: Dict[str, int],
+               trace_id: str = None) -> bytes:
+        n = len(items)
+        rid = serialize_string(request_id.encode())
+        sid = serialize_string(served_id.encode())
+        tid = serialize_string(trace_id.encode()) if trace_id else b""
+
+        tables_at = _HEAD_SIZE + 4 * n
+        rid_at = tables_at + _ITEM_TABLE_SIZE * n
+        sid_at = rid_at + len(rid)
+        tid_at = sid_at + len(sid)
+        name_at = tid_at + len(tid)
+
+        head = _HEAD.pack(
+            _WO_TABLE,
+            # WorkOrder vtable: size, table size, then slots request_id, request_type, id, items, trace_id
+            14, _WO_TABLE_SIZE, _F_REQUEST_ID, _F_REQUEST_TYPE, _F_ID, _F_ITEMS, _F_TRACE_ID if tid else 0,
+            # WorkOrder table
+            _WO_TABLE - _WO_VTABLE,
+            rid_at - (_WO_TABLE + _F_REQUEST_ID),
+            sid_at - (_WO_TABLE + _F_ID),
+            _ITEMS_VECTOR - (_WO_TABLE + _F_ITEMS),
+            tid_at - (_WO_TABLE + _F_TRACE_ID) if tid else 0,
+            request_type,
+            # ItemQty vtable: size, table size, name at 4, qty at 8
+            8, _ITEM_TABLE_SIZE, 4, 8,
+            n,
+        )
+
+        # Vector element i sits at 56 + 4i and points at table i (tables_at + 12i)
+        vector = struct.pack(f"<{n}I", *range(4 * n, 12 * n, 8)) if n else b""
+
+        fields = []
+        names = []
+        table = tables_at
+        for name, qty in items.items():
+            blob = self._name(name)
+            fields += (table - _ITEM_VTABLE, name_at - (table + 4), int(qty))
+            names.append(blob)
+            name_at += len(blob)
+            table += _ITEM_TABLE_SIZE
+        tables = struct.pack("<" + "iIi" * n, *fields)
+
+        return b"".join((head, vector, tables, rid, sid, tid, *names))
@@ -1,6 +1,8 @@
+import json
 import os
-from flask import Flask, request, jsonify
+import time
 import grpc
+from flask import Flask, Response, g, request, jsonify
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -10,11 +12,67 @@ load_dotenv()
 from generated.proto import grocery_pb2
 from generated.proto import grocery_pb2_grpc
 
+# Shared long-lived gRPC channels
+from utils.grpc_channels import get_channel_manager, get_stub, split_targets
+
+# Which shard of a sharded Inventory owns an order
+from utils.sharding import shard_of
+
+# How long /submit, /submit_batch and SSE streams wait on Inventory
+from services.ordering_flask.deadlines import STREAM_TIMEOUT_S, SUBMIT_TIMEOUT_S
+
+# Per-stage latency spans; Ordering starts the trace for each order
+from utils.tracing import get_tracer, new_trace_id, trace_metadata, TRACE_HTTP_HEADER
+
+# Request counters and latency histograms, served on /metrics
+from utils.metrics import CONTENT_TYPE, REGISTRY, Counter, Histogram, start_metrics_server
+
 
 app = Flask(__name__)
 
-# Inventory gRPC address (use env var or default)
+# Inventory gRPC address (use env var or default; comma-separate several to round-robin).
+# For a sharded Inventory list the shards in order: shard i is the i-th address.
 INVENTORY_ADDR = os.environ.get("INVENTORY_ADDR", "localhost:50051")
+INVENTORY_TARGETS = split_targets(INVENTORY_ADDR)
+
+# How long /health waits for a connection to Inventory before reporting not ready
+HEALTH_TIMEOUT_S = float(os.environ.get("ORDERING_HEALTH_TIMEOUT_S", "1.0"))
+
+# Most orders accepted by one /submit_batch call (Inventory enforces its own SUBMIT_BATCH_MAX too)
+SUBMIT_BATCH_MAX = int(os.environ.get("SUBMIT_BATCH_MAX", "500"))
+
+# Separate /metrics port per process (0 = only the /metrics route); gunicorn workers take the next free ones
+ORDERING_METRICS_PORT = int(os.environ.get("ORDERING_METRICS_PORT", "0"))
+ORDERING_METRICS_PORT_SCAN = int(os.environ.get("ORDERING_METRICS_PORT_SCAN", "16"))
+
+# Ordering needs no database otherwise (its host may not reach one), so its spans go to TRACE_FILE
+# unless ORDERING_TRACE_EXPORTER says otherwise
+tracer = get_tracer("ordering", exporter=os.environ.get("ORDERING_TRACE_EXPORTER", "file"))
+
+REQUESTS = Counter("ordering_requests_total", "HTTP requests, by endpoint and status", ["endpoint", "status"])
+REQUEST_SECONDS = Histogram("ordering_request_seconds", "HTTP request latency", ["endpoint"])
+
+start_metrics_server(ORDERING_METRICS_PORT, scan=ORDERING_METRICS_PORT_SCAN, name="Ordering")
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    # Endpoint name rather than path, so /orders/<request_id> is one series
+    endpoint = request.endpoint or "unknown"
+    if endpoint != "metrics":
+        REQUESTS.labels(endpoint, response.status_code).inc()
+        started, latency = g.request_started, REQUEST_SECONDS.labels(endpoint)
+        if response.is_streamed:
+            # SSE and NDJSON bodies are generated after this hook; time them until the stream ends
+            response.call_on_close(lambda: latency.observe(time.perf_counter() - started))
+        else:
+            latency.observe(time.perf_counter() - started)
+    return response
 
 
 def parse_request_type(rt: str):
@@ -28,48 +86,257 @@ def parse_request_type(rt: str):
     return None
 
 
-@app.route("/submit", methods=["POST"])
-def submit():
-    data = request.get_json(force=True)  # Streamlit sends JSON
+def status_json(status):
+    """OrderStatus -> JSON body for /submit?async=1 and /orders/<id>."""
+    body = {"request_id": status.request_id, "state": grocery_pb2.OrderState.Name(status.state)[len("ORDER_"):]}
+    if status.state == grocery_pb2.ORDER_DONE:
+        body["code"] = "OK" if status.reply.code == grocery_pb2.OK else "BAD_REQUEST"
+        body["message"] = status.reply.message
+    return body
+
+
+def inventory_error(e: Exception):
+    """
+    Map a failed Inventory call to (HTTP status, JSON body, extra headers).
+    Inventory turning orders away under load (RESOURCE_EXHAUSTED) or being
+    down (UNAVAILABLE) is 503 with Retry-After; a missed deadline is 504.
+    """
+    code = e.code() if isinstance(e, grpc.RpcError) else None
+    if code in (grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.UNAVAILABLE):
+        retry_after = dict(e.trailing_metadata() or ()).get("retry-after", "1")
+        return 503, {"code": "UNAVAILABLE", "message": e.details()}, {"Retry-After": retry_after}
+    if code == grpc.StatusCode.DEADLINE_EXCEEDED:
+        return 504, {"code": "TIMEOUT", "message": e.details()}, {}
+    return 500, {"code": "BAD_REQUEST", "message": f"gRPC call failed: {e}"}, {}
+
+
+def inventory_for(request_id: str) -> str:
+    """The Inventory that owns an order: for a sharded Inventory the shard named by the request_id's prefix."""
+    shard = shard_of(request_id)
+    if shard is not None and shard < len(INVENTORY_TARGETS):
+        return INVENTORY_TARGETS[shard]
+    return INVENTORY_ADDR
+
+
+def call_inventory(method: str, request, **kwargs):
+    """
+    Call a unary Inventory method on the next Inventory of INVENTORY_ADDR.
+    With several (shards), an order one of them turns away at admission
+    (RESOURCE_EXHAUSTED: nothing was done yet) is offered to the next one
+    before the caller gets the 503.
+    """
+    for attempt in range(len(INVENTORY_TARGETS)):
+        stub = get_stub(INVENTORY_ADDR, grocery_pb2_grpc.InventoryServiceStub)
+        try:
+            return getattr(stub, method)(request, **kwargs)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED or attempt == len(INVENTORY_TARGETS) - 1:
+                raise
+
+
+def parse_order(data):
+    """
+    Validate one order payload ({"request_type", "id", "items"}).
+    Returns (OrderRequest, None) or (None, error message).
+    """
+    if not isinstance(data, dict):
+        return None, "Order must be a JSON object"
 
-    # Validation
     req_type_str = str(data.get("request_type", "")).strip()
     id_value = str(data.get("id", "")).strip()
     items = data.get("items", {})
 
     if not req_type_str or parse_request_type(req_type_str) is None:
-        return jsonify({"code": "BAD_REQUEST", "message": "Invalid or missing request_type"}), 400
+        return None, "Invalid or missing request_type"
 
     if not id_value:
-        return jsonify({"code": "BAD_REQUEST", "message": "Missing id"}), 400
+        return None, "Missing id"
 
     if not isinstance(items, dict) or len(items) == 0:
-        return jsonify({"code": "BAD_REQUEST", "message": "Items cannot be empty"}), 400
+        return None, "Items cannot be empty"
+
+    try:
+        items = {k: int(v) for k, v in items.items()}
+    except (TypeError, ValueError):
+        return None, "Item quantities must be integers"
 
     # Build Protobuf request
-    pb_req = grocery_pb2.OrderRequest(
-        request_type=parse_request_type(req_type_str),
-        id=id_value,
-        items={k: int(v) for k, v in items.items()}
-    )
+    return grocery_pb2.OrderRequest(request_type=parse_request_type(req_type_str), id=id_value, items=items), None
+
+
+@app.route("/submit", methods=["POST"])
+def submit():
+    data = request.get_json(force=True)  # Streamlit sends JSON
+
+    # Validation
+    pb_req, error = parse_order(data)
+    if error:
+        return jsonify({"code": "BAD_REQUEST", "message": error}), 400
+    req_type_str = grocery_pb2.RequestType.Name(pb_req.request_type)
+
+    # Join the caller's trace if it sent one, otherwise start a new trace
+    trace_id = request.headers.get(TRACE_HTTP_HEADER) or new_trace_id()
+    headers = {TRACE_HTTP_HEADER: trace_id}
 
-    # Call Inventory via gRPC
+    if request.args.get("async") == "1":
+        return submit_async(pb_req, req_type_str, trace_id, headers)
+
+    # Call Inventory via gRPC (the trace id travels in the call metadata)
     try:
-        with grpc.insecure_channel(INVENTORY_ADDR) as channel:
-            stub = grocery_pb2_grpc.InventoryServiceStub(channel)
-            pb_resp = stub.SubmitOrder(pb_req, timeout=20)
+        with tracer.span(trace_id, "ordering.submit", request_type=req_type_str) as attrs:
+            pb_resp = call_inventory("SubmitOrder", pb_req, timeout=SUBMIT_TIMEOUT_S, metadata=trace_metadata(trace_id))
+            attrs["ok"] = pb_resp.code == grocery_pb2.OK
 
         # Convert Protobuf reply to JSON
         code_str = "OK" if pb_resp.code == grocery_pb2.OK else "BAD_REQUEST"
         return jsonify({
             "code": code_str,
             "message": pb_resp.message
-        }), 200
+        }), 200, headers
 
+    except Exception as e:
+        status, body, extra = inventory_error(e)
+        return jsonify(body), status, {**headers, **extra}
+
+
+def submit_async(pb_req, req_type_str, trace_id, headers):
+    """
+    /submit?async=1: hand the order to Inventory and return 202 with its
+    request_id as soon as it is accepted; no worker waits for the robots.
+    An order rejected up front (unknown items, no stock) gets its final reply
+    straight away, as with /submit.
+    """
+    try:
+        with tracer.span(trace_id, "ordering.submit_async", request_type=req_type_str) as attrs:
+            status = call_inventory("StartOrder", pb_req, timeout=5, metadata=trace_metadata(trace_id))
+            attrs["ok"] = status.state == grocery_pb2.ORDER_PENDING
+    except Exception as e:
+        http_status, body, extra = inventory_error(e)
+        return jsonify(body), http_status, {**headers, **extra}
+
+    if status.state != grocery_pb2.ORDER_PENDING:
+        body = status_json(status)
+        return jsonify({"code": body["code"], "message": body["message"], "request_id": status.request_id}), 200, headers
+
+    status_url = f"/orders/{status.request_id}"
+    headers["Location"] = status_url
+    return jsonify({
+        "code": "ACCEPTED",
+        "request_id": status.request_id,
+        "status_url": status_url,
+        "events_url": f"{status_url}/events",
+    }), 202, headers
+
+
+@app.route("/orders/<request_id>", methods=["GET"])
+def order_status(request_id):
+    """Poll an async order: state PENDING, or DONE with the final code and message."""
+    try:
+        stub = get_stub(inventory_for(request_id), grocery_pb2_grpc.InventoryServiceStub)
+        status = stub.GetOrderStatus(grocery_pb2.OrderStatusRequest(request_id=request_id), timeout=5)
     except Exception as e:
         return jsonify({"code": "BAD_REQUEST", "message": f"gRPC call failed: {e}"}), 500
 
+    if status.state == grocery_pb2.ORDER_UNKNOWN:
+        return jsonify({"request_id": request_id, "state": "UNKNOWN", "message": "No such order (or expired)"}), 404
+    return jsonify(status_json(status)), 200
+
+
+@app.route("/orders/<request_id>/events", methods=["GET"])
+def order_events(request_id):
+    """
+    Server-sent events for an async order: one `status` event now and one
+    when it finishes, then the stream ends. Holds a worker thread while open.
+    """
+    def events():
+        try:
+            stub = get_stub(inventory_for(request_id), grocery_pb2_grpc.InventoryServiceStub)
+            for status in stub.WatchOrder(grocery_pb2.OrderStatusRequest(request_id=request_id), timeout=STREAM_TIMEOUT_S):
+                yield f"event: status\ndata: {json.dumps(status_json(status))}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': f'gRPC call failed: {e}'})}\n\n"
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/submit_batch", methods=["POST"])
+def submit_batch():
+    """
+    Submit several orders in one call: {"orders": [<order as for /submit>, ...]}.
+
+    Replies stream back as newline-delimited JSON, one line per order as soon as
+    it finishes: {"index": i, "request_id": ..., "code": ..., "message": ...}.
+    Lines are in completion order, not submission order. With ?stream=0 the
+    response is a single JSON object {"results": [...]} sorted by index.
+    """
+    data = request.get_json(force=True)
+    orders = data.get("orders") if isinstance(data, dict) else None
+    if not isinstance(orders, list) or len(orders) == 0:
+        return jsonify({"code": "BAD_REQUEST", "message": "orders must be a non-empty list"}), 400
+    if len(orders) > SUBMIT_BATCH_MAX:
+        return jsonify({"code": "BAD_REQUEST",
+                        "message": f"At most {SUBMIT_BATCH_MAX} orders per batch"}), 400
+
+    # Invalid orders are answered here; the rest go to Inventory in one SubmitOrders call
+    invalid = []
+    valid = []      # (index in the caller's list, OrderRequest)
+    for index, order in enumerate(orders):
+        pb_req, error = parse_order(order)
+        if error:
+            invalid.append({"index": index, "request_id": "", "code": "BAD_REQUEST", "message": error})
+        else:
+            valid.append((index, pb_req))
+
+    trace_id = request.headers.get(TRACE_HTTP_HEADER) or new_trace_id()
+    headers = {TRACE_HTTP_HEADER: trace_id}
+
+    def results():
+        yield from invalid
+        if not valid:
+            return
+        batch = grocery_pb2.OrderBatch(orders=[pb_req for _, pb_req in valid])
+        answered = set()
+        try:
+            with tracer.span(trace_id, "ordering.submit_batch", orders=len(valid)) as attrs:
+                stub = get_stub(INVENTORY_ADDR, grocery_pb2_grpc.InventoryServiceStub)
+                ok = 0
+                for r in stub.SubmitOrders(batch, timeout=STREAM_TIMEOUT_S, metadata=trace_metadata(trace_id)):
+                    answered.add(r.index)
+                    ok += r.reply.code == grocery_pb2.OK
+                    yield {"index": valid[r.index][0], "request_id": r.request_id,
+                           "code": "OK" if r.reply.code == grocery_pb2.OK else "BAD_REQUEST",
+                           "message": r.reply.message}
+                attrs["ok"] = ok
+        except Exception as e:
+            _, body, _ = inventory_error(e)
+            for i, (index, _) in enumerate(valid):
+                if i not in answered:
+                    yield {"index": index, "request_id": "", **body}
+
+    if request.args.get("stream", "1") == "0":
+        return jsonify({"results": sorted(results(), key=lambda r: r["index"])}), 200, headers
+
+    return Response((json.dumps(r) + "\n" for r in results()), 200, headers, mimetype="application/x-ndjson")
+
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "inventory_addr": INVENTORY_ADDR})
+    """
+    Readiness: 200 once this worker's channel to Inventory is connected, 503 otherwise.
+    Channels are per process, so each worker answers for its own.
+    """
+    manager = get_channel_manager()
+    ready = manager.wait_ready(INVENTORY_ADDR, timeout_s=HEALTH_TIMEOUT_S)
+    body = {
+        "status": "ok" if ready else "unavailable",
+        "inventory_addr": INVENTORY_ADDR,
+        "inventory": manager.states(),
+        "pid": os.getpid(),
+    }
+    return jsonify(body), 200 if ready else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """This worker's metrics (under gunicorn each worker has its own; see ORDERING_METRICS_PORT)."""
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -0,0 +1,11 @@
+"""
+Deadlines of Ordering's long calls to Inventory. Kept out of app.py (which
+starts the metrics server and reads .env on import) so gunicorn.conf.py can
+size the worker timeout from them.
+"""
+import os
+
+# A synchronous /submit waits for the robots: Inventory's ROBOT_TIMEOUT_S (default 10) plus reserve and pricing
+SUBMIT_TIMEOUT_S = float(os.environ.get("ORDERING_SUBMIT_TIMEOUT_S", "20"))
+# /submit_batch and the /orders/<request_id>/events stream
+STREAM_TIMEOUT_S = float(os.environ.get("ORDERING_STREAM_TIMEOUT_S", "60"))
@@ -0,0 +1,41 @@
+"""
+gunicorn settings for running Ordering in production:
+
+    gunicorn -c services/ordering_flask/gunicorn.conf.py services.ordering_flask.app:app
+
+Several worker processes, each with a pool of threads (gthread). The app is
+loaded in each worker after fork, so every worker opens its own gRPC channel
+to Inventory (gRPC channels don't survive fork()).
+"""
+import multiprocessing
+import os
+import sys
+
+# gunicorn loads this file by path; make the repo importable for the shared deadlines
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from services.ordering_flask.deadlines import STREAM_TIMEOUT_S, SUBMIT_TIMEOUT_S
+
+
+bind = os.environ.get("ORDERING_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("ORDERING_WORKERS", "0")) or multiprocessing.cpu_count()
+# Threads per worker; requests mostly wait on Inventory, so more threads than cores pays off
+threads = int(os.environ.get("ORDERING_THREADS", "16"))
+worker_class = "gthread"
+preload_app = False
+
+# A request may wait on Inventory for as long as Ordering's longest call deadline; by default
+# workers get that plus a margin (ORDERING_TIMEOUT_S=0), so gunicorn never kills one first
+timeout = (int(os.environ.get("ORDERING_TIMEOUT_S", "0"))
+           or int(max(SUBMIT_TIMEOUT_S, STREAM_TIMEOUT_S)) + 10)
+graceful_timeout = 10
+keepalive = 5
+backlog = 2048
+
+accesslog = os.environ.get("ORDERING_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = "info"
+
+
+def post_fork(server, worker):
+    print(f"[Ordering] Worker pid={worker.pid} serving with {threads} threads")
@@ -0,0 +1,145 @@
+import select
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from utils.db import get_db_config, get_db_connection
+
+
+# Current price of every requested item in one query: for each item keep only
+# the pricing row with the latest effective_date.
+CURRENT_PRICES_SQL = """
+SELECT DISTINCT ON (p.item_id) i.name, p.price
+FROM pricing p
+JOIN items i ON p.item_id = i.id
+WHERE i.name = ANY(%s)
+ORDER BY p.item_id, p.effective_date DESC
+"""
+
+PRICING_CHANNEL = "pricing_changed"
+
+
+def load_current_prices(names: Iterable[str]) -> Dict[str, float]:
+    """Fetch the current price for all names with a single query. Unknown items are omitted."""
+    with get_db_connection(op="price_load") as conn:
+        cur = conn.cursor()
+        cur.execute(CURRENT_PRICES_SQL, (list(names),))
+        return {name: float(price) for name, price in cur.fetchall()}
+
+
+class PriceCache:
+    """
+    In-process cache of current item prices.
+
+    - Entries expire after ttl_s, which bounds staleness even if notifications are missed.
+    - start_listener() subscribes to the pricing_changed channel (see init_schema.sql)
+      and drops an item as soon as a new pricing row is written for it.
+    - Items with no price are cached too (as None), so unknown names don't hit the DB every time.
+    """
+    def __init__(self, ttl_s: float = 60.0, loader=load_current_prices):
+        self.ttl_s = ttl_s
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}   # name -> (price or None, expires_at)
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._invalidations = 0
+        self._generation = 0   # bumped on every invalidation
+        self._listener = None
+        self._stop = threading.Event()
+
+    def get_prices(self, names: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Return name -> unit price (None if the item has no price); misses are loaded in one query."""
+        now = time.monotonic()
+        prices = {}
+        missing = []
+        with self._lock:
+            generation = self._generation
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None and entry[1] > now:
+                    prices[name] = entry[0]
+                else:
+                    missing.append(name)
+            self._hits += len(prices)
+            self._misses += len(missing)
+
+        if missing:
+            loaded = self.loader(missing)
+            expires_at = time.monotonic() + self.ttl_s
+            with self._lock:
+                self._loads += 1
+                # If an invalidation raced with the load, use the result but don't cache it.
+                cacheable = generation == self._generation
+                for name in missing:
+                    price = loaded.get(name)
+                    if cacheable:
+                        self._entries[name] = (price, expires_at)
+                    prices[name] = price
+        return prices
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one item, or everything when name is empty/None."""
+        with self._lock:
+            self._invalidations += 1
+            self._generation += 1
+            if name:
+                self._entries.pop(name, None)
+            else:
+                self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'db_loads': self._loads,
+                'invalidations': self._invalidations,
+            }
+
+    # ---------- LISTEN/NOTIFY invalidation ----------
+
+    def start_listener(self):
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen_loop, name="price-cache-listener", daemon=True)
+            self._listener.start()
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def _listen_loop(self):
+        backoff_s = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**get_db_config())
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {PRICING_CHANNEL}")
+                # Anything cached before LISTEN took effect may already be stale.
+                self.invalidate()
+                backoff_s = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        self.invalidate(note.payload)
+            except Exception as e:
+                print(f"[Pricing] price cache listener error (retrying in {backoff_s:.0f}s): {e}")
+                self.invalidate()
+                self._stop.wait(backoff_s)
+                backoff_s = min(backoff_s * 2, 30.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
@@ -16,16 +16,41 @@ from generated.proto import grocery_pb2
 from generated.proto import grocery_pb2_grpc
 
 # Database helper
-from utils.db import get_db_connection
+from utils.db import get_pool, close_pool
+from services.pricing_grpc.price_cache import PriceCache
+from utils.grpc_channels import server_options
+from utils.log import get_logger
+from utils.metrics import Counter, Histogram, register_collector, start_metrics_server, stats_family
+from utils.tracing import Tracer, get_tracer, flush_spans, trace_id_from_context
+
+
+PRICE_CACHE_TTL_S = float(os.environ.get("PRICE_CACHE_TTL_S", "60"))
+PRICE_CACHE_STATS_INTERVAL_S = float(os.environ.get("PRICE_CACHE_STATS_INTERVAL_S", "60"))
+PRICING_METRICS_PORT = int(os.environ.get("PRICING_METRICS_PORT", "9102"))
+
+PRICE_REQUESTS = Counter("pricing_requests_total", "GetPrice calls, by reply code", ["code"])
+PRICE_SECONDS = Histogram("pricing_request_seconds", "GetPrice latency")
+
+log = get_logger("pricing")
 
 
 class PricingService(grocery_pb2_grpc.PricingServiceServicer):
     """
     Pricing microservice that calculates bills for grocery orders.
-    Queries the pricing database table to get item prices.
+    Prices come from an in-process cache backed by the pricing database table.
     """
 
+    def __init__(self, cache: PriceCache = None, tracer: Tracer = None):
+        self.cache = cache or PriceCache(ttl_s=PRICE_CACHE_TTL_S)
+        self.tracer = tracer or get_tracer("pricing")
+
     def GetPrice(self, request, context):
+        with PRICE_SECONDS.time():
+            reply = self._get_price(request, context)
+        PRICE_REQUESTS.labels(grocery_pb2.ReplyCode.Name(reply.code)).inc()
+        return reply
+
+    def _get_price(self, request, context):
         """
         Calculate total price for requested items.
 
@@ -44,82 +69,96 @@ class PricingService(grocery_pb2_grpc.PricingServiceServicer):
                 total=0.0
             )
 
-        print(f"[Pricing] Calculating price for items: {items_dict}")
-
         try:
-            with get_db_connection() as conn:
-                cur = conn.cursor()
-
-                item_prices = []
-                total = 0.0
-
-                for item_name, quantity in items_dict.items():
-                    # Get the most recent price for this item
-                    cur.execute("""
-                        SELECT p.price
-                        FROM pricing p
-                        JOIN items i ON p.item_id = i.id
-                        WHERE i.name = %s
-                        ORDER BY p.effective_date DESC
-                        LIMIT 1
-                    """, (item_name,))
-
-                    row = cur.fetchone()
-
-                    if not row:
-                        print(f"[Pricing] Warning: No price found for item '{item_name}', using $0.00")
-                        unit_price = 0.0
-                    else:
-                        unit_price = float(row[0])
-
-                    subtotal = unit_price * quantity
-                    total += subtotal
-
-                    # Create ItemPrice message
-                    item_price = grocery_pb2.ItemPrice(
-                        name=item_name,
-                        quantity=quantity,
-                        unit_price=unit_price,
-                        subtotal=subtotal
-                    )
-                    item_prices.append(item_price)
-
-                    print(f"[Pricing]   {item_name}: {quantity} x ${unit_price:.2f} = ${subtotal:.2f}")
-
-                print(f"[Pricing] Total: ${total:.2f}")
-
-                return grocery_pb2.PriceReply(
-                    code=grocery_pb2.OK,
-                    message=f"Price calculated for {len(items_dict)} items",
-                    item_prices=item_prices,
-                    total=total
-                )
-
+            # Cache hits cost no DB round-trip; all misses are loaded with one query
+            with self.tracer.span(trace_id_from_context(context), "pricing.get_price", items=len(items_dict)):
+                prices = self.cache.get_prices(items_dict.keys())
         except Exception as e:
-            print(f"[Pricing] Error: {e}")
+            log.error("pricing failed", extra={"items": items_dict, "error": str(e)})
             return grocery_pb2.PriceReply(
                 code=grocery_pb2.BAD_REQUEST,
                 message=f"Pricing error: {e}",
                 total=0.0
             )
 
+        item_prices = []
+        total = 0.0
+        unpriced = []
+
+        for item_name, quantity in items_dict.items():
+            unit_price = prices.get(item_name)
+            if unit_price is None:
+                unpriced.append(item_name)
+                unit_price = 0.0
+
+            subtotal = unit_price * quantity
+            total += subtotal
+
+            # Create ItemPrice message
+            item_prices.append(grocery_pb2.ItemPrice(
+                name=item_name,
+                quantity=quantity,
+                unit_price=unit_price,
+                subtotal=subtotal
+            ))
+
+        if unpriced:
+            log.warning("no price found, using $0.00", extra={"items": unpriced})
+        log.info("priced", extra={"items": len(items_dict), "total": round(total, 2)})
+
+        return grocery_pb2.PriceReply(
+            code=grocery_pb2.OK,
+            message=f"Price calculated for {len(items_dict)} items",
+            item_prices=item_prices,
+            total=total
+        )
+
+
+def start_pricing(grpc_addr: str = "0.0.0.0:50053", cache: PriceCache = None, tracer: Tracer = None):
+    """Start a Pricing gRPC server on grpc_addr and return it."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=server_options())
+    grocery_pb2_grpc.add_PricingServiceServicer_to_server(PricingService(cache, tracer), server)
+    server.add_insecure_port(grpc_addr)
+    server.start()
+    print(f"[Pricing gRPC] listening on {grpc_addr}")
+    return server
+
 
 def serve():
     """Start the Pricing gRPC server."""
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    grocery_pb2_grpc.add_PricingServiceServicer_to_server(PricingService(), server)
+    # Open DB connections up front so the first requests skip the handshake
+    try:
+        get_pool().prefill()
+    except Exception as e:
+        print(f"[Pricing] DB pool prefill failed (will retry on demand): {e}")
 
-    grpc_addr = "0.0.0.0:50053"
-    server.add_insecure_port(grpc_addr)
-    server.start()
-    print(f"[Pricing gRPC] listening on {grpc_addr}")
+    cache = PriceCache(ttl_s=PRICE_CACHE_TTL_S)
+    cache.start_listener()
+    register_collector(lambda: [
+        stats_family("pricing_price_cache", "Price cache entries and lookups", cache.stats(),
+                     ("entries", "hits", "misses", "db_loads", "invalidations")),
+    ])
+
+    server = start_pricing(cache=cache)
+    start_metrics_server(PRICING_METRICS_PORT, name="Pricing")
 
     try:
+        last_lookups = 0
         while True:
-            time.sleep(3600)
+            time.sleep(PRICE_CACHE_STATS_INTERVAL_S)
+            stats = cache.stats()
+            lookups = stats['hits'] + stats['misses']
+            if lookups != last_lookups:
+                print(f"[Pricing] price cache stats: {stats}")
+                last_lookups = lookups
     except KeyboardInterrupt:
         print("\n[Pricing] shutting down...")
         server.stop(0)
+        cache.stop_listener()
+        flush_spans()
+        print(f"[Pricing] price cache stats: {cache.stats()}")
+        print(f"[Pricing] DB pool stats: {get_pool().stats()}")
+        close_pool()
 
 
 if __name__ == "__main__":
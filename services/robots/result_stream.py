@@ -0,0 +1,219 @@
+"""
+Robot -> Inventory result reporting.
+
+ResultStream keeps one long-lived RobotSession stream per robot instead of one
+unary ReportRobotResult call per work order:
+
+- results are queued and sent in batches of up to max_batch (whatever piled up
+  while the previous message was going out, optionally after a short linger);
+- Inventory grants credits; a robot never has more results on the wire than it
+  holds credits for, and each grant acknowledges that many results in order;
+- unacknowledged results are re-sent after a reconnect (Inventory ignores
+  duplicates), so a dropped stream loses nothing;
+- Inventory heartbeats are answered, and a silent Inventory (three missed
+  heartbeats) makes the robot cancel the stream and reconnect.
+
+If Inventory does not implement RobotSession, the robot falls back to the unary
+call (UnaryReporter) for the rest of its life. UnaryReporter sends its own
+RobotHeartbeat calls so Inventory still knows the robot is there.
+"""
+import collections
+import threading
+import time
+
+import grpc
+
+from generated.proto import grocery_pb2
+from utils.log import get_logger
+from utils.tracing import trace_metadata
+
+
+class UnaryReporter:
+    """
+    One ReportRobotResult call per result, without waiting for the Ack; failures are only logged.
+    With heartbeat_s a thread calls RobotHeartbeat that often (Inventory's liveness registry).
+    """
+
+    def __init__(self, robot_name: str, stub, instance_id: str = "", heartbeat_s: float = 0.0):
+        self.robot_name = robot_name
+        self.stub = stub
+        self.instance_id = instance_id
+        self.heartbeat_s = heartbeat_s
+        self._stopped = threading.Event()
+        if heartbeat_s > 0:
+            threading.Thread(target=self._heartbeats, name=f"robot-{robot_name}-heartbeat", daemon=True).start()
+
+    def _heartbeats(self):
+        beat = grocery_pb2.RobotHeartbeatRequest(robot_name=self.robot_name, instance_id=self.instance_id)
+        while not self._stopped.is_set():
+            try:
+                self.stub.RobotHeartbeat(beat, timeout=self.heartbeat_s)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    # Inventory predates the registry; nothing to keep alive
+                    return
+            self._stopped.wait(self.heartbeat_s)
+
+    def report(self, rr, trace_id: str = None):
+        call = self.stub.ReportRobotResult.future(rr, timeout=5, metadata=trace_metadata(trace_id))
+
+        def on_done(f):
+            if f.exception() is not None:
+                get_logger(f"robot.{self.robot_name}").error("result report failed", extra={
+                    "request_id": rr.request_id, "error": str(f.exception())})
+
+        call.add_done_callback(on_done)
+
+    def close(self, timeout_s: float = 5.0):
+        self._stopped.set()
+
+
+class ResultStream:
+    """Reports results over a RobotSession stream; report() never blocks."""
+
+    def __init__(self, robot_name: str, stub, max_batch: int = 64, linger_s: float = 0.0,
+                 heartbeat_s: float = 5.0, reconnect_s: float = 1.0, instance_id: str = ""):
+        self.robot_name = robot_name
+        self.stub = stub
+        self.instance_id = instance_id
+        self.max_batch = max_batch
+        self.linger_s = linger_s
+        self.heartbeat_s = heartbeat_s
+        self.reconnect_s = reconnect_s
+
+        self._cond = threading.Condition()
+        self._pending = collections.deque()   # results not sent yet
+        self._unacked = collections.deque()   # sent on the current stream, waiting for credits
+        self._credits = 0
+        self._heartbeat_due = False
+        self._last_heard = time.monotonic()
+        self._closed = False
+        self._fallback = None
+        self._call = None
+        self._generation = 0
+        self._sent_messages = 0
+        self._sent_results = 0
+        self._thread = threading.Thread(target=self._run, name=f"robot-{robot_name}-session", daemon=True)
+        self._thread.start()
+
+    def report(self, rr, trace_id: str = None):
+        # Inventory takes the trace id from its own publish record, so it is not sent per result
+        if self._fallback is not None:
+            self._fallback.report(rr, trace_id)
+            return
+        with self._cond:
+            self._pending.append(rr)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._pending), "unacked": len(self._unacked), "credits": self._credits,
+                    "messages": self._sent_messages, "results": self._sent_results,
+                    "fallback": self._fallback is not None}
+
+    def close(self, timeout_s: float = 5.0):
+        """Wait (up to timeout_s) for queued results to be acknowledged, then end the stream."""
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while (self._pending or self._unacked) and self._fallback is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"[{self.robot_name}] Closing session with {len(self._pending) + len(self._unacked)} "
+                          f"results unacknowledged")
+                    break
+                self._cond.wait(remaining)
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
+        if self._fallback is not None:
+            self._fallback.close()
+        call = self._call
+        if call is not None:
+            call.cancel()
+
+    def _run(self):
+        while not self._closed:
+            with self._cond:
+                # Anything sent on the previous stream may not have been processed; send it again
+                self._pending.extendleft(reversed(self._unacked))
+                self._unacked.clear()
+                self._credits = 0
+                self._last_heard = time.monotonic()
+                # A previous stream's request iterator may still be parked in _updates(); retire it
+                self._generation += 1
+                generation = self._generation
+                self._cond.notify_all()
+            try:
+                self._call = self.stub.RobotSession(self._updates(generation))
+                for ctl in self._call:
+                    self._on_control(ctl)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    print(f"[{self.robot_name}] Inventory has no RobotSession, reporting with unary calls")
+                    self._fall_back()
+                    return
+                if not self._closed and e.code() != grpc.StatusCode.CANCELLED:
+                    print(f"[{self.robot_name}] RobotSession failed: {e.code().name} {e.details()}")
+            finally:
+                self._call = None
+            if not self._closed:
+                time.sleep(self.reconnect_s)
+
+    def _fall_back(self):
+        with self._cond:
+            self._fallback = UnaryReporter(self.robot_name, self.stub, self.instance_id, self.heartbeat_s)
+            leftover = list(self._unacked) + list(self._pending)
+            self._unacked.clear()
+            self._pending.clear()
+            self._cond.notify_all()
+        for rr in leftover:
+            self._fallback.report(rr)
+
+    def _on_control(self, ctl):
+        with self._cond:
+            self._last_heard = time.monotonic()
+            if ctl.credits:
+                # Credits come back in the order results were sent, so they ack the oldest ones
+                for _ in range(min(ctl.credits, len(self._unacked))):
+                    self._unacked.popleft()
+                self._credits += ctl.credits
+            if ctl.heartbeat:
+                self._heartbeat_due = True
+            self._cond.notify_all()
+
+    def _updates(self, generation: int):
+        """Request iterator for one stream; runs on a gRPC thread and may block."""
+        yield grocery_pb2.RobotUpdate(robot_name=self.robot_name, instance_id=self.instance_id)
+        while True:
+            with self._cond:
+                while not self._closed and not self._heartbeat_due and not (self._pending and self._credits):
+                    if self._generation != generation:
+                        return
+                    if time.monotonic() - self._last_heard > 3 * self.heartbeat_s:
+                        print(f"[{self.robot_name}] No word from Inventory, reconnecting")
+                        call = self._call
+                        if call is not None:
+                            call.cancel()
+                        return
+                    self._cond.wait(self.heartbeat_s)
+                if self._closed or self._generation != generation:
+                    return
+                if self.linger_s and self._credits and len(self._pending) < self.max_batch:
+                    # Give a burst a moment to fill the batch
+                    self._cond.wait_for(lambda: len(self._pending) >= self.max_batch or self._closed
+                                        or self._generation != generation, self.linger_s)
+                    # The lock was released meanwhile: a reconnect may have retired this stream, and the
+                    # pending results and credits now belong to the new one
+                    if self._closed or self._generation != generation:
+                        return
+                batch = []
+                while self._pending and self._credits and len(batch) < self.max_batch:
+                    rr = self._pending.popleft()
+                    batch.append(rr)
+                    self._unacked.append(rr)
+                    self._credits -= 1
+                heartbeat = self._heartbeat_due
+                self._heartbeat_due = False
+                self._sent_messages += 1
+                self._sent_results += len(batch)
+            yield grocery_pb2.RobotUpdate(results=batch, heartbeat=heartbeat)
@@ -1,28 +1,92 @@
 import argparse
+import asyncio
+import collections
+import functools
 import os
+import sys
 import time
 import random
+import threading
+import uuid
 
-import grpc
 import zmq
+import zmq.asyncio
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from generated.proto import grocery_pb2
 from generated.proto import grocery_pb2_grpc
 
+# Shared long-lived gRPC channels
+from utils.grpc_channels import get_channel_manager, get_stub
+from utils.log import get_logger
+from utils.metrics import Counter, Gauge, Histogram, register_collector, start_metrics_server
+from services.robots.result_stream import ResultStream, UnaryReporter
+# Work dispatch protocol shared with Inventory
+from services.inventory_grpc.dispatch import ACK, BYE, DONE, READY, ROBOT_DISPATCH
+
 # FlatBuffers generated modules
 from groceryfb import WorkOrder
+from services.robots.workorder_view import WorkOrderView
+
+
+# Work orders handled at once; beyond this the robot stops reading and ZMQ buffers the rest
+ROBOT_MAX_IN_FLIGHT = int(os.environ.get("ROBOT_MAX_IN_FLIGHT", "256"))
+# Items of one order worked on at the same time (0 = all of them, 1 = one after another)
+ROBOT_ITEM_PARALLELISM = int(os.environ.get("ROBOT_ITEM_PARALLELISM", "0"))
+# How results reach Inventory: "stream" (one RobotSession per robot) or "unary" (one call per result)
+ROBOT_RESULT_TRANSPORT = os.environ.get("ROBOT_RESULT_TRANSPORT", "stream")
+ROBOT_RESULT_BATCH = int(os.environ.get("ROBOT_RESULT_BATCH", "64"))
+ROBOT_RESULT_LINGER_MS = float(os.environ.get("ROBOT_RESULT_LINGER_MS", "0"))
+ROBOT_HEARTBEAT_S = float(os.environ.get("ROBOT_HEARTBEAT_S", "5"))
+# ROBOT_DISPATCH (same setting as Inventory's) says how work arrives: "router" (a DEALER to
+# Inventory's ROUTER at ZMQ_DEALER_ADDR; replicas of a category share its work) or "pubsub"
+# (SUB to the category's topics at ZMQ_SUB_ADDR)
+ZMQ_DEALER_ADDR = os.environ.get("ZMQ_DEALER_ADDR", "tcp://127.0.0.1:5557")
+# router: how often the robot re-announces itself (READY) to Inventory's dispatcher
+ROBOT_READY_S = float(os.environ.get("ROBOT_READY_S", "1"))
+# Recent request_ids remembered to drop WorkOrders Inventory sent again (redeliveries)
+ROBOT_DEDUP_SIZE = int(os.environ.get("ROBOT_DEDUP_SIZE", "10000"))
+# WorkOrders ZMQ queues for this robot beyond max_in_flight before Inventory's sends back up
+ZMQ_RCVHWM = int(os.environ.get("ZMQ_RCVHWM", "100000"))
+# /metrics port; robots sharing a host take the next free one of the following ROBOT_METRICS_PORT_SCAN
+ROBOT_METRICS_PORT = int(os.environ.get("ROBOT_METRICS_PORT", "9110"))
+ROBOT_METRICS_PORT_SCAN = int(os.environ.get("ROBOT_METRICS_PORT_SCAN", "20"))
+
+WORKORDERS = Counter("robot_workorders_total", "WorkOrders handled, by topic kind and result status",
+                     ["robot", "kind", "status"])
+WORK_SECONDS = Histogram("robot_work_seconds", "Time from receiving a WorkOrder to reporting its result", ["robot"])
+WORK_DUPLICATES = Counter("robot_workorders_duplicate_total",
+                          "WorkOrders received again (redelivered) and not worked on twice", ["robot"])
+WORK_MISSED = Counter("robot_workorders_missed_total",
+                      "WorkOrders that never arrived, counted from gaps in their sequence numbers", ["robot"])
+RCVHWM = Gauge("robot_zmq_rcvhwm", "Receive high-water mark of the robot's work socket", ["robot"])
+
+# Result streams of the robots running in this process, by instance id, read at scrape time
+_reporters = {}
+
 
+def _reporter_metrics():
+    samples = [(reporter.robot_name, instance, reporter.stats()) for instance, reporter in list(_reporters.items())
+               if hasattr(reporter, "stats")]
+    return [
+        ("robot_results_pending", "gauge", "Results queued or sent but not yet acknowledged by Inventory",
+         [({"robot": robot, "instance": instance, "state": state}, stats[state]) for robot, instance, stats in samples
+          for state in ("pending", "unacked")]),
+        ("robot_results_sent_total", "counter", "Results sent to Inventory over the RobotSession stream",
+         [({"robot": robot, "instance": instance}, stats["results"]) for robot, instance, stats in samples]),
+    ]
 
-CATEGORY_ITEMS = {
-    "bread": {"bread"},
-    "dairy": {"milk", "eggs"},
-    "meat": {"chicken", "beef"},
-    "produce": {"apples", "bananas"},
-    "party": {"soda", "napkins"},
-}
+
+register_collector(_reporter_metrics)
+
+# One line per item is the chattiest log there is: DEBUG, and worth sampling (LOG_SAMPLE=robot.items=0.01)
+item_log = get_logger("robot.items")
 
 
 def parse_workorder(buf: bytes):
+    """Decode the whole WorkOrder (every item name). The receive loop uses WorkOrderView instead."""
     wo = WorkOrder.WorkOrder.GetRootAsWorkOrder(buf, 0)
     request_id = wo.RequestId().decode()
     served_id = wo.Id().decode()
@@ -33,73 +97,319 @@ def parse_workorder(buf: bytes):
         name = it.Name().decode()
         qty = int(it.Qty())
         items[name] = qty
-    return request_id, served_id, items
+    trace_id = wo.TraceId()
+    return request_id, served_id, items, trace_id.decode() if trace_id else None
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--name", required=True, help="robot name: bread/dairy/meat/produce/party")
-    ap.add_argument("--sub_addr", default=os.environ.get("ZMQ_SUB_ADDR", "tcp://127.0.0.1:5556"))
-    ap.add_argument("--inventory_addr", default=os.environ.get("INVENTORY_ADDR", "127.0.0.1:50051"))
-    args = ap.parse_args()
+async def work_on_item(robot_name: str, item_name: str, work_scale: float, lanes: asyncio.Semaphore):
+    async with lanes:
+        t = random.uniform(0.2, 0.6) * work_scale
+        item_log.debug("working on item", extra={"robot": robot_name, "item": item_name, "sleep_s": round(t, 3)})
+        await asyncio.sleep(t)
+
 
-    robot_name = args.name
-    if robot_name not in CATEGORY_ITEMS:
-        raise SystemExit(f"Unknown robot name {robot_name}. Choose one of {list(CATEGORY_ITEMS.keys())}")
-
-    my_items = CATEGORY_ITEMS[robot_name]
-
-    # ZMQ SUB
-    ctx = zmq.Context.instance()
-    sub = ctx.socket(zmq.SUB)
-    sub.connect(args.sub_addr)
-    sub.setsockopt(zmq.SUBSCRIBE, b"FETCH")
-    sub.setsockopt(zmq.SUBSCRIBE, b"RESTOCK")
-    print(f"[{robot_name}] Connected SUB to {args.sub_addr} (topics: FETCH, RESTOCK)")
-
-    # gRPC stub
-    channel = grpc.insecure_channel(args.inventory_addr)
-    stub = grocery_pb2_grpc.InventoryServiceStub(channel)
-    print(f"[{robot_name}] gRPC connected to Inventory at {args.inventory_addr}")
-
-    while True:
-        topic, payload = sub.recv_multipart()
-        topic_s = topic.decode()
-
-        request_id, served_id, items = parse_workorder(payload)
-        relevant = {k: v for k, v in items.items() if k in my_items}
-
-        if not relevant:
-            # No-op case (spec: if robot has no item to work on, it sends no-op)
-            rr = grocery_pb2.RobotResult(
-                request_id=request_id,
-                served_id=served_id,
-                robot_name=robot_name,
-                status=grocery_pb2.ROBOT_NOOP,
-                message=f"NOOP for topic={topic_s}"
-            )
-            stub.ReportRobotResult(rr, timeout=5)
-            print(f"[{robot_name}] NOOP request_id={request_id} served_id={served_id}")
-            continue
-
-        # Simulate work: sleep once per unique item (spec allows sleep)
-        for item_name in relevant.keys():
-            t = random.uniform(0.2, 0.6)
-            print(f"[{robot_name}] Working on {item_name} (sleep {t:.2f}s)")
-            time.sleep(t)
-
-        # Simulate time to deliver/restock at cart/shelf
-        time.sleep(random.uniform(0.2, 0.5))
+def make_reporter(robot_name: str, stub, transport: str = ROBOT_RESULT_TRANSPORT, instance_id: str = ""):
+    if transport == "unary":
+        return UnaryReporter(robot_name, stub, instance_id=instance_id, heartbeat_s=ROBOT_HEARTBEAT_S)
+    if transport != "stream":
+        raise ValueError(f"Unknown result transport {transport!r} (stream or unary)")
+    return ResultStream(robot_name, stub, max_batch=ROBOT_RESULT_BATCH, linger_s=ROBOT_RESULT_LINGER_MS / 1000.0,
+                        heartbeat_s=ROBOT_HEARTBEAT_S, instance_id=instance_id)
 
+
+class RecentWork:
+    """
+    The last `size` request_ids this robot was sent, each with its result once
+    done (None while it is being worked on), so a WorkOrder that arrives again
+    is answered from here instead of being worked on twice.
+    """
+    def __init__(self, size: int = ROBOT_DEDUP_SIZE):
+        self.size = size
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self._entries
+
+    def result(self, request_id: str):
+        return self._entries.get(request_id)
+
+    def start(self, request_id: str):
+        self._entries[request_id] = None
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def finish(self, request_id: str, rr):
+        if request_id in self._entries:
+            self._entries[request_id] = rr
+
+    def forget(self, request_id: str):
+        """Failed: a later copy gets worked on again."""
+        self._entries.pop(request_id, None)
+
+
+async def handle_workorder(robot_name: str, topic: bytes, payload, reporter, work_scale: float,
+                           item_parallelism: int):
+    """Work on one WorkOrder, report the result to Inventory and return it. payload may be a memoryview."""
+    received = time.perf_counter()
+    log = get_logger(f"robot.{robot_name}")
+    topic_s = topic.decode()
+    kind = topic_s.split(".", 1)[0]
+    wo = WorkOrderView(payload)
+    # Inventory only sends this robot its own category's items
+    relevant = wo.items()
+    request_id, served_id, trace_id = wo.request_id(), wo.served_id(), wo.trace_id()
+
+    if not relevant:
+        # No-op case (spec: if robot has no item to work on, it sends no-op)
         rr = grocery_pb2.RobotResult(
             request_id=request_id,
-            served_id=served_id,   # spec: must indicate which customer/supplier it served
+            served_id=served_id,
             robot_name=robot_name,
-            status=grocery_pb2.ROBOT_OK,
-            message=f"OK handled {list(relevant.keys())} topic={topic_s}"
+            status=grocery_pb2.ROBOT_NOOP,
+            message=f"NOOP for topic={topic_s}"
         )
-        stub.ReportRobotResult(rr, timeout=5)
-        print(f"[{robot_name}] OK sent request_id={request_id} served_id={served_id} items={list(relevant.keys())}")
+        reporter.report(rr, trace_id)
+        WORKORDERS.labels(robot_name, kind, "NOOP").inc()
+        log.info("noop", extra={"request_id": request_id, "served_id": served_id})
+        return rr
+
+    # Simulate work: one sleep per unique item (spec allows sleep), items side by side
+    work_start = time.perf_counter()
+    lanes = asyncio.Semaphore(item_parallelism or len(relevant))
+    await asyncio.gather(*(work_on_item(robot_name, name, work_scale, lanes) for name in relevant))
+
+    # Simulate time to deliver/restock at cart/shelf
+    await asyncio.sleep(random.uniform(0.2, 0.5) * work_scale)
+
+    rr = grocery_pb2.RobotResult(
+        request_id=request_id,
+        served_id=served_id,   # spec: must indicate which customer/supplier it served
+        robot_name=robot_name,
+        status=grocery_pb2.ROBOT_OK,
+        message=f"OK handled {list(relevant.keys())} topic={topic_s}",
+        work_ms=(time.perf_counter() - work_start) * 1000.0
+    )
+    reporter.report(rr, trace_id)
+    WORKORDERS.labels(robot_name, kind, "OK").inc()
+    WORK_SECONDS.labels(robot_name).observe(time.perf_counter() - received)
+    log.info("done", extra={"request_id": request_id, "served_id": served_id, "items": list(relevant)})
+    return rr
+
+
+async def robot_loop(robot_name: str, sub_addr: str, inventory_addr: str, work_scale: float = 1.0,
+                     stop_event: threading.Event = None, ctx: zmq.Context = None,
+                     max_in_flight: int = ROBOT_MAX_IN_FLIGHT, item_parallelism: int = ROBOT_ITEM_PARALLELISM,
+                     transport: str = ROBOT_RESULT_TRANSPORT, dispatch: str = ROBOT_DISPATCH,
+                     work_addr: str = ZMQ_DEALER_ADDR):
+    """
+    Robot receive loop. Each WorkOrder becomes its own task, so a burst of
+    orders is worked on concurrently instead of queueing behind the first one;
+    at most max_in_flight run at once. The loop only receives and spawns, and
+    results are reported from the order's task (over the robot's RobotSession
+    stream unless transport is "unary").
+
+    The robot name is its item category (items.category). With dispatch
+    "router" the robot connects a DEALER to Inventory's ROUTER at work_addr
+    and announces itself as a replica of its category with max_in_flight as
+    its capacity. Inventory hands each WorkOrder to one replica, so any number
+    of robots can share a category. With "pubsub" it subscribes to
+    FETCH.<name> and RESTOCK.<name> at sub_addr and gets all of them.
+
+    Every WorkOrder carries a sequence number; gaps are counted as missed
+    WorkOrders. With "router" the robot ACKs each one on receipt and sends
+    DONE when it is finished, and Inventory sends again what isn't ACKed in
+    time. Copies of a request_id already seen (RecentWork) are not worked on
+    again: the cached result is re-reported, or, while it is still being
+    worked on, the copy is simply DONE.
+    """
+    topics = (b"FETCH." + robot_name.encode(), b"RESTOCK." + robot_name.encode())
+    # Tells this robot apart from other replicas of its category (Inventory's registry and dispatcher)
+    instance_id = f"{robot_name}-{uuid.uuid4().hex[:8]}"
+
+    # ZMQ socket (asyncio flavour; shares the caller's context when one is given)
+    actx = zmq.asyncio.Context.shadow(ctx) if ctx is not None else zmq.asyncio.Context.instance()
+    if dispatch == "router":
+        sock = actx.socket(zmq.DEALER)
+        sock.setsockopt(zmq.ROUTING_ID, instance_id.encode())
+        sock.setsockopt(zmq.RCVHWM, ZMQ_RCVHWM)
+        sock.connect(work_addr)
+        print(f"[{robot_name}] Connected DEALER to {work_addr} as {instance_id}")
+    elif dispatch == "pubsub":
+        sock = actx.socket(zmq.SUB)
+        sock.setsockopt(zmq.RCVHWM, ZMQ_RCVHWM)
+        sock.connect(sub_addr)
+        for topic in topics:
+            sock.setsockopt(zmq.SUBSCRIBE, topic)
+        print(f"[{robot_name}] Connected SUB to {sub_addr} (topics: {', '.join(t.decode() for t in topics)})")
+    else:
+        raise ValueError(f"Unknown dispatch {dispatch!r} (router or pubsub)")
+
+    # gRPC stub on a long-lived keepalive channel
+    stub = get_stub(inventory_addr, grocery_pb2_grpc.InventoryServiceStub)
+    if get_channel_manager().wait_ready(inventory_addr, timeout_s=5.0):
+        print(f"[{robot_name}] gRPC connected to Inventory at {inventory_addr}")
+    else:
+        print(f"[{robot_name}] Inventory not reachable yet at {inventory_addr} (will keep retrying)")
+    RCVHWM.labels(robot_name).set(ZMQ_RCVHWM)
+    reporter = make_reporter(robot_name, stub, transport, instance_id)
+    _reporters[instance_id] = reporter
+
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    recent = RecentWork()
+    missed = WORK_MISSED.labels(robot_name)
+    duplicates = WORK_DUPLICATES.labels(robot_name)
+    # Last seq seen per PUB topic (pubsub) or from the dispatcher (router: one sequence per replica)
+    last_seq = {}
+    # router: seqs received / finished in this loop iteration, sent as one ACK and one DONE
+    acks, dones = [], []
+
+    def flush_control():
+        # DONE implies receipt: no ACK for what finished in the same iteration (instant robots)
+        if acks and dones:
+            finished = set(dones)
+            acks[:] = [seq for seq in acks if seq not in finished]
+        if acks:
+            _send_control(sock, [ACK, *acks])
+            acks.clear()
+        if dones:
+            _send_control(sock, [DONE, *dones])
+            dones.clear()
+
+    def queue_control(frames: list, seq: bytes):
+        if not acks and not dones:
+            loop.call_soon(flush_control)
+        frames.append(seq)
+
+    def announce():
+        _send_control(sock, [READY, robot_name.encode(), str(max_in_flight).encode()])
+
+    async def keep_announcing():
+        while True:
+            await asyncio.sleep(ROBOT_READY_S)
+            announce()
+
+    def on_done(task: asyncio.Task, seq: bytes, request_id: str):
+        tasks.discard(task)
+        in_flight.release()
+        if dispatch == "router":
+            queue_control(dones, seq)
+        if task.cancelled() or task.exception() is not None:
+            recent.forget(request_id)
+            if not task.cancelled():
+                get_logger(f"robot.{robot_name}").error("work order failed",
+                                                        extra={"request_id": request_id, "error": str(task.exception())})
+        else:
+            recent.finish(request_id, task.result())
+
+    announcer = None
+    if dispatch == "router":
+        announce()
+        announcer = asyncio.create_task(keep_announcing())
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if stop_event is not None and not await sock.poll(200):
+                continue
+            # Wait for a free slot before taking the next order off the socket
+            await in_flight.acquire()
+            # copy=False: the payload is read in place from the ZMQ frame
+            topic, seq, payload = await sock.recv_multipart(copy=False)
+            topic, seq = topic.bytes, seq.bytes
+            # SUBSCRIBE is a prefix match, so FETCH.meat would also get FETCH.meatballs
+            if topic not in topics:
+                in_flight.release()
+                continue
+            if dispatch == "router":
+                queue_control(acks, seq)
+            n, stream = int(seq), topic if dispatch == "pubsub" else b""
+            last = last_seq.get(stream)
+            # A lower seq than before means Inventory restarted: start counting again from it
+            if last is not None and n > last + 1:
+                missed.inc(n - last - 1)
+            last_seq[stream] = n
+
+            request_id = WorkOrderView(payload.buffer).request_id()
+            if request_id in recent:
+                duplicates.inc()
+                rr = recent.result(request_id)
+                if rr is not None:
+                    # Finished already; the first result may be what got lost
+                    reporter.report(rr)
+                in_flight.release()
+                if dispatch == "router":
+                    queue_control(dones, seq)
+                continue
+            recent.start(request_id)
+            task = asyncio.create_task(handle_workorder(robot_name, topic, payload.buffer, reporter,
+                                                        work_scale, item_parallelism))
+            tasks.add(task)
+            task.add_done_callback(functools.partial(on_done, seq=seq, request_id=request_id))
+    finally:
+        if announcer is not None:
+            announcer.cancel()
+            # Take no more work; what is already here still gets done
+            _send_control(sock, [BYE])
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
+        sock.close(linger=500 if dispatch == "router" else 0)
+        # Blocks until queued results are acknowledged (bounded), so run it off the loop
+        await loop.run_in_executor(None, reporter.close)
+        _reporters.pop(instance_id, None)
+
+
+def _send_control(sock, frames):
+    """Best effort: a control message that can't be queued right now is dropped (the next READY resyncs)."""
+    if sock.closed:
+        return
+    sock.send_multipart(frames, flags=zmq.NOBLOCK).add_done_callback(_discard_result)
+
+
+def _discard_result(fut):
+    if not fut.cancelled():
+        fut.exception()
+
+
+def run_robot(robot_name: str, sub_addr: str, inventory_addr: str, work_scale: float = 1.0,
+              stop_event: threading.Event = None, ctx: zmq.Context = None,
+              max_in_flight: int = ROBOT_MAX_IN_FLIGHT, item_parallelism: int = ROBOT_ITEM_PARALLELISM,
+              transport: str = ROBOT_RESULT_TRANSPORT, dispatch: str = ROBOT_DISPATCH,
+              work_addr: str = ZMQ_DEALER_ADDR):
+    """
+    Run a robot on its own event loop until stop_event is set (or forever when it is None).
+    work_scale multiplies the simulated work time (0 = answer immediately, used by the benchmark stand-ins).
+    """
+    asyncio.run(robot_loop(robot_name, sub_addr, inventory_addr, work_scale, stop_event, ctx,
+                           max_in_flight, item_parallelism, transport, dispatch, work_addr))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--name", required=True, help="robot name = item category it handles, e.g. bread/dairy/meat/produce/party")
+    ap.add_argument("--dispatch", choices=["router", "pubsub"], default=ROBOT_DISPATCH,
+                    help="get work as one replica of the category (router) or subscribe to all of it (pubsub)")
+    ap.add_argument("--work_addr", default=ZMQ_DEALER_ADDR, help="Inventory's ROUTER (dispatch=router)")
+    ap.add_argument("--sub_addr", default=os.environ.get("ZMQ_SUB_ADDR", "tcp://127.0.0.1:5556"),
+                    help="Inventory's PUB (dispatch=pubsub)")
+    ap.add_argument("--inventory_addr", default=os.environ.get("INVENTORY_ADDR", "127.0.0.1:50051"))
+    ap.add_argument("--max_in_flight", type=int, default=ROBOT_MAX_IN_FLIGHT,
+                    help="work orders handled concurrently (with dispatch=router, the replica's capacity)")
+    ap.add_argument("--item_parallelism", type=int, default=ROBOT_ITEM_PARALLELISM,
+                    help="items of one order worked on at once (0 = all, 1 = serial)")
+    ap.add_argument("--transport", choices=["stream", "unary"], default=ROBOT_RESULT_TRANSPORT,
+                    help="report results over one RobotSession stream or one unary call each")
+    ap.add_argument("--metrics_port", type=int, default=ROBOT_METRICS_PORT,
+                    help="first port to try for /metrics (0 = off)")
+    args = ap.parse_args()
+
+    start_metrics_server(args.metrics_port, scan=ROBOT_METRICS_PORT_SCAN, name=args.name)
+
+    try:
+        run_robot(args.name, args.sub_addr, args.inventory_addr,
+                  max_in_flight=args.max_in_flight, item_parallelism=args.item_parallelism,
+                  transport=args.transport, dispatch=args.dispatch, work_addr=args.work_addr)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""
+Lazy, zero-copy reader for FlatBuffers WorkOrder messages (schemas/flatbuffers/work.fbs).
+
+The generated groceryfb classes build an object per accessor call and copy every
+string out of the buffer. A robot only cares about the few items of its own
+category, so WorkOrderView reads the wire format directly from a memoryview
+(e.g. a ZMQ frame received with copy=False):
+
+- item names are compared in place against precomputed category bytes, and only
+  names whose length matches one of the category's names are even looked at;
+- a matching name maps straight to the category's existing Python str, so
+  nothing is decoded for irrelevant items;
+- request_id / served_id / trace_id are decoded only when asked for.
+
+Inventory now routes each category's items to its own topic, so items() (read
+everything) is what the robots use; select_items() remains for filtering a
+mixed order.
+"""
+import struct
+from typing import Dict, Iterable
+
+_uoffset = struct.Struct("<I")
+_soffset = struct.Struct("<i")
+_voffset = struct.Struct("<H")
+_int32 = struct.Struct("<i")
+_int8 = struct.Struct("<b")
+
+# Field positions in the vtables (4 + 2 * slot), matching groceryfb/*.py
+_WO_REQUEST_ID = 4
+_WO_REQUEST_TYPE = 6
+_WO_ID = 8
+_WO_ITEMS = 10
+_WO_TRACE_ID = 12
+_ITEM_NAME = 4
+_ITEM_QTY = 6
+
+
+class ItemMatcher:
+    """Precomputed lookup for one category: byte length -> ((encoded name, str), ...)."""
+    __slots__ = ("by_length",)
+
+    def __init__(self, names: Iterable[str]):
+        by_length: Dict[int, list] = {}
+        for name in names:
+            encoded = name.encode()
+            by_length.setdefault(len(encoded), []).append((encoded, name))
+        self.by_length = {n: tuple(c) for n, c in by_length.items()}
+
+
+class WorkOrderView:
+    """Read-only view over one WorkOrder buffer; nothing is copied or decoded up front."""
+    __slots__ = ("_buf", "_pos", "_vt", "_vt_size")
+
+    def __init__(self, buf):
+        self._buf = buf if isinstance(buf, memoryview) else memoryview(buf)
+        self._pos = _uoffset.unpack_from(self._buf, 0)[0]
+        self._vt = self._pos - _soffset.unpack_from(self._buf, self._pos)[0]
+        self._vt_size = _voffset.unpack_from(self._buf, self._vt)[0]
+
+    def _field(self, vt_offset: int) -> int:
+        """Absolute position of a root table field, or 0 if it is absent."""
+        if vt_offset >= self._vt_size:
+            return 0
+        off = _voffset.unpack_from(self._buf, self._vt + vt_offset)[0]
+        return self._pos + off if off else 0
+
+    def _string(self, pos: int):
+        if not pos:
+            return None
+        start = pos + _uoffset.unpack_from(self._buf, pos)[0]
+        length = _uoffset.unpack_from(self._buf, start)[0]
+        return str(self._buf[start + 4:start + 4 + length], "utf-8")
+
+    def request_id(self) -> str:
+        return self._string(self._field(_WO_REQUEST_ID))
+
+    def served_id(self) -> str:
+        return self._string(self._field(_WO_ID))
+
+    def trace_id(self):
+        return self._string(self._field(_WO_TRACE_ID))
+
+    def request_type(self) -> int:
+        pos = self._field(_WO_REQUEST_TYPE)
+        return _int8.unpack_from(self._buf, pos)[0] if pos else 0
+
+    def item_count(self) -> int:
+        pos = self._field(_WO_ITEMS)
+        if not pos:
+            return 0
+        return _uoffset.unpack_from(self._buf, pos + _uoffset.unpack_from(self._buf, pos)[0])[0]
+
+    def items(self) -> Dict[str, int]:
+        """name -> qty for every item of the order."""
+        pos = self._field(_WO_ITEMS)
+        if not pos:
+            return {}
+        buf = self._buf
+        unpack_u, unpack_s, unpack_v = _uoffset.unpack_from, _soffset.unpack_from, _voffset.unpack_from
+        vec = pos + unpack_u(buf, pos)[0]
+        count = unpack_u(buf, vec)[0]
+        items = {}
+        elem = vec + 4
+        for _ in range(count):
+            table = elem + unpack_u(buf, elem)[0]
+            elem += 4
+            vt = table - unpack_s(buf, table)[0]
+            vt_size = unpack_v(buf, vt)[0]
+            name_off = unpack_v(buf, vt + _ITEM_NAME)[0] if _ITEM_NAME < vt_size else 0
+            if not name_off:
+                continue
+            s = table + name_off
+            s += unpack_u(buf, s)[0]
+            n = unpack_u(buf, s)[0]
+            qty_off = unpack_v(buf, vt + _ITEM_QTY)[0] if _ITEM_QTY < vt_size else 0
+            items[str(buf[s + 4:s + 4 + n], "utf-8")] = _int32.unpack_from(buf, table + qty_off)[0] if qty_off else 0
+        return items
+
+    def select_items(self, matcher: ItemMatcher) -> Dict[str, int]:
+        """name -> qty for the items of the order that matcher knows, skipping everything else."""
+        pos = self._field(_WO_ITEMS)
+        if not pos:
+            return {}
+        buf = self._buf
+        unpack_u, unpack_s, unpack_v = _uoffset.unpack_from, _soffset.unpack_from, _voffset.unpack_from
+        by_length = matcher.by_length
+        vec = pos + unpack_u(buf, pos)[0]
+        count = unpack_u(buf, vec)[0]
+        selected = {}
+        elem = vec + 4
+        for _ in range(count):
+            table = elem + unpack_u(buf, elem)[0]
+            elem += 4
+            vt = table - unpack_s(buf, table)[0]
+            vt_size = unpack_v(buf, vt)[0]
+            name_off = unpack_v(buf, vt + _ITEM_NAME)[0] if _ITEM_NAME < vt_size else 0
+            if not name_off:
+                continue
+            s = table + name_off
+            s += unpack_u(buf, s)[0]
+            n = unpack_u(buf, s)[0]
+            candidates = by_length.get(n)
+            if candidates is None:
+                continue
+            s += 4
+            raw = buf[s:s + n]
+            for encoded, name in candidates:
+                if raw == encoded:
+                    break
+            else:
+                continue
+            qty_off = unpack_v(buf, vt + _ITEM_QTY)[0] if _ITEM_QTY < vt_size else 0
+            selected[name] = _int32.unpack_from(buf, table + qty_off)[0] if qty_off else 0
+        return selected
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from typing import Callable, List
+
+
+class _Flush:
+    """Queue marker: write out everything before it, then set done."""
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_CLOSE = object()
+
+
+class BatchWriter:
+    """
+    Background writer for fire-and-forget records (analytics rows, trace spans).
+
+    - submit() never blocks: records go on a bounded queue; when it is full the
+      record is dropped and counted instead of slowing the caller down.
+    - A daemon thread collects records and calls write_batch(records) once
+      max_batch are waiting or flush_interval_s has passed since the first one.
+    - flush() waits until everything submitted so far has been written;
+      close() flushes and stops the thread.
+    """
+    def __init__(self, write_batch: Callable[[List], None], name: str = "batch-writer",
+                 max_queue: int = 10000, max_batch: int = 500, flush_interval_s: float = 1.0):
+        self.write_batch = write_batch
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval_s = flush_interval_s
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, record) -> bool:
+        """Queue one record; returns False (and counts a drop) if the queue is full or closed."""
+        if self._closed:
+            with self._lock:
+                self._dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def flush(self, timeout_s: float = 5.0) -> bool:
+        """Block until records submitted before this call are written (or timeout_s passes)."""
+        if not self._thread.is_alive():
+            return False
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout_s)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout_s)
+
+    def close(self, timeout_s: float = 5.0):
+        """Write out what is queued, then stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_CLOSE, timeout=timeout_s)
+        except queue.Full:
+            print(f"[{self.name}] queue still full at close, pending records are lost")
+            return
+        self._thread.join(timeout_s)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'submitted': self._submitted,
+                'written': self._written,
+                'dropped': self._dropped,
+                'batches': self._batches,
+                'write_errors': self._errors,
+            }
+
+    def _write(self, batch: List):
+        if not batch:
+            return
+        try:
+            self.write_batch(batch)
+            with self._lock:
+                self._written += len(batch)
+                self._batches += 1
+        except Exception as e:
+            # The caller never waits on these records, so a failed batch is reported and discarded
+            with self._lock:
+                self._errors += 1
+                self._dropped += len(batch)
+            print(f"[{self.name}] failed to write {len(batch)} records: {e}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval_s
+            while True:
+                if item is _CLOSE:
+                    self._write(batch)
+                    return
+                if isinstance(item, _Flush):
+                    self._write(batch)
+                    batch = []
+                    item.done.set()
+                else:
+                    batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        break
+                if not batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
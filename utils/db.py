@@ -1,7 +1,19 @@
 import os
-import psycopg2
+import time
+import threading
+from collections import deque
 from contextlib import contextmanager
 
+import psycopg2
+import psycopg2.extensions
+
+from utils.metrics import Histogram, register_collector, stats_family
+
+
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Time a pooled DB connection was held (queries + commit), by operation",
+                             ["op"])
+
+
 def get_db_config():
     return {
         'host': os.getenv('DB_HOST', 'localhost'),
@@ -11,14 +23,333 @@ def get_db_config():
         'password': os.getenv('DB_PASSWORD', ''),
     }
 
+
+def get_pool_config():
+    return {
+        'min_size': int(os.getenv('DB_POOL_MIN', '1')),
+        'max_size': int(os.getenv('DB_POOL_MAX', '10')),
+        'checkout_timeout_s': float(os.getenv('DB_POOL_TIMEOUT_S', '5')),
+        'max_lifetime_s': float(os.getenv('DB_POOL_MAX_LIFETIME_S', '1800')),
+        'healthcheck_idle_s': float(os.getenv('DB_POOL_HEALTHCHECK_IDLE_S', '30')),
+    }
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PooledConn:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class _Waiter:
+    __slots__ = ("event", "pc", "closed")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.pc = None          # handed-over connection, or None for a fresh slot
+        self.closed = False
+
+
+class ConnectionPool:
+    """
+    Thread-safe, size-bounded pool of psycopg2 connections.
+
+    - At most max_size connections are open at once; callers block (up to
+      checkout_timeout_s) when all of them are checked out.
+    - Connections older than max_lifetime_s are closed and replaced.
+    - A connection idle for longer than healthcheck_idle_s is pinged with
+      SELECT 1 before it is handed out; broken connections are replaced.
+    """
+    def __init__(self, db_config, min_size=1, max_size=10, checkout_timeout_s=5.0,
+                 max_lifetime_s=1800.0, healthcheck_idle_s=30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.db_config = db_config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.checkout_timeout_s = checkout_timeout_s
+        self.max_lifetime_s = max_lifetime_s
+        self.healthcheck_idle_s = healthcheck_idle_s
+
+        self._lock = threading.Lock()
+        self._idle = []          # LIFO stack of _PooledConn
+        self._waiters = deque()  # FIFO of _Waiter blocked in getconn()
+        self._open = 0           # idle + in use
+        self._in_use = 0
+        self._closed = False
+
+        # Instrumentation
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._broken = 0
+
+    # ---------- connection lifecycle ----------
+
+    def _connect(self):
+        return _PooledConn(psycopg2.connect(**self.db_config))
+
+    def _discard(self, pc):
+        try:
+            pc.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pc, now):
+        return self.max_lifetime_s > 0 and now - pc.created_at >= self.max_lifetime_s
+
+    def _healthy(self, pc, now):
+        conn = pc.conn
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if now - pc.last_used < self.healthcheck_idle_s:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # ---------- checkout / checkin ----------
+
+    def getconn(self):
+        """Check out a connection, blocking up to checkout_timeout_s (FIFO among waiters)."""
+        t0 = time.monotonic()
+        waited = False
+
+        while True:
+            pc = None
+            new_slot = False
+            waiter = None
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                if self._idle and not self._waiters:
+                    pc = self._idle.pop()
+                elif self._open < self.max_size and not self._waiters:
+                    self._open += 1
+                    new_slot = True
+                else:
+                    waiter = _Waiter()
+                    self._waiters.append(waiter)
+                if waiter is None:
+                    self._in_use += 1
+
+            if waiter is not None:
+                waited = True
+                remaining = t0 + self.checkout_timeout_s - time.monotonic()
+                waiter.event.wait(max(0.0, remaining))
+                with self._lock:
+                    if not waiter.event.is_set():
+                        self._waiters.remove(waiter)
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"no DB connection available after {self.checkout_timeout_s:.1f}s "
+                            f"(max_size={self.max_size})"
+                        )
+                if waiter.closed:
+                    raise PoolTimeout("connection pool is closed")
+                pc = waiter.pc
+                new_slot = pc is None
+
+            # Connect / health-check outside the lock
+            now = time.monotonic()
+            if new_slot:
+                try:
+                    pc = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif self._expired(pc, now):
+                self._discard(pc)
+                self._release_slot(recycled=True)
+                continue
+            elif not self._healthy(pc, now):
+                self._discard(pc)
+                self._release_slot(broken=True)
+                continue
+
+            wait_s = time.monotonic() - t0
+            with self._lock:
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                self._wait_total_s += wait_s
+                if wait_s > self._wait_max_s:
+                    self._wait_max_s = wait_s
+            return pc
+
+    def putconn(self, pc, discard=False):
+        """Return a connection checked out with getconn()."""
+        now = time.monotonic()
+        conn = pc.conn
+        if not discard:
+            discard = (
+                conn.closed
+                or self._closed
+                or self._expired(pc, now)
+                or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            )
+        if discard:
+            self._discard(pc)
+            self._release_slot()
+            return
+        pc.last_used = now
+        with self._lock:
+            if self._waiters:
+                # Hand the connection straight to the oldest waiter (stays in use)
+                waiter = self._waiters.popleft()
+                waiter.pc = pc
+                waiter.event.set()
+                return
+            self._in_use -= 1
+            self._idle.append(pc)
+
+    def _release_slot(self, recycled=False, broken=False):
+        with self._lock:
+            if recycled:
+                self._recycled += 1
+            if broken:
+                self._broken += 1
+            if self._waiters and not self._closed:
+                # Pass the freed slot to the oldest waiter, who opens a new connection
+                waiter = self._waiters.popleft()
+                waiter.event.set()
+                return
+            self._open -= 1
+            self._in_use -= 1
+
+    def prefill(self):
+        """Open min_size connections up front so the first requests skip the handshake."""
+        conns = []
+        try:
+            while True:
+                with self._lock:
+                    if self._open >= self.min_size:
+                        break
+                conns.append(self.getconn())
+        finally:
+            for pc in conns:
+                self.putconn(pc)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            waiters, self._waiters = list(self._waiters), deque()
+        for waiter in waiters:
+            waiter.closed = True
+            waiter.event.set()
+        for pc in idle:
+            self._discard(pc)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': len(self._waiters),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_avg_ms': (self._wait_total_s / self._checkouts * 1000.0) if self._checkouts else 0.0,
+                'wait_max_ms': self._wait_max_s * 1000.0,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'broken': self._broken,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the process-wide pool, creating it on first use.
+    A forked child gets its own pool rather than sharing the parent's sockets.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(get_db_config(), **get_pool_config())
+            _pool_pid = pid
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+def _pool_metrics():
+    pool = _pool
+    if pool is None or _pool_pid != os.getpid():
+        return []
+    stats = pool.stats()
+    return [
+        stats_family("db_pool_connections", "Pooled DB connections by state", stats,
+                     ("open", "idle", "in_use", "waiting"), label="state"),
+        stats_family("db_pool_events_total", "DB pool checkouts, waits, timeouts and discarded connections", stats,
+                     ("checkouts", "waits", "timeouts", "recycled", "broken"), type_name="counter", label="event"),
+    ]
+
+
+register_collector(_pool_metrics)
+
+
 @contextmanager
-def get_db_connection():
-    conn = psycopg2.connect(**get_db_config())
+def get_db_connection(autocommit=False, op="other"):
+    """
+    Check out a pooled connection. With autocommit=True every statement is its
+    own transaction, which saves the BEGIN/COMMIT round-trips for callers that
+    issue a single self-contained statement. op labels the time the connection
+    is held (checkout to return) in db_query_seconds.
+    """
+    pool = get_pool()
+    pc = pool.getconn()
+    conn = pc.conn
+    broken = False
+    t0 = time.perf_counter()
     try:
+        if autocommit:
+            conn.autocommit = True
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
         raise
     finally:
-        conn.close()
+        if autocommit and not conn.closed:
+            try:
+                conn.autocommit = False
+            except Exception:
+                broken = True
+        pool.putconn(pc, discard=broken or conn.closed)
+        DB_QUERY_SECONDS.labels(op).observe(time.perf_counter() - t0)
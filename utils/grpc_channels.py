@@ -0,0 +1,247 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, List
+
+import grpc
+
+from utils.metrics import register_collector
+
+
+GRPC_KEEPALIVE_TIME_MS = int(os.getenv('GRPC_KEEPALIVE_TIME_MS', '30000'))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv('GRPC_KEEPALIVE_TIMEOUT_MS', '10000'))
+GRPC_MAX_CONCURRENT_STREAMS = int(os.getenv('GRPC_MAX_CONCURRENT_STREAMS', '65536'))
+
+
+def channel_options():
+    """Client-side options: keepalive pings on idle connections, round-robin over resolved addresses."""
+    return [
+        ('grpc.keepalive_time_ms', GRPC_KEEPALIVE_TIME_MS),
+        ('grpc.keepalive_timeout_ms', GRPC_KEEPALIVE_TIMEOUT_MS),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+        ('grpc.lb_policy_name', 'round_robin'),
+    ]
+
+
+def server_options():
+    """Server-side options matching channel_options(): accept client keepalives, cap streams per connection."""
+    return [
+        ('grpc.max_concurrent_streams', GRPC_MAX_CONCURRENT_STREAMS),
+        ('grpc.keepalive_time_ms', GRPC_KEEPALIVE_TIME_MS),
+        ('grpc.keepalive_timeout_ms', GRPC_KEEPALIVE_TIMEOUT_MS),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.min_recv_ping_interval_without_data_ms', min(GRPC_KEEPALIVE_TIME_MS, 10000)),
+        ('grpc.http2.max_ping_strikes', 0),
+    ]
+
+
+def split_targets(target: str) -> List[str]:
+    """'host1:50051, host2:50051' -> ['host1:50051', 'host2:50051']"""
+    return [t.strip() for t in target.split(',') if t.strip()]
+
+
+class _TrackedChannel:
+    """A long-lived channel plus its last known connectivity state."""
+    __slots__ = ("addr", "channel", "state")
+
+    def __init__(self, addr: str, options):
+        self.addr = addr
+        self.channel = grpc.insecure_channel(addr, options=options)
+        self.state = grpc.ChannelConnectivity.IDLE
+        # try_to_connect=True starts the HTTP/2 handshake now, off the request path
+        self.channel.subscribe(self._on_state, try_to_connect=True)
+
+    def _on_state(self, state):
+        self.state = state
+
+
+class ChannelManager:
+    """
+    Process-wide cache of long-lived gRPC channels.
+
+    - One multiplexed channel per backend address, reused by every request.
+    - A comma-separated target ("a:50051,b:50051") is balanced round-robin,
+      skipping backends currently in TRANSIENT_FAILURE.
+    - Stubs are cached per (address, stub class).
+    """
+    def __init__(self, options=None):
+        self.options = options if options is not None else channel_options()
+        self._lock = threading.Lock()
+        self._channels: Dict[str, _TrackedChannel] = {}
+        self._stubs: Dict[tuple, object] = {}
+        self._rr: Dict[str, int] = {}
+
+    def _tracked(self, addr: str) -> _TrackedChannel:
+        tc = self._channels.get(addr)
+        if tc is None:
+            with self._lock:
+                tc = self._channels.get(addr)
+                if tc is None:
+                    tc = _TrackedChannel(addr, self.options)
+                    self._channels[addr] = tc
+        return tc
+
+    def _pick(self, target: str) -> _TrackedChannel:
+        addrs = split_targets(target)
+        if not addrs:
+            raise ValueError(f"empty gRPC target {target!r}")
+        if len(addrs) == 1:
+            return self._tracked(addrs[0])
+        with self._lock:
+            start = self._rr.get(target, 0)
+            self._rr[target] = start + 1
+        tracked = [self._tracked(a) for a in addrs]
+        for i in range(len(tracked)):
+            tc = tracked[(start + i) % len(tracked)]
+            if tc.state != grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+                return tc
+        return tracked[start % len(tracked)]
+
+    def channel(self, target: str) -> grpc.Channel:
+        return self._pick(target).channel
+
+    def stub(self, target: str, stub_cls):
+        """Return a cached stub_cls bound to the next channel for target."""
+        tc = self._pick(target)
+        key = (tc.addr, stub_cls)
+        stub = self._stubs.get(key)
+        if stub is None:
+            stub = stub_cls(tc.channel)
+            self._stubs[key] = stub
+        return stub
+
+    def wait_ready(self, target: str, timeout_s: float = 1.0) -> bool:
+        """True when at least one backend of target finishes connecting within timeout_s."""
+        for addr in split_targets(target):
+            try:
+                grpc.channel_ready_future(self._tracked(addr).channel).result(timeout=timeout_s)
+                return True
+            except grpc.FutureTimeoutError:
+                continue
+        return False
+
+    def states(self) -> Dict[str, str]:
+        """Connectivity state per backend address, e.g. {'localhost:50053': 'READY'}."""
+        with self._lock:
+            return {addr: tc.state.name for addr, tc in self._channels.items()}
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = list(self._channels.values()), {}
+            self._stubs.clear()
+        for tc in channels:
+            tc.channel.close()
+
+
+_manager = None
+_manager_pid = None
+_manager_lock = threading.Lock()
+
+
+def get_channel_manager() -> ChannelManager:
+    """
+    Return the process-wide ChannelManager, creating it on first use.
+    gRPC channels don't survive fork(), so a forked child builds its own.
+    """
+    global _manager, _manager_pid
+    pid = os.getpid()
+    if _manager is not None and _manager_pid == pid:
+        return _manager
+    with _manager_lock:
+        if _manager is None or _manager_pid != pid:
+            _manager = ChannelManager()
+            _manager_pid = pid
+        return _manager
+
+
+def get_stub(target: str, stub_cls):
+    return get_channel_manager().stub(target, stub_cls)
+
+
+class AioChannelManager:
+    """
+    grpc.aio counterpart of ChannelManager for asyncio services.
+    aio channels belong to the event loop that created them, so build one manager per loop.
+    """
+    def __init__(self, options=None):
+        self.options = options if options is not None else channel_options()
+        self._channels: Dict[str, grpc.aio.Channel] = {}
+        self._stubs: Dict[tuple, object] = {}
+        self._rr: Dict[str, int] = {}
+        _aio_managers.add(self)
+
+    def _channel(self, addr: str) -> grpc.aio.Channel:
+        ch = self._channels.get(addr)
+        if ch is None:
+            ch = grpc.aio.insecure_channel(addr, options=self.options)
+            ch.get_state(try_to_connect=True)
+            self._channels[addr] = ch
+        return ch
+
+    def _pick(self, target: str):
+        addrs = split_targets(target)
+        if not addrs:
+            raise ValueError(f"empty gRPC target {target!r}")
+        if len(addrs) == 1:
+            return addrs[0], self._channel(addrs[0])
+        start = self._rr.get(target, 0)
+        self._rr[target] = start + 1
+        for i in range(len(addrs)):
+            addr = addrs[(start + i) % len(addrs)]
+            ch = self._channel(addr)
+            if ch.get_state() != grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+                return addr, ch
+        addr = addrs[start % len(addrs)]
+        return addr, self._channel(addr)
+
+    def channel(self, target: str) -> grpc.aio.Channel:
+        return self._pick(target)[1]
+
+    def stub(self, target: str, stub_cls):
+        addr, ch = self._pick(target)
+        key = (addr, stub_cls)
+        stub = self._stubs.get(key)
+        if stub is None:
+            stub = stub_cls(ch)
+            self._stubs[key] = stub
+        return stub
+
+    async def wait_ready(self, target: str, timeout_s: float = 1.0) -> bool:
+        for addr in split_targets(target):
+            try:
+                await asyncio.wait_for(self._channel(addr).channel_ready(), timeout_s)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    def states(self) -> Dict[str, str]:
+        return {addr: ch.get_state().name for addr, ch in self._channels.items()}
+
+    async def close(self):
+        channels, self._channels = list(self._channels.values()), {}
+        self._stubs.clear()
+        for ch in channels:
+            await ch.close()
+
+
+_aio_managers = weakref.WeakSet()
+
+
+def _channel_metrics():
+    """grpc_channel_state{target, state} = 1 for every channel this process holds, sync and aio."""
+    states = {}
+    manager = _manager
+    if manager is not None and _manager_pid == os.getpid():
+        states.update(manager.states())
+    for aio_manager in list(_aio_managers):
+        states.update(aio_manager.states())
+    if not states:
+        return []
+    return [("grpc_channel_state", "gauge", "Connectivity state of each long-lived gRPC channel (1 = current)",
+             [({"target": addr, "state": state}, 1) for addr, state in sorted(states.items())])]
+
+
+register_collector(_channel_metrics)
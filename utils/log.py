@@ -0,0 +1,280 @@
+"""
+Structured, asynchronous logging for the request path.
+
+    log = get_logger("inventory")
+    log.info("order received", extra={"request_id": request_id, "items": items})
+
+- A log call only builds the record and puts it on a queue; one background
+  thread formats records and writes them in batches. No stdout I/O happens
+  on the request path. When the queue is full the
+  record is dropped and counted (log_dropped_total) rather than blocking.
+- LOG_FORMAT=json (default) writes one JSON object per line:
+  {"ts", "level", "logger", "msg", plus every extra= field}. LOG_FORMAT=text
+  writes "[logger] msg key=value ...", the old print() look.
+- LOG_LEVEL sets the default level. LOG_LEVELS overrides it per logger
+  prefix, e.g. "robot.items=DEBUG,pricing=WARNING".
+- LOG_SAMPLE keeps only a fraction of a logger prefix's records below
+  WARNING, e.g. "robot.items=0.01" keeps 1 in 100. Warnings and errors are
+  always kept.
+- log_records_total{level}, log_bytes_total, log_sampled_out_total and
+  log_dropped_total are exported on /metrics (utils/metrics.py).
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from typing import Dict
+
+from utils.metrics import Counter
+
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE = os.environ.get("LOG_SAMPLE", "")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+# "-" = stdout, otherwise a file path (appended to)
+LOG_FILE = os.environ.get("LOG_FILE", "-")
+
+LOG_RECORDS = Counter("log_records_total", "Log records queued for writing, by level", ["level"])
+LOG_BYTES = Counter("log_bytes_total", "Bytes of log output written")
+LOG_SAMPLED_OUT = Counter("log_sampled_out_total", "Log records skipped by LOG_SAMPLE")
+LOG_DROPPED = Counter("log_dropped_total", "Log records dropped because the log queue was full")
+
+# Everything a LogRecord carries by itself; any other attribute came in through extra=
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+_ROOT = "grocery"
+_lock = threading.RLock()
+_writer = None
+_writer_pid = None
+_loggers: Dict[str, logging.Logger] = {}
+
+
+def parse_prefixes(spec: str) -> Dict[str, str]:
+    """Parse "a=1,b.c=2" into {"a": "1", "b.c": "2"}."""
+    out = {}
+    for part in spec.split(","):
+        if "=" in part:
+            prefix, value = part.split("=", 1)
+            out[prefix.strip()] = value.strip()
+    return out
+
+
+def _longest_prefix(name: str, table: Dict[str, object]):
+    """Value for the longest dotted prefix of name in table, or None."""
+    while name:
+        if name in table:
+            return table[name]
+        name = name.rpartition(".")[0]
+    return None
+
+
+def _short_name(record: logging.LogRecord) -> str:
+    return record.name[len(_ROOT) + 1:] if record.name.startswith(_ROOT + ".") else record.name
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        body = {"ts": round(record.created, 6), "level": record.levelname, "logger": _short_name(record),
+                "msg": record.getMessage()}
+        body.update(_fields(record))
+        return json.dumps(body, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        level = "" if record.levelno < logging.WARNING else f"{record.levelname}: "
+        line = f"[{_short_name(record)}] {level}{record.getMessage()}"
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class SampleFilter(logging.Filter):
+    """Keep 1 in round(1/rate) records below WARNING for loggers under a sampled prefix."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self._every = {prefix: max(1, round(1.0 / rate)) if rate > 0 else 0 for prefix, rate in rates.items()}
+        self._counters: Dict[str, object] = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self._every:
+            return True
+        every = _longest_prefix(record.name, self._every)
+        if every is None or every == 1:
+            return True
+        counter = self._counters.get(record.name)
+        if counter is None:
+            # next() on itertools.count is atomic under the GIL, so no lock per record
+            counter = self._counters.setdefault(record.name, itertools.count())
+        if every and next(counter) % every == 0:
+            return True
+        LOG_SAMPLED_OUT.inc()
+        return False
+
+
+class _QueueHandler(logging.Handler):
+    """Puts records on the writer's queue; drops (and counts) them when LOG_QUEUE_SIZE are already waiting."""
+
+    def __init__(self, q: queue.SimpleQueue, max_size: int):
+        super().__init__()
+        self.queue = q
+        self.max_size = max_size
+
+    def handle(self, record):
+        # Handler.handle() would take the handler lock around emit(); SimpleQueue needs none
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record):
+        if self.queue.qsize() >= self.max_size:
+            LOG_DROPPED.inc()
+            return
+        # Merge args and any traceback into msg now, they may change once the call returns;
+        # extra= fields stay as attributes for the formatter
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.msg = f"{record.msg}\n{_TRACEBACKS.formatException(record.exc_info)}"
+            record.exc_info = None
+        counter = _level_counters.get(record.levelno)
+        if counter is None:
+            counter = _level_counters.setdefault(record.levelno, LOG_RECORDS.labels(record.levelname))
+        counter.inc()
+        self.queue.put(record)
+
+
+_TRACEBACKS = logging.Formatter()
+_level_counters = {}
+_STOP = object()
+
+
+class _Writer(threading.Thread):
+    """Formats queued records and writes them in batches: one write and one flush per batch, not per line."""
+
+    def __init__(self, q: queue.SimpleQueue, stream, formatter: logging.Formatter, batch_size: int = 512):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = q
+        self.stream = stream
+        self.formatter = formatter
+        self.batch_size = batch_size
+
+    def run(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            stopping = False
+            for record in batch:
+                if record is _STOP:
+                    stopping = True
+                    continue
+                try:
+                    lines.append(self.formatter.format(record))
+                except Exception as e:
+                    lines.append(f"[log] could not format record {record.msg!r}: {e}")
+            if lines:
+                data = "\n".join(lines) + "\n"
+                # No stream = whatever sys.stdout is now (bench.loadgen redirects it to --service_log)
+                stream = self.stream or sys.stdout
+                try:
+                    stream.write(data)
+                    stream.flush()
+                    LOG_BYTES.inc(len(data))
+                except Exception as e:
+                    sys.stderr.write(f"[log] write failed, {len(lines)} records lost: {e}\n")
+            if stopping:
+                return
+
+    def stop(self, timeout_s: float = 5.0):
+        self.queue.put(_STOP)
+        self.join(timeout_s)
+
+
+def configure(level: str = None, fmt: str = None, sample: str = None, levels: str = None,
+              stream=None, queue_size: int = None):
+    """
+    (Re)configure logging for this process; arguments default to the LOG_* settings.
+    Called on the first get_logger(), so services only need to call it to override settings.
+    """
+    global _writer, _writer_pid
+    # Skip what no formatter here prints: the caller's frame and thread/process names
+    # (the "Optimization" section of the logging HOWTO)
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    with _lock:
+        _stop_writer()
+        root = logging.getLogger(_ROOT)
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.setLevel(logging.getLevelName((level or LOG_LEVEL).upper()))
+        root.propagate = False
+        # Clear earlier per-prefix levels, then apply LOG_LEVELS
+        for name, logger in list(logging.root.manager.loggerDict.items()):
+            if name.startswith(_ROOT + ".") and isinstance(logger, logging.Logger):
+                logger.setLevel(logging.NOTSET)
+        for prefix, lvl in parse_prefixes(LOG_LEVELS if levels is None else levels).items():
+            logging.getLogger(f"{_ROOT}.{prefix}").setLevel(lvl.upper())
+
+        if stream is None and LOG_FILE != "-":
+            stream = open(LOG_FILE, "a")
+        q = queue.SimpleQueue()
+        handler = _QueueHandler(q, queue_size or LOG_QUEUE_SIZE)
+        rates = {f"{_ROOT}.{prefix}": float(rate)
+                 for prefix, rate in parse_prefixes(LOG_SAMPLE if sample is None else sample).items()}
+        if rates:
+            handler.addFilter(SampleFilter(rates))
+        root.addHandler(handler)
+
+        _writer = _Writer(q, stream, TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+        _writer.start()
+        _writer_pid = os.getpid()
+
+
+def _stop_writer():
+    global _writer
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.stop()
+    _writer = None
+
+
+def close_logging():
+    """Write out queued records and stop the writer thread (registered with atexit)."""
+    with _lock:
+        _stop_writer()
+
+
+atexit.register(close_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a service or component, e.g. "inventory" or "robot.items". Cheap enough to call per request."""
+    if _writer is None or _writer_pid != os.getpid():
+        with _lock:
+            if _writer is None or _writer_pid != os.getpid():
+                configure()
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers.setdefault(name, logging.getLogger(f"{_ROOT}.{name}"))
+    return logger
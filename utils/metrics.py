@@ -0,0 +1,394 @@
+"""
+Prometheus-style metrics shared by every service.
+
+    REQUESTS = Counter("ordering_requests_total", "HTTP requests", ["endpoint", "status"])
+    REQUESTS.labels("submit", "200").inc()
+    LATENCY = Histogram("ordering_request_seconds", "HTTP request latency", ["endpoint"])
+    LATENCY.labels("submit").observe(0.012)
+
+- Counters and histograms keep one cell per thread: a thread only ever adds
+  to its own cell, so inc()/observe() take no lock (the lock is taken once,
+  when a thread first touches a metric, and once when it exits, to fold its
+  cell into a shared base). A scrape sums the base and the live cells.
+- Gauges either hold a value (set/inc/dec) or read one at scrape time
+  (set_function), which keeps things like queue depths off the hot path.
+- register_collector(fn) adds metrics whose label sets are only known at
+  scrape time (channel states, pool stats).
+- start_metrics_server(port) serves GET /metrics (text exposition format)
+  from a daemon thread.
+
+The API is a subset of prometheus_client's, so the client library can be
+swapped in without touching call sites.
+"""
+import bisect
+import itertools
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+# Seconds; spans sub-millisecond cache hits to robot timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help, [(labels, value), ...]) as produced by collectors
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _Slot:
+    """A thread's cell, held in its threading.local; collected when the thread exits."""
+    __slots__ = ("cell", "__weakref__")
+
+    def __init__(self, cell: List[float]):
+        self.cell = cell
+
+
+class _Cells:
+    """
+    Per-thread value slots: each thread writes only its own list, a scrape sums
+    them. A thread's cell is folded into _base when the thread exits, so
+    short-lived threads (one per request under flask run) don't pile up cells.
+    """
+    __slots__ = ("_local", "_all", "_base", "_lock", "_width", "_ids")
+
+    def __init__(self, width: int):
+        self._local = threading.local()
+        self._all: Dict[int, List[float]] = {}
+        self._base = [0.0] * width
+        self._lock = threading.Lock()
+        self._width = width
+        self._ids = itertools.count()
+
+    def mine(self) -> List[float]:
+        try:
+            return self._local.slot.cell
+        except AttributeError:
+            cell = [0.0] * self._width
+            with self._lock:
+                key = next(self._ids)
+                self._all[key] = cell
+            slot = self._local.slot = _Slot(cell)
+            weakref.finalize(slot, self._retire, key).atexit = False
+            return cell
+
+    def _retire(self, key: int):
+        with self._lock:
+            cell = self._all.pop(key)
+            for i, v in enumerate(cell):
+                self._base[i] += v
+
+    def total(self) -> List[float]:
+        with self._lock:
+            cells = [self._base, *self._all.values()]
+        return [sum(c[i] for c in cells) for i in range(self._width)]
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.mine()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.total()[0]
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_fn", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._fn = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        """Read the value from fn() at scrape time instead."""
+        self._fn = fn
+
+    def value(self) -> float:
+        if self._fn is not None:
+            return float(self._fn())
+        return self._value
+
+
+class _Timer:
+    __slots__ = ("_child", "_t0")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._t0)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_cells")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # one slot per bucket, then +Inf, sum, count
+        self._cells = _Cells(len(bounds) + 3)
+
+    def observe(self, value: float):
+        cell = self._cells.mine()
+        cell[bisect.bisect_left(self._bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self) -> _Timer:
+        """with hist.labels(...).time(): ... observes the block's duration."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts including +Inf, sum, count)."""
+        total = self._cells.total()
+        cumulative, running = [], 0.0
+        for n in total[:-2]:
+            running += n
+            cumulative.append(running)
+        return cumulative, total[-2], total[-1]
+
+
+class _Metric:
+    """A named metric with optional labels; children are created on first use of a label set."""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def collect(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for key, child in self._items():
+            yield self.name, dict(zip(self.labelnames, key)), child.value()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._default.set_function(fn)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def collect(self):
+        bounds = [_format_value(b) for b in self.bounds] + ["+Inf"]
+        for key, child in self._items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative, total, count = child.snapshot()
+            for le, n in zip(bounds, cumulative):
+                yield self.name + "_bucket", {**labels, "le": le}, n
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def register_collector(self, fn: Callable[[], Iterable[MetricFamily]]):
+        """fn() is called on every scrape and returns (name, type, help, samples) families."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def unregister_collector(self, fn):
+        with self._lock:
+            if fn in self._collectors:
+                self._collectors.remove(fn)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            samples = list(metric.collect())
+            if not samples:
+                continue
+            _header(lines, metric.name, metric.type_name, metric.documentation)
+            for name, labels, value in samples:
+                lines.append(_sample(name, labels, value))
+        for fn in collectors:
+            try:
+                families = list(fn())
+            except Exception as e:
+                print(f"[metrics] collector {getattr(fn, '__name__', fn)} failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                if not samples:
+                    continue
+                _header(lines, name, type_name, documentation)
+                for labels, value in samples:
+                    lines.append(_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def register_collector(fn: Callable[[], Iterable[MetricFamily]]):
+    REGISTRY.register_collector(fn)
+
+
+def unregister_collector(fn):
+    REGISTRY.unregister_collector(fn)
+
+
+def stats_family(name: str, documentation: str, stats: Dict, keys: Sequence[str],
+                 type_name: str = "gauge", label: str = "kind") -> MetricFamily:
+    """One family from selected keys of a stats() dict, e.g. pool stats -> db_pool{kind="idle"}."""
+    return name, type_name, documentation, [({label: key}, stats[key]) for key in keys if key in stats]
+
+
+def _header(lines: List[str], name: str, type_name: str, documentation: str):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {type_name}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return f"{value:.1f}"
+    return repr(float(value))
+
+
+def _sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        body = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+        return f"{name}{{{body}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+# ---------- HTTP endpoint ----------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0", scan: int = 0, name: str = "metrics"):
+    """
+    Serve /metrics on addr:port from a daemon thread; returns the port, or
+    None if disabled (port 0) or nothing could be bound. With scan > 0 the
+    next scan ports are tried when port is taken (several robots on one host).
+    """
+    if not port:
+        return None
+    for candidate in range(port, port + scan + 1):
+        try:
+            server = ThreadingHTTPServer((addr, candidate), _MetricsHandler)
+        except OSError:
+            continue
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f"{name}-http", daemon=True).start()
+        print(f"[{name}] serving /metrics on {addr}:{candidate}")
+        return candidate
+    print(f"[{name}] could not bind a /metrics port in {port}-{port + scan}, metrics not served")
+    return None
@@ -0,0 +1,19 @@
+"""
+request_ids of a sharded Inventory: shard i starts every request_id it
+creates with "s<i>-", so any service can tell which shard owns an order
+from its id alone (robot results, status lookups from Ordering).
+"""
+import re
+from typing import Optional
+
+_SHARD_ID = re.compile(r"s(\d+)-")
+
+
+def shard_prefix(index: int) -> str:
+    return f"s{index}-"
+
+
+def shard_of(request_id: str) -> Optional[int]:
+    """Index of the shard that created request_id, or None for an unsharded Inventory's ids."""
+    m = _SHARD_ID.match(request_id)
+    return int(m.group(1)) if m else None
@@ -0,0 +1,175 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+from utils.batch_writer import BatchWriter
+from utils.db import get_db_connection
+
+
+# gRPC metadata key (and, title-cased, the HTTP header) carrying the trace id
+TRACE_METADATA_KEY = "x-trace-id"
+TRACE_HTTP_HEADER = "X-Trace-Id"
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def trace_metadata(trace_id: Optional[str]):
+    """Metadata to pass on an outgoing gRPC call so the callee joins the trace."""
+    return ((TRACE_METADATA_KEY, trace_id),) if trace_id else None
+
+
+def trace_id_from_context(context) -> Optional[str]:
+    """Trace id sent by the caller of a gRPC handler, if any."""
+    for key, value in context.invocation_metadata() or ():
+        if key == TRACE_METADATA_KEY:
+            return value
+    return None
+
+
+class Span:
+    """One timed stage of a request: start wall-clock time (epoch seconds) and duration."""
+    __slots__ = ("trace_id", "request_id", "service", "stage", "start_ts", "duration_ms", "attrs")
+
+    def __init__(self, trace_id: str, request_id: Optional[str], service: str, stage: str,
+                 start_ts: float, duration_ms: float, attrs: Dict):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.service = service
+        self.stage = stage
+        self.start_ts = start_ts
+        self.duration_ms = duration_ms
+        self.attrs = attrs
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# ---------- exporters ----------
+
+SPAN_INSERT_SQL = """
+INSERT INTO analytics_spans (trace_id, request_id, service, stage, start_time, duration_ms, attrs)
+VALUES %s
+"""
+
+
+def export_spans_to_db(spans: List[Span]):
+    """Write a batch of spans with one multi-row INSERT into analytics_spans."""
+    rows = [(s.trace_id, s.request_id, s.service, s.stage, s.start_ts, s.duration_ms, json.dumps(s.attrs))
+            for s in spans]
+    with get_db_connection(autocommit=True, op="span_insert") as conn:
+        execute_values(conn.cursor(), SPAN_INSERT_SQL, rows,
+                       template="(%s, %s, %s, %s, to_timestamp(%s), %s, %s::jsonb)", page_size=len(rows))
+
+
+class FileSpanExporter:
+    """Appends spans as JSON lines to a local file (one file can be shared by every service)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, spans: List[Span]):
+        data = "".join(json.dumps(s.to_dict()) + "\n" for s in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(data)
+
+
+def build_span_writer(exporter: str = None) -> Optional[BatchWriter]:
+    """
+    BatchWriter for the exporter named by TRACE_EXPORTER: 'db' (analytics_spans table),
+    'file' (JSON lines at TRACE_FILE) or 'none' (tracing off, returns None).
+    """
+    exporter = (exporter or os.environ.get("TRACE_EXPORTER", "db")).lower()
+    if exporter == "none":
+        return None
+    if exporter == "file":
+        write_batch = FileSpanExporter(os.environ.get("TRACE_FILE", "spans.jsonl"))
+    elif exporter == "db":
+        write_batch = export_spans_to_db
+    else:
+        raise ValueError(f"unknown TRACE_EXPORTER {exporter!r} (expected db, file or none)")
+    return BatchWriter(
+        write_batch,
+        name="span-writer",
+        max_queue=int(os.environ.get("TRACE_QUEUE_SIZE", "50000")),
+        max_batch=int(os.environ.get("TRACE_BATCH_SIZE", "500")),
+        flush_interval_s=float(os.environ.get("TRACE_FLUSH_INTERVAL_S", "1.0")),
+    )
+
+
+# ---------- tracer ----------
+
+class Tracer:
+    """
+    Records spans for one service. Spans are handed to a BatchWriter, so recording
+    costs a queue put; with no writer (tracing off) every call is a no-op.
+    """
+    def __init__(self, service: str, writer: Optional[BatchWriter] = None):
+        self.service = service
+        self.writer = writer
+
+    @property
+    def enabled(self) -> bool:
+        return self.writer is not None
+
+    def record(self, trace_id: Optional[str], stage: str, start_ts: float, duration_ms: float,
+               request_id: Optional[str] = None, **attrs):
+        if self.writer is None or not trace_id:
+            return
+        self.writer.submit(Span(trace_id, request_id, self.service, stage, start_ts, duration_ms, attrs))
+
+    @contextmanager
+    def span(self, trace_id: Optional[str], stage: str, request_id: Optional[str] = None, **attrs):
+        """
+        Time the enclosed block as one span. Yields the attrs dict so the block can
+        add results (e.g. attrs['ok'] = False). Works across awaits in async code.
+        """
+        start_ts = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(trace_id, stage, start_ts, (time.perf_counter() - t0) * 1000.0, request_id, **attrs)
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _span_writer(exporter: str = None) -> Optional[BatchWriter]:
+    """
+    Process-wide span writer shared by every Tracer; rebuilt after fork(). The
+    first caller in a process picks the exporter (one service per process).
+    """
+    global _writer, _writer_pid
+    pid = os.getpid()
+    if _writer_pid == pid:
+        return _writer
+    with _writer_lock:
+        if _writer_pid != pid:
+            _writer = build_span_writer(exporter)
+            _writer_pid = pid
+            if _writer is not None:
+                atexit.register(_writer.close)
+        return _writer
+
+
+def get_tracer(service: str, exporter: str = None) -> Tracer:
+    """Tracer for service; exporter overrides TRACE_EXPORTER (see build_span_writer)."""
+    return Tracer(service, _span_writer(exporter))
+
+
+def flush_spans(timeout_s: float = 5.0):
+    """Write out pending spans (call on shutdown)."""
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.flush(timeout_s)